@@ -1,7 +1,18 @@
+import argparse
 import pygame
 import time
-from enum import Enum
-from typing import List, Tuple
+from typing import Optional, Tuple
+from assets import SpriteAtlas
+from bitboard import BitboardBoard
+from renderer import DirtyRenderer
+from archive import ArchiveWriter
+from book import OpeningBook
+from fen import board_from_fen
+from tablebase import Tablebase
+from engine_runner import EngineMessage, EngineRunner
+from search import format_result
+from instrumentation import Instrumentation, profile_session
+from chess_rules import EmptyObject, GameState, Piece, PieceColor, PieceType, SquareOccupationType, move_to_uci, square_index, starting_pieces
 
 screen_width = 480
 screen_height = 480
@@ -9,118 +20,41 @@ square_size = screen_width // 8
 WHITE = (255, 255, 255)
 LIGHT_BLUE = (72, 130, 183)
 
+# How often the loop polls the engine while it thinks (milliseconds)
+ENGINE_POLL_MS = 16
+
+# Piece sprites shared by every game
+sprite_atlas = SpriteAtlas(square_size)
+
 def GetSquareClicked(mouse_pos) -> Tuple[int, int]:
     square_x = mouse_pos[0] // square_size
     square_y = mouse_pos[1] // square_size
     return [square_x, square_y]
 
-class EmptyObject:
-    pass
-
-class SquareOccupationType(Enum):
-    SELF = 1
-    EMPTY = 2
-    FRIEND = 3
-    ENEMY = 4
-
-class PieceColor(Enum):
-    WHITE = 1
-    BLACK = 2
-
-class PieceType(Enum):
-    PAWN = 1
-    KNIGHT = 2
-    BISHOP = 3
-    ROOK = 4
-    QUEEN = 5
-    KING = 6
-
-class Piece:
-    def __init__(self, image_path: str, piece_color: PieceColor, piece_type: PieceType):
-        # Load the image
-        self.image = pygame.image.load(image_path)
-
-        # Set piece color
-        self.color = piece_color
+class SpritePiece(Piece):
+    def __init__(self, atlas: SpriteAtlas, piece_color: PieceColor, piece_type: PieceType):
+        super().__init__(piece_color, piece_type)
 
-        # Set piece type
-        self.type = piece_type
+        # Sprites are shared through the atlas, nothing is loaded per piece
+        self.atlas = atlas
 
-        # Store the size
-        self.size = min(square_size - 10, self.image.get_width(), self.image.get_height())
+    @property
+    def image(self) -> pygame.Surface:
+        # Looked up on use so promotions and atlas resizes need no bookkeeping
+        return self.atlas.get(self.color, self.type)
 
-        # Scale based on size
-        self.image = pygame.transform.scale(self.image, (self.size, self.size))
-
-        # Screen position
-        self.x = (square_size - self.size) // 2
-        self.y = (square_size - self.size) // 2
-
-        # Set square coord position
-        self.x_coord = 0
-        self.y_coord = 0
-
-        # Set if piece has moved
-        self.moved = False
-
-        # Have captured flag
-        self.captured = False
-        
     def draw(self, screen: pygame.Surface):
-        # Draw the piece on the screen
+        # Draw the piece centred in its square
         if self.captured == False:
-            screen.blit(self.image, (self.x, self.y))
-    
-    def set_square(self, x_coord: int, y_coord: int):
-        # Verify input
-        if x_coord > 8 or x_coord < 0 or y_coord > 8 or y_coord < 0:
-            return
+            image = self.image
+            offset = (self.atlas.square_size - image.get_width()) // 2
+            screen.blit(image, (self.x_coord * self.atlas.square_size + offset,
+                                self.y_coord * self.atlas.square_size + offset))
 
-        # Set coords
-        self.x_coord = x_coord
-        self.y_coord = y_coord
-
-        # Set x/y
-        self.x = (square_size - self.size) // 2
-        self.y = (square_size - self.size) // 2
-        self.x += self.x_coord * square_size
-        self.y += self.y_coord * square_size
-
-        # Promote pawn if at last rank
-        if self.type == PieceType.PAWN:
-            if y_coord == 0 and self.color == PieceColor.WHITE:
-                self.type = PieceType.QUEEN
-                self.image = pygame.image.load("images/queen.png")
-            elif y_coord == 7 and self.color == PieceColor.BLACK:
-                self.type = PieceType.QUEEN
-                self.image = pygame.image.load("images/queen1.png")
-
-    def set_square_str(self, square: str):
-        # Calculate new screen position
-        x_coord = ord(square[0]) - 97
-        y_coord = int(square[1]) - 1
-        y_coord = 7 - y_coord
-        self.set_square(x_coord, y_coord)
-
-    def move(self, x_coord: int, y_coord: int):
-        self.set_square(x_coord, y_coord)
-        self.moved = True
-
-    def set_captured(self, captured = True):
-        self.captured = captured
-
-class Board:
-    def __init__(self):
-        self.x_size = 8
-        self.y_size = 8
-        self.en_passant = EmptyObject()
-        self._reset()
-    
-    def set_pieces(self, pieces: List[Piece]):
-        self._reset()
-        for piece in pieces:
-            self.board[piece.x_coord][piece.y_coord] = piece
+def make_sprite_piece(piece_color: PieceColor, piece_type: PieceType) -> SpritePiece:
+    return SpritePiece(sprite_atlas, piece_color, piece_type)
 
+class DrawableBoard(BitboardBoard):
     def draw(self, screen: pygame.Surface, clicked_piece):
         # Draw the chessboard
         for row in range(self.x_size):
@@ -133,7 +67,7 @@ class Board:
         # Draw game pieces
         for row in self.board:
             for piece in row:
-                if isinstance(piece, Piece):
+                if isinstance(piece, SpritePiece):
                     piece.draw(screen)
 
         # Draw highlights (don't draw if empty)
@@ -141,383 +75,139 @@ class Board:
         self._draw_highlights(screen)
 
     def destination_square_type(self, x_coord: int, y_coord: int):
-        for [board_x, board_y, occupation_type] in self.highlights:
-            if x_coord == board_x and y_coord == board_y:
-                return occupation_type
-            
-        return EmptyObject()
-
-    def remove_piece_at_square(self, x_coord:int, y_coord:int):
-        # Set board to None at x,y
-        if x_coord < 0 or x_coord >= self.x_size or y_coord < 0 or y_coord >= self.y_size:
+        if not (0 <= x_coord <= 7 and 0 <= y_coord <= 7):
             return EmptyObject()
-        piece = self.board[x_coord][y_coord]
-        self.board[x_coord][y_coord] = None
-        return piece
+        return self.highlight_types.get(square_index(x_coord, y_coord), EmptyObject())
 
     def piece_clicked(self, mouse_pos):
-        for row in self.board:
-            for piece in row:
-                if isinstance(piece, Piece):
-                    if piece.image.get_rect(x=piece.x, y=piece.y).collidepoint(mouse_pos):
-                        return piece
+        # The clicked square indexes the board directly
+        [x_coord, y_coord] = GetSquareClicked(mouse_pos)
+        piece = self.piece_at(x_coord, y_coord)
+        if isinstance(piece, SpritePiece):
+            return piece
 
         self.clicked_piece = EmptyObject()
 
-    def move_piece(self, piece: Piece, new_x: int, new_y: int):
-        if 0 <= new_x <= 7 and 0 <= new_y <= 7:
-            # Set the board
-            self.board[piece.x_coord][piece.y_coord] = None
-            self.board[new_x][new_y] = piece
-
-            # Remove pawn if taking en pessant
-            if not isinstance(self.en_passant, EmptyObject):
-                if piece.type == PieceType.PAWN and new_x == self.en_passant[0] \
-                    and new_y == self.en_passant[1]:
-                    if new_y == 2:
-                        self.board[new_x][3] = None
-                    elif new_y == 5:
-                        self.board[new_x][4] = None
-
-            # Always reset en passant after a move
-            self.en_passant = EmptyObject()
-
-            # Set en passent if first pawn move is 2 squares
-            if piece.type == PieceType.PAWN and not piece.moved:
-                if piece.color == PieceColor.WHITE and new_y == 4:
-                    self.en_passant = [new_x, 5]
-                elif piece.color == PieceColor.BLACK and new_y == 3:
-                    self.en_passant = [new_x, 2]
-
-            # Move the piece object
-            piece.move(new_x, new_y)
-
     def _draw_highlights(self, screen: pygame.Surface):
         if len(self.highlights) == 0:
             return
 
         # Add border highlighting to legal move squares
         for [x_coord, y_coord, occupation_type] in self.highlights:
-            x = x_coord * square_size
-            y = y_coord * square_size
-            border_thickness = 4
-
-            if occupation_type == SquareOccupationType.SELF:
-                border_color = (69, 186, 76)
-                center_x = x + (square_size // 2)
-                center_y = y + (square_size // 2)
-                radius = square_size // 2
-                pygame.draw.circle(screen, border_color, (center_x, center_y), radius, border_thickness)
-            elif occupation_type == SquareOccupationType.ENEMY:
-                border_color = (255, 0, 0)
-                center_x = x + (square_size // 2)
-                center_y = y + (square_size // 2)
-                radius = square_size // 2
-                pygame.draw.circle(screen, border_color, (center_x, center_y), radius, border_thickness)
-            elif occupation_type == SquareOccupationType.EMPTY:
-                border_color = (69, 186, 76)
-                inner_rect = pygame.Rect(x + border_thickness, y + border_thickness,
-                                        square_size - 2 * border_thickness,
-                                        square_size - 2 * border_thickness)
-                pygame.draw.rect(screen, border_color, inner_rect, border_thickness)
+            self._draw_highlight(screen, x_coord, y_coord, occupation_type)
+
+    def _draw_highlight(self, screen: pygame.Surface, x_coord: int, y_coord: int, occupation_type: SquareOccupationType):
+        x = x_coord * square_size
+        y = y_coord * square_size
+        border_thickness = 4
+
+        if occupation_type == SquareOccupationType.SELF:
+            border_color = (69, 186, 76)
+            center_x = x + (square_size // 2)
+            center_y = y + (square_size // 2)
+            radius = square_size // 2
+            pygame.draw.circle(screen, border_color, (center_x, center_y), radius, border_thickness)
+        elif occupation_type == SquareOccupationType.ENEMY:
+            border_color = (255, 0, 0)
+            center_x = x + (square_size // 2)
+            center_y = y + (square_size // 2)
+            radius = square_size // 2
+            pygame.draw.circle(screen, border_color, (center_x, center_y), radius, border_thickness)
+        elif occupation_type == SquareOccupationType.EMPTY:
+            border_color = (69, 186, 76)
+            inner_rect = pygame.Rect(x + border_thickness, y + border_thickness,
+                                    square_size - 2 * border_thickness,
+                                    square_size - 2 * border_thickness)
+            pygame.draw.rect(screen, border_color, inner_rect, border_thickness)
 
     def _determine_highlights(self, clicked_piece):
         if isinstance(clicked_piece, EmptyObject):
             # Empty highlights if piece unset
             self.highlights = []
+            self.highlight_types = {}
         elif isinstance(clicked_piece, Piece):
             # Only determine highlights the first time pice is clicked
             if len(self.highlights) == 0:
-                self.highlights = self._get_legal_squares(clicked_piece)
+                from_square = square_index(clicked_piece.x_coord, clicked_piece.y_coord)
+                self.highlights = []
+                self.highlight_types = {}
+                for to_square in self.move_table().get(from_square, {}):
+                    x_coord = to_square & 7
+                    y_coord = 7 - (to_square >> 3)
+                    # Pawn moves that change file are captures, including en passant
+                    if self.board[x_coord][y_coord] is not None or \
+                        (clicked_piece.type == PieceType.PAWN and x_coord != clicked_piece.x_coord):
+                        occupation_type = SquareOccupationType.ENEMY
+                    else:
+                        occupation_type = SquareOccupationType.EMPTY
+                    self.highlights.append([x_coord, y_coord, occupation_type])
+                    self.highlight_types[to_square] = occupation_type
                 self.highlights.append([clicked_piece.x_coord, clicked_piece.y_coord, SquareOccupationType.SELF])
 
-    def _get_legal_squares(self, piece: Piece) -> List[Tuple[int, int, SquareOccupationType]]:
-        if piece.type == PieceType.PAWN:
-            return self._get_legal_pawn_squares(piece.x_coord, piece.y_coord, piece.color, piece.moved)
-        elif piece.type == PieceType.KNIGHT:
-            return self._get_legal_knight_squares(piece.x_coord, piece.y_coord, piece.color)
-        elif piece.type == PieceType.BISHOP:
-            return self._get_legal_bishop_squares(piece.x_coord, piece.y_coord, piece.color)
-        elif piece.type == PieceType.ROOK:
-            return self._get_legal_rook_squares(piece.x_coord, piece.y_coord, piece.color)
-        elif piece.type == PieceType.QUEEN:
-            return self._get_legal_queen_squares(piece.x_coord, piece.y_coord, piece.color)
-        elif piece.type == PieceType.KING:
-            return self._get_legal_king_squares(piece.x_coord, piece.y_coord, piece.color)
-        else:
-            return []
-        
-    def _get_legal_pawn_squares(self, x_coord: int, y_coord: int, color: PieceColor, moved: bool) -> List[Tuple[int, int, SquareOccupationType]]:
-        squares = []
-
-        if color == PieceColor.WHITE:
-            y_offset = -1
-        else:
-            y_offset = 1
-
-        # Check square in front
-        if self._square_type(x_coord, y_coord + y_offset, color) == SquareOccupationType.EMPTY:
-            squares.append((x_coord, y_coord + y_offset, SquareOccupationType.EMPTY))
-
-        # Check enemy squares diagonally
-        if y_coord + y_offset >= 0 and y_coord + y_offset <= 7:
-            if self._square_type(x_coord - 1, y_coord + y_offset, color) == SquareOccupationType.ENEMY or \
-                [x_coord - 1, y_coord + y_offset] == self.en_passant:
-                squares.append((x_coord - 1, y_coord + y_offset, SquareOccupationType.ENEMY))
-            if self._square_type(x_coord + 1, y_coord + y_offset, color) == SquareOccupationType.ENEMY or \
-                [x_coord + 1, y_coord + y_offset] == self.en_passant:
-                squares.append((x_coord + 1, y_coord + y_offset, SquareOccupationType.ENEMY))
-
-        # If hasn't moved then allow moving two squares
-        if not moved and self._square_type(x_coord, y_coord + (y_offset * 2), color) == SquareOccupationType.EMPTY:
-            squares.append((x_coord, y_coord + (y_offset * 2), SquareOccupationType.EMPTY))
-
-        return squares
-    
-    def _get_legal_knight_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
-        squares = []
-
-        possible_moves = [
-            (x_coord + 2, y_coord + 1),
-            (x_coord + 2, y_coord - 1),
-            (x_coord - 2, y_coord + 1),
-            (x_coord - 2, y_coord - 1),
-            (x_coord + 1, y_coord + 2),
-            (x_coord + 1, y_coord - 2),
-            (x_coord - 1, y_coord + 2),
-            (x_coord - 1, y_coord - 2)
-        ]
-
-        for [new_x, new_y] in possible_moves:
-            if 0 <= new_x <= 7 and 0 <= new_y <= 7:
-                destination_type = self._square_type(new_x, new_y, color)
-                if destination_type == SquareOccupationType.EMPTY or destination_type == SquareOccupationType.ENEMY:
-                    squares.append([new_x, new_y, destination_type])
-
-        return squares
-    
-    def _get_legal_bishop_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
-        squares = []
-        directions = [[-1, -1], [-1, 1], [1, -1], [1, 1]]
-
-        for direction in directions:
-            current_x = x_coord
-            current_y = y_coord
-
-            while (True):
-                current_x += direction[0]
-                current_y += direction[1]
-
-                if (0 > current_x or current_x > 7 or 0 > current_y or current_y > 7):
-                    break
-
-                square_type = self._square_type(current_x, current_y, color)
-
-                if square_type == SquareOccupationType.FRIEND:
-                    break
-
-                squares.append([current_x, current_y, square_type])
-
-                if square_type == SquareOccupationType.ENEMY:
-                    break
-
-        return squares
-
-    def _get_legal_rook_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
-        squares = []
-        directions = [[-1, 0], [0, 1], [1, 0], [0, -1]]
-
-        for direction in directions:
-            current_x = x_coord
-            current_y = y_coord
-
-            while (True):
-                current_x += direction[0]
-                current_y += direction[1]
-
-                if (0 > current_x or current_x > 7 or 0 > current_y or current_y > 7):
-                    break
-
-                square_type = self._square_type(current_x, current_y, color)
-
-                if square_type == SquareOccupationType.FRIEND:
-                    break
-
-                squares.append([current_x, current_y, square_type])
-
-                if square_type == SquareOccupationType.ENEMY:
-                    break
-
-        return squares
-
-    def _get_legal_queen_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
-        squares = []
-        directions = []
-
-        for i in range(-1, 2):
-            for j in range (-1, 2):
-                directions.append([i, j])
-
-        for direction in directions:
-            current_x = x_coord
-            current_y = y_coord
-
-            while (True):
-                current_x += direction[0]
-                current_y += direction[1]
-
-                if (0 > current_x or current_x > 7 or 0 > current_y or current_y > 7):
-                    break
-
-                square_type = self._square_type(current_x, current_y, color)
-
-                if square_type == SquareOccupationType.FRIEND:
-                    break
-
-                squares.append([current_x, current_y, square_type])
-
-                if square_type == SquareOccupationType.ENEMY:
-                    break
-
-        return squares
-
-    def _get_legal_king_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
-        squares = []
-        directions = []
-
-        for i in range(-1, 2):
-            for j in range (-1, 2):
-                directions.append([i, j])
-
-        for direction in directions:
-            current_x = x_coord + direction[0]
-            current_y = y_coord + direction[1]
-
-            if (0 > current_x or current_x > 7 or 0 > current_y or current_y > 7):
-                continue
-
-            square_type = self._square_type(current_x, current_y, color)
-
-            if square_type == SquareOccupationType.FRIEND:
-                continue
-
-            squares.append([current_x, current_y, square_type])
-
-        return squares
-
-    def _square_type(self, x_coord: int, y_coord: int, friendly_color: PieceColor) -> SquareOccupationType:
-        if 0 > x_coord or x_coord > 7 or 0 > y_coord or y_coord > 7:
-            return
-        
-        other_piece = self.board[x_coord][y_coord]
-
-        if other_piece is None:
-            return SquareOccupationType.EMPTY
-        
-        if isinstance(other_piece, Piece) and other_piece.color != friendly_color:
-            return SquareOccupationType.ENEMY
-        
-        return SquareOccupationType.FRIEND
-
     def _reset(self):
-        self.board = [[None] * self.x_size for _ in range(self.y_size)]
+        super()._reset()
         self.highlights = []
+        # Highlighted destination square -> occupation type
+        self.highlight_types = {}
 
 class ChessGame:
-    def __init__(self):
-        # Setup white pieces
-        pawn_a_white = Piece("images/pawn.png", PieceColor.WHITE, PieceType.PAWN)
-        pawn_b_white = Piece("images/pawn.png", PieceColor.WHITE, PieceType.PAWN)
-        pawn_c_white = Piece("images/pawn.png", PieceColor.WHITE, PieceType.PAWN)
-        pawn_d_white = Piece("images/pawn.png", PieceColor.WHITE, PieceType.PAWN)
-        pawn_e_white = Piece("images/pawn.png", PieceColor.WHITE, PieceType.PAWN)
-        pawn_f_white = Piece("images/pawn.png", PieceColor.WHITE, PieceType.PAWN)
-        pawn_g_white = Piece("images/pawn.png", PieceColor.WHITE, PieceType.PAWN)
-        pawn_h_white = Piece("images/pawn.png", PieceColor.WHITE, PieceType.PAWN)
-        knight_b_white = Piece("images/knight.png", PieceColor.WHITE, PieceType.KNIGHT)
-        knight_g_white = Piece("images/knight.png", PieceColor.WHITE, PieceType.KNIGHT)
-        bishop_c_white = Piece("images/bishop.png", PieceColor.WHITE, PieceType.BISHOP)
-        bishop_f_white = Piece("images/bishop.png", PieceColor.WHITE, PieceType.BISHOP)
-        rook_a_white = Piece("images/rook.png", PieceColor.WHITE, PieceType.ROOK)
-        rook_h_white = Piece("images/rook.png", PieceColor.WHITE, PieceType.ROOK)
-        queen_white = Piece("images/queen.png", PieceColor.WHITE, PieceType.QUEEN)
-        king_white = Piece("images/king.png", PieceColor.WHITE, PieceType.KING)
-
-        # Set white piece positions
-        pawn_a_white.set_square_str("a2")
-        pawn_b_white.set_square_str("b2")
-        pawn_c_white.set_square_str("c2")
-        pawn_d_white.set_square_str("d2")
-        pawn_e_white.set_square_str("e2")
-        pawn_f_white.set_square_str("f2")
-        pawn_g_white.set_square_str("g2")
-        pawn_h_white.set_square_str("h2")
-        knight_b_white.set_square_str("b1")
-        knight_g_white.set_square_str("g1")
-        bishop_c_white.set_square_str("c1")
-        bishop_f_white.set_square_str("f1")
-        rook_a_white.set_square_str("a1")
-        rook_h_white.set_square_str("h1")
-        queen_white.set_square_str("d1")
-        king_white.set_square_str("e1")
-        
-        # Setup black pieces
-        pawn_a_black = Piece("images/pawn1.png", PieceColor.BLACK, PieceType.PAWN)
-        pawn_b_black = Piece("images/pawn1.png", PieceColor.BLACK, PieceType.PAWN)
-        pawn_c_black = Piece("images/pawn1.png", PieceColor.BLACK, PieceType.PAWN)
-        pawn_d_black = Piece("images/pawn1.png", PieceColor.BLACK, PieceType.PAWN)
-        pawn_e_black = Piece("images/pawn1.png", PieceColor.BLACK, PieceType.PAWN)
-        pawn_f_black = Piece("images/pawn1.png", PieceColor.BLACK, PieceType.PAWN)
-        pawn_g_black = Piece("images/pawn1.png", PieceColor.BLACK, PieceType.PAWN)
-        pawn_h_black = Piece("images/pawn1.png", PieceColor.BLACK, PieceType.PAWN)
-        knight_b_black = Piece("images/knight1.png", PieceColor.BLACK, PieceType.KNIGHT)
-        knight_g_black = Piece("images/knight1.png", PieceColor.BLACK, PieceType.KNIGHT)
-        bishop_c_black = Piece("images/bishop1.png", PieceColor.BLACK, PieceType.BISHOP)
-        bishop_f_black = Piece("images/bishop1.png", PieceColor.BLACK, PieceType.BISHOP)
-        rook_a_black = Piece("images/rook1.png", PieceColor.BLACK, PieceType.ROOK)
-        rook_h_black = Piece("images/rook1.png", PieceColor.BLACK, PieceType.ROOK)
-        queen_black = Piece("images/queen1.png", PieceColor.BLACK, PieceType.QUEEN)
-        king_black = Piece("images/king1.png", PieceColor.BLACK, PieceType.KING)
-
-        # Set black piece positions
-        pawn_a_black.set_square_str("a7")
-        pawn_b_black.set_square_str("b7")
-        pawn_c_black.set_square_str("c7")
-        pawn_d_black.set_square_str("d7")
-        pawn_e_black.set_square_str("e7")
-        pawn_f_black.set_square_str("f7")
-        pawn_g_black.set_square_str("g7")
-        pawn_h_black.set_square_str("h7")
-        knight_b_black.set_square_str("b8")
-        knight_g_black.set_square_str("g8")
-        bishop_c_black.set_square_str("c8")
-        bishop_f_black.set_square_str("f8")
-        rook_a_black.set_square_str("a8")
-        rook_h_black.set_square_str("h8")
-        queen_black.set_square_str("d8")
-        king_black.set_square_str("e8")
-
-        game_pieces = [pawn_a_white, pawn_b_white, pawn_c_white, pawn_d_white,
-                       pawn_e_white, pawn_f_white, pawn_g_white, pawn_h_white,
-                       knight_b_white, knight_g_white, bishop_c_white, bishop_f_white, 
-                       rook_a_white, rook_h_white, queen_white, king_white,
-                       pawn_a_black, pawn_b_black, pawn_c_black, pawn_d_black,
-                       pawn_e_black, pawn_f_black, pawn_g_black, pawn_h_black,
-                       knight_b_black, knight_g_black, bishop_c_black, bishop_f_black, 
-                       rook_a_black, rook_h_black, queen_black, king_black]
-        
-        self.game_board = Board()
-        self.game_board.set_pieces(game_pieces)
-
-        self.turn = PieceColor.WHITE
+    def __init__(self, fen: Optional[str] = None, book: Optional[OpeningBook] = None,
+                 tablebase: Optional[Tablebase] = None):
+        if fen is None:
+            # Setup pieces in their starting squares
+            game_pieces = starting_pieces(make_sprite_piece)
+
+            self.game_board = DrawableBoard()
+            self.game_board.set_pieces(game_pieces)
+        else:
+            self.game_board = board_from_fen(fen, DrawableBoard, make_sprite_piece)
 
         self.clicked_piece = EmptyObject()
+
+        # Computer opponent, thinks on a background thread unless the book or
+        # the tablebases know the position
+        self.engine = EngineRunner()
+        self.book = book
+        self.tablebase = tablebase
+        self.engine_status = ""
+
+    @property
+    def turn(self) -> PieceColor:
+        # The board flips the side to move on every move
+        return self.game_board.turn
         
     def draw(self, screen: pygame.SurfaceType): 
         # Draw board and highlights
         self.game_board.draw(screen, self.clicked_piece)
 
+    def caption(self) -> str:
+        # Window title with the game result once it is over
+        if self.engine_status:
+            return "Chess Board - Engine " + self.engine_status
+        state = self.game_board.game_state()
+        if state == GameState.CHECKMATE:
+            winner = "Black" if self.turn == PieceColor.WHITE else "White"
+            return "Chess Board - Checkmate, " + winner + " wins"
+        elif state == GameState.STALEMATE:
+            return "Chess Board - Stalemate"
+        elif self.game_board.in_check():
+            return "Chess Board - Check"
+        return "Chess Board"
+
+    def result(self) -> str:
+        # PGN result, "*" while the game is still going
+        state = self.game_board.game_state()
+        if state == GameState.CHECKMATE:
+            return "0-1" if self.turn == PieceColor.WHITE else "1-0"
+        if state == GameState.STALEMATE:
+            return "1/2-1/2"
+        return "*"
+
     def mouse_left_click(self, mouse_pos):
+        # The board belongs to the engine while it thinks
+        if self.engine.thinking:
+            return
+
         # Set new square for piece
         if isinstance(self.clicked_piece, Piece):
             [x_coord, y_coord] = GetSquareClicked(mouse_pos)
@@ -526,12 +216,6 @@ class ChessGame:
             if isinstance(destination_square_type, SquareOccupationType):
                 self.game_board.move_piece(self.clicked_piece, x_coord, y_coord)
 
-                # Change turn
-                if self.turn == PieceColor.WHITE:
-                    self.turn = PieceColor.BLACK
-                else:
-                    self.turn = PieceColor.WHITE
-
             # Reset clicked_piece
             self.clicked_piece = EmptyObject()
 
@@ -541,13 +225,68 @@ class ChessGame:
             if isinstance(clicked, Piece) and clicked.color == self.turn:
                 self.clicked_piece = clicked
 
+    def start_engine(self, time_limit: float):
+        # Let the engine play for the side to move; asking again while it
+        # thinks makes it move now
+        if self.engine.thinking:
+            self.engine.stop()
+            return
+        if self.game_board.game_state() != GameState.ONGOING:
+            return
+        self.clicked_piece = EmptyObject()
+        if self.book is not None:
+            move = self.book.choose(self.game_board)
+            if move:
+                self.game_board.make_move(move)
+                return
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(self.game_board)
+            if move:
+                self.game_board.make_move(move)
+                return
+        self.engine_status = "thinking"
+        self.engine.start(self.game_board, time_limit)
+
+    def poll_engine(self) -> bool:
+        # Apply engine progress and its move once it is done. Returns True if
+        # anything changed
+        messages = self.engine.poll()
+        for kind, result in messages:
+            if kind == EngineMessage.INFO:
+                self.engine_status = "depth %d, best %s" % (result.depth, move_to_uci(result.move))
+            elif kind == EngineMessage.DONE:
+                self.engine_status = ""
+                # The board can't change while the engine thinks, but check anyway
+                if result.move and self.game_board.hash == self.engine.position_hash:
+                    self.game_board.make_move(result.move)
+                print(format_result(result))
+        return len(messages) > 0
+
     def _remove_piece(self, x_coord: int, y_coord: int):
         piece = self.game_board.remove_piece_at_square(x_coord, y_coord)
 
         if isinstance(piece, Piece):
             piece.set_captured()
 
-def main():
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Chess Board")
+    parser.add_argument("--render", choices=["dirty", "full"], default="dirty",
+                        help="redraw only changed squares, or the whole board every frame")
+    parser.add_argument("--fps", type=int, default=0,
+                        help="frame cap; 0 sleeps until the next input event")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="seconds the engine searches when you right click")
+    parser.add_argument("--fen", help="start from this position instead of the initial setup")
+    parser.add_argument("--book", help="opening book the engine plays from before it searches")
+    parser.add_argument("--tablebase", help="directory of endgame tablebases the engine plays from")
+    parser.add_argument("--record", help="append the game to this archive when the window closes")
+    parser.add_argument("--instrument", action="store_true",
+                        help="time each frame's sections and count move generation calls")
+    parser.add_argument("--report-every", type=float, default=10.0,
+                        help="seconds between timing reports with --instrument, 0 reports only on exit")
+    parser.add_argument("--profile", help="run the session under cProfile and write the stats here")
+    args = parser.parse_args(argv)
+
     # Initialize Pygame
     pygame.init()
 
@@ -555,36 +294,123 @@ def main():
     screen = pygame.display.set_mode((screen_width, screen_height))
     pygame.display.set_caption("Chess Board")
 
-    # Setup Chess game
-    chess_game = ChessGame()
-
-    # Game loop
-    running = True
+    # Decode and scale the sprites once, in the display's pixel format
+    sprite_atlas.preload()
+    sprite_atlas.convert_for_display()
 
-    while running:
-        # Handle events
-        for event in pygame.event.get():
+    # Setup Chess game
+    book = OpeningBook(args.book) if args.book else None
+    tablebase = Tablebase(args.tablebase) if args.tablebase else None
+    chess_game = ChessGame(args.fen, book, tablebase)
+
+    renderer = None
+    if args.render == "dirty":
+        renderer = DirtyRenderer(chess_game.game_board, square_size, WHITE, LIGHT_BLUE)
+    clock = pygame.time.Clock()
+
+    def handle_events(events) -> bool:
+        # Returns False once the window is closed
+        running = True
+        for event in events:
             if event.type == pygame.QUIT:
+                chess_game.engine.cancel(wait=False)
                 running = False
 
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED) and renderer is not None:
+                renderer.invalidate()
+
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1: # Left mouse button
                     mouse_pos = pygame.mouse.get_pos()
                     chess_game.mouse_left_click(mouse_pos)
 
-                elif event.button == 3: # Right mouse button
-                    print("Right mouse button clicked")
+                elif event.button == 3: # Right mouse button plays an engine move
+                    chess_game.start_engine(args.think_time)
 
-        # Clear the screen
-        screen.fill(WHITE)
+                # Show check and the result in the title bar
+                pygame.display.set_caption(chess_game.caption())
 
-        # Draw board and pieces
+        if chess_game.poll_engine():
+            pygame.display.set_caption(chess_game.caption())
+        return running
+
+    def draw():
+        if renderer is not None:
+            # Redraw only the squares that changed
+            return renderer.render(screen, chess_game.clicked_piece)
+        # Clear the screen, then draw board and pieces
+        screen.fill(WHITE)
         chess_game.draw(screen)
+        return None
+
+    def flip(dirty_rects):
+        # Push the changed squares, or the whole display
+        if renderer is None:
+            pygame.display.flip()
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+
+    def frame(events) -> bool:
+        running = handle_events(events)
+        flip(draw())
+        return running
+
+    # Frame timing and rules counters only when asked for. The loop body is
+    # picked here once, so an untimed frame does no timing work at all
+    if args.instrument:
+        timing = Instrumentation()
+        timing.install(DrawableBoard)
+        last_report = time.perf_counter()
+
+        def timed_frame(events) -> bool:
+            nonlocal last_report
+            # Waiting for input is not part of the frame
+            timing.begin_frame()
+            with timing.section("events"):
+                running = handle_events(events)
+            with timing.section("draw"):
+                dirty_rects = draw()
+            with timing.section("flip"):
+                flip(dirty_rects)
+            timing.end_frame()
+
+            if args.report_every > 0 and time.perf_counter() - last_report >= args.report_every:
+                print(timing.report())
+                last_report = time.perf_counter()
+            return running
+
+        frame = timed_frame
+
+    # Game loop
+    running = True
+
+    with profile_session(args.profile):
+        while running:
+            # Handle events, blocking until one arrives when there is no frame cap.
+            # While the engine thinks, wake up regularly to pick up its results
+            if args.fps > 0:
+                events = pygame.event.get()
+            elif chess_game.engine.thinking:
+                events = [pygame.event.wait(ENGINE_POLL_MS)] + pygame.event.get()
+            else:
+                events = [pygame.event.wait()] + pygame.event.get()
+
+            running = frame(events)
+
+            if args.fps > 0:
+                clock.tick(args.fps)
+
+    if args.instrument:
+        print(timing.report())
+        timing.uninstall()
 
-        # Update the display
-        pygame.display.flip()
+    # Every move played is still in the board's undo history
+    if args.record and chess_game.game_board.history:
+        with ArchiveWriter(args.record) as writer:
+            writer.write_board(chess_game.game_board, chess_game.result())
 
     # Quit the game
     pygame.quit()
 
-main()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+# Append-only game archive with keyframes for seeking. Games are stored one
+# after another as packed 16-bit moves plus a CompactState snapshot every
+# keyframe_interval plies, so the position at any ply is a snapshot copy and
+# fewer than keyframe_interval moves away. Readers map the file and only hop
+# over game headers when opening it.
+#
+#   python archive.py import games.cga games1.pgn games2.pgn
+#   python archive.py info games.cga
+#   python archive.py show games.cga --game 3 --ply 40
+#   python archive.py bench games.cga
+#
+# File layout: 4 byte magic, then per game:
+#   >HHB header:     plies, keyframe interval, result (index into pgn.RESULTS)
+#   keyframes:       plies // interval + 1 CompactState snapshots, ply 0 first
+#   >H per ply:      packed move (from | to << 6 | promotion << 12)
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from typing import Callable, Iterator, List
+from chess_rules import Board, Piece, PieceColor, PieceType, move_to_uci
+from bitboard import BitboardBoard
+from compact_state import STATE_SIZE, CompactState
+from fen import board_to_fen
+from pgn import RESULTS, iter_moves, read_games_from_path, start_board
+
+MAGIC = b"CGA1"
+HEADER = struct.Struct(">HHB")
+MOVE = struct.Struct(">H")
+DEFAULT_KEYFRAME_INTERVAL = 16
+MAX_PLIES = 0xFFFF
+# The interval is stored as a >H header field
+MAX_KEYFRAME_INTERVAL = 0xFFFF
+
+def record_size(plies: int, interval: int) -> int:
+    return HEADER.size + (plies // interval + 1) * STATE_SIZE + plies * MOVE.size
+
+def check_keyframe_interval(keyframe_interval: int):
+    if not 1 <= keyframe_interval <= MAX_KEYFRAME_INTERVAL:
+        raise ValueError("Keyframe interval must be 1..%d, not %d" % (MAX_KEYFRAME_INTERVAL, keyframe_interval))
+
+def encode_game(start: CompactState, moves: List[int], result: str = "*",
+                keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL) -> bytes:
+    if len(moves) > MAX_PLIES:
+        raise ValueError("Games are limited to %d plies" % MAX_PLIES)
+    check_keyframe_interval(keyframe_interval)
+    # Replay on a scratch state, snapshotting it every keyframe_interval plies
+    state = start.copy()
+    keyframes = [bytes(state.data)]
+    for ply, move in enumerate(moves, 1):
+        state.make_move(move)
+        if ply % keyframe_interval == 0:
+            keyframes.append(bytes(state.data))
+    return HEADER.pack(len(moves), keyframe_interval, RESULTS.index(result)) + b"".join(keyframes) + \
+        struct.pack(">%dH" % len(moves), *moves)
+
+class ArchiveWriter:
+    def __init__(self, path: str, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        # Checked before the file is touched, so a bad interval leaves no trace
+        check_keyframe_interval(keyframe_interval)
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        # A new file gets the magic, an existing one is appended to
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            with open(path, "wb") as file:
+                file.write(MAGIC)
+        else:
+            with open(path, "rb") as file:
+                if file.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(path + " is not a game archive")
+        self._file = open(path, "ab")
+
+    def write_game(self, start: CompactState, moves: List[int], result: str = "*"):
+        self._file.write(encode_game(start, moves, result, self.keyframe_interval))
+        self._file.flush()
+
+    def write_board(self, board: Board, result: str = "*"):
+        # Archive the game a board has played, from the position before its
+        # first recorded move
+        moves = [record[0] for record in board.history]
+        for _ in moves:
+            board.unmake_move()
+        start = CompactState.from_board(board)
+        for move in moves:
+            board.make_move(move)
+        self.write_game(start, moves, result)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ArchivedGame:
+    # A view of one game in a mapped archive
+    def __init__(self, data, offset: int, index: int):
+        self.index = index
+        self.plies, self.keyframe_interval, result = HEADER.unpack_from(data, offset)
+        self.result = RESULTS[result]
+        self._data = data
+        self._keyframes = offset + HEADER.size
+        self._moves = self._keyframes + (self.plies // self.keyframe_interval + 1) * STATE_SIZE
+
+    def move(self, ply: int) -> int:
+        # The move played from ply to ply + 1
+        return MOVE.unpack_from(self._data, self._moves + ply * MOVE.size)[0]
+
+    def moves(self) -> List[int]:
+        return list(struct.unpack_from(">%dH" % self.plies, self._data, self._moves))
+
+    def state_at(self, ply: int) -> CompactState:
+        if not 0 <= ply <= self.plies:
+            raise IndexError("Ply %d outside 0..%d" % (ply, self.plies))
+        # Nearest keyframe at or before the ply, then the moves in between
+        keyframe = ply // self.keyframe_interval
+        start = self._keyframes + keyframe * STATE_SIZE
+        state = CompactState(self._data[start:start + STATE_SIZE])
+        for played in range(keyframe * self.keyframe_interval, ply):
+            state.make_move(self.move(played))
+        return state
+
+    def board_at(self, ply: int, board_cls = BitboardBoard,
+                 make_piece: Callable[[PieceColor, PieceType], Piece] = Piece) -> Board:
+        return self.state_at(ply).to_board(board_cls, make_piece)
+
+class GameArchive:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(path + " is not a game archive")
+
+        # Hop from header to header; a game cut off by a crash is left out
+        self.offsets = []
+        offset = len(MAGIC)
+        while offset + HEADER.size <= size:
+            plies, interval, _ = HEADER.unpack_from(self._map, offset)
+            if interval == 0 or offset + record_size(plies, interval) > size:
+                break
+            self.offsets.append(offset)
+            offset += record_size(plies, interval)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> ArchivedGame:
+        return ArchivedGame(self._map, self.offsets[index], index % len(self.offsets))
+
+    def __iter__(self) -> Iterator[ArchivedGame]:
+        for index in range(len(self.offsets)):
+            yield self[index]
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect a game archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="games, plies and size")
+    info.add_argument("archive")
+    show = commands.add_parser("show", help="print a game's position at a ply")
+    show.add_argument("archive")
+    show.add_argument("--game", type=int, default=0)
+    show.add_argument("--ply", type=int, help="default: the final position")
+    add = commands.add_parser("import", help="append the games of PGN files")
+    add.add_argument("archive")
+    add.add_argument("pgn", nargs="+")
+    add.add_argument("--keyframe-interval", type=int, default=DEFAULT_KEYFRAME_INTERVAL)
+    bench = commands.add_parser("bench", help="time opening the archive and random seeks")
+    bench.add_argument("archive")
+    bench.add_argument("--seeks", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        try:
+            check_keyframe_interval(args.keyframe_interval)
+        except ValueError as error:
+            parser.error(str(error))
+        count = 0
+        with ArchiveWriter(args.archive, args.keyframe_interval) as writer:
+            for path in args.pgn:
+                for game in read_games_from_path(path):
+                    board = start_board(game)
+                    initial = CompactState.from_board(board)
+                    try:
+                        moves = list(iter_moves(game, board))
+                    except ValueError as error:
+                        print("skipped a game: %s" % error)
+                        continue
+                    writer.write_game(initial, moves, game.result if game.result in RESULTS else "*")
+                    count += 1
+        print("%d games appended to %s" % (count, args.archive))
+        return 0
+
+    start = time.perf_counter()
+    with GameArchive(args.archive) as archive:
+        opened = time.perf_counter() - start
+        if args.command == "info":
+            plies = sum(game.plies for game in archive)
+            print("%d games, %d plies, %d bytes, opened in %.2f ms" % (
+                len(archive), plies, os.path.getsize(args.archive), opened * 1e3))
+        elif args.command == "show":
+            game = archive[args.game]
+            ply = game.plies if args.ply is None else args.ply
+            print("game %d, %d plies, result %s" % (game.index, game.plies, game.result))
+            print(" ".join(move_to_uci(move) for move in game.moves()[:ply]))
+            print(board_to_fen(game.board_at(ply)))
+        else:
+            rng = random.Random(1)
+            games = [game for game in archive if game.plies]
+            start = time.perf_counter()
+            for _ in range(args.seeks):
+                game = rng.choice(games)
+                game.state_at(rng.randint(0, game.plies))
+            elapsed = time.perf_counter() - start
+            print("%d games opened in %.2f ms, seek %.1f us" % (len(archive), opened * 1e3, elapsed / args.seeks * 1e6))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
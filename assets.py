@@ -0,0 +1,68 @@
+# Sprite cache for the pygame front end. Each piece image is decoded from disk
+# once, scaled to the current square size once, and the same Surface is shared
+# by every piece of that kind.
+import os
+import pygame
+from typing import Dict, Tuple
+from chess_rules import PieceColor, PieceType
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+# Gap left between a sprite and the edge of its square
+SPRITE_MARGIN = 10
+
+def piece_image_path(piece_color: PieceColor, piece_type: PieceType, image_dir: str = IMAGE_DIR) -> str:
+    # White sprites are images/<type>.png, black ones images/<type>1.png
+    suffix = "" if piece_color == PieceColor.WHITE else "1"
+    return os.path.join(image_dir, piece_type.name.lower() + suffix + ".png")
+
+class SpriteAtlas:
+    def __init__(self, square_size: int, image_dir: str = IMAGE_DIR):
+        self.square_size = square_size
+        self.image_dir = image_dir
+        # Decoded images at their original size, kept across resizes
+        self._sources: Dict[Tuple[PieceColor, PieceType], pygame.Surface] = {}
+        # Scaled (and display converted) sprites for the current square size
+        self._sprites: Dict[Tuple[PieceColor, PieceType], pygame.Surface] = {}
+        self._converted = False
+
+    def get(self, piece_color: PieceColor, piece_type: PieceType) -> pygame.Surface:
+        sprite = self._sprites.get((piece_color, piece_type))
+        if sprite is None:
+            sprite = self._build(piece_color, piece_type)
+        return sprite
+
+    def preload(self):
+        # Decode and scale every sprite up front so the first frame does no I/O
+        for piece_color in PieceColor:
+            for piece_type in PieceType:
+                self.get(piece_color, piece_type)
+
+    def resize(self, square_size: int):
+        # New square size: drop the scaled sprites, the decoded sources stay
+        if square_size != self.square_size:
+            self.square_size = square_size
+            self._sprites.clear()
+
+    def convert_for_display(self):
+        # Once a display mode is set, convert sprites to its pixel format so
+        # blits don't convert on every frame
+        if self._converted or pygame.display.get_surface() is None:
+            return
+        self._converted = True
+        for key, sprite in self._sprites.items():
+            self._sprites[key] = sprite.convert_alpha()
+
+    def _build(self, piece_color: PieceColor, piece_type: PieceType) -> pygame.Surface:
+        key = (piece_color, piece_type)
+        source = self._sources.get(key)
+        if source is None:
+            source = self._sources[key] = pygame.image.load(piece_image_path(piece_color, piece_type, self.image_dir))
+
+        size = min(self.square_size - SPRITE_MARGIN, source.get_width(), source.get_height())
+        sprite = pygame.transform.scale(source, (size, size))
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert_alpha()
+            self._converted = True
+        self._sprites[key] = sprite
+        return sprite
@@ -0,0 +1,198 @@
+# Batched positions as NumPy arrays for dataset work. A batch is a uint8 array
+# of shape (N, 12, 8, 8): planes 0-5 are the white pawn..king, 6-11 the black
+# ones, indexed [rank, file] with rank 0 = rank 1, so reshaping to (N, 12, 64)
+# gives the a1 = 0 square numbering used everywhere else. Evaluation and
+# attack counts run over the whole batch at once.
+#
+#   python batch_eval.py --positions 200000
+import argparse
+import random
+import sys
+import time
+from typing import List, Sequence, Tuple
+import numpy as np
+from chess_rules import Board, PieceColor, square_index
+from bitboard import BitboardBoard
+from fen import STARTING_FEN, board_from_fen
+from piece_square import MIDGAME_MATERIAL, MIDGAME_TABLES
+
+PLANES = 12
+
+# Centipawn values indexed by PieceType.value - 1
+MATERIAL = np.array(MIDGAME_MATERIAL[1:], dtype=np.int32)
+
+# Piece-square bonuses from White's side, one row per piece type (pawn..king),
+# a1 = index 0. Black uses the same tables mirrored vertically. Batches are
+# scored with the midgame values only, there is no phase taper
+PIECE_SQUARE_TABLES = np.array(MIDGAME_TABLES, dtype=np.int32)
+
+def _evaluation_weights() -> np.ndarray:
+    # (12 * 64,) weights so a batch scores with one matrix-vector product
+    white = MATERIAL[:, None] + PIECE_SQUARE_TABLES
+    black = -(MATERIAL[:, None] + PIECE_SQUARE_TABLES.reshape(6, 8, 8)[:, ::-1, :].reshape(6, 64))
+    return np.concatenate([white, black]).reshape(PLANES * 64).astype(np.float32)
+
+EVALUATION_WEIGHTS = _evaluation_weights()
+MATERIAL_WEIGHTS = np.concatenate([np.repeat(MATERIAL, 64), -np.repeat(MATERIAL, 64)]).astype(np.float32)
+
+def board_bitboards(board: Board) -> List[int]:
+    # The 12 piece bitboards in plane order
+    if isinstance(board, BitboardBoard):
+        return board.bitboards[0][1:] + board.bitboards[1][1:]
+    bitboards = [0] * PLANES
+    for piece in board.pieces():
+        plane = (piece.type.value - 1) + (6 if piece.color == PieceColor.BLACK else 0)
+        bitboards[plane] |= 1 << square_index(piece.x_coord, piece.y_coord)
+    return bitboards
+
+def bitboards_to_planes(bitboards: np.ndarray) -> np.ndarray:
+    # (N, 12) uint64 piece bitboards to (N, 12, 8, 8) uint8 planes
+    bitboards = bitboards.reshape(len(bitboards), PLANES)
+    # Little endian bytes, bits least significant first: bit i of each word is square i
+    bits = np.unpackbits(bitboards.astype("<u8").view(np.uint8), axis=1, bitorder="little")
+    return bits.reshape(len(bitboards), PLANES, 8, 8)
+
+def encode_boards(boards: Sequence[Board]) -> Tuple[np.ndarray, np.ndarray]:
+    # Planes (N, 12, 8, 8) uint8 plus side to move (N,) int8, +1 White, -1 Black
+    planes = bitboards_to_planes(np.array([board_bitboards(board) for board in boards], dtype=np.uint64))
+    side_to_move = np.array([1 if board.turn == PieceColor.WHITE else -1 for board in boards], dtype=np.int8)
+    return planes, side_to_move
+
+def planes_to_squares(planes: np.ndarray) -> np.ndarray:
+    # (N, 64) int8 piece codes: 0 empty, 1..6 white pawn..king, -1..-6 black
+    codes = np.concatenate([np.arange(1, 7), -np.arange(1, 7)]).astype(np.int8)
+    return np.tensordot(planes.reshape(len(planes), PLANES, 64).astype(np.int8), codes, axes=([1], [0])).astype(np.int8)
+
+def evaluate_material(planes: np.ndarray) -> np.ndarray:
+    # (N,) int32 material balance from White's side
+    return (planes.reshape(len(planes), -1).astype(np.float32) @ MATERIAL_WEIGHTS).astype(np.int32)
+
+def evaluate_batch(planes: np.ndarray, side_to_move = None) -> np.ndarray:
+    # (N,) int32 material plus piece-square score, from White's side or, given
+    # side_to_move, from the side to move's
+    scores = (planes.reshape(len(planes), -1).astype(np.float32) @ EVALUATION_WEIGHTS).astype(np.int32)
+    if side_to_move is not None:
+        scores *= side_to_move
+    return scores
+
+KNIGHT_STEPS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+KING_STEPS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+DIAGONAL_STEPS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+ORTHOGONAL_STEPS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+FILE_A = np.uint64(0x0101010101010101)
+FILE_H = np.uint64(0x8080808080808080)
+NOT_FILE_A = ~FILE_A
+NOT_FILE_H = ~FILE_H
+NOT_FILE_AB = ~(FILE_A | (FILE_A << np.uint64(1)))
+NOT_FILE_GH = ~(FILE_H | (FILE_H >> np.uint64(1)))
+
+# Attacks are worked out on uint64 bitboards (a1 = bit 0), this many
+# positions at a time so the temporaries stay in cache
+ATTACK_CHUNK = 8192
+
+def _step(bitboards: np.ndarray, rank_step: int, file_step: int) -> np.ndarray:
+    # Move every bit by the step, dropping bits that would wrap around a file edge
+    moved = _shift_bits(bitboards, rank_step * 8 + file_step)
+    if file_step == 1:
+        moved &= NOT_FILE_A
+    elif file_step == 2:
+        moved &= NOT_FILE_AB
+    elif file_step == -1:
+        moved &= NOT_FILE_H
+    elif file_step == -2:
+        moved &= NOT_FILE_GH
+    return moved
+
+def _slide(sliders: np.ndarray, empty: np.ndarray, rank_step: int, file_step: int) -> np.ndarray:
+    # Squares attacked along one direction (Kogge-Stone occluded fill). Along
+    # a single direction each square has at most one attacker, the nearest
+    # slider behind it, so the union of all sliders is still an exact count
+    shift = rank_step * 8 + file_step
+    propagate = empty
+    if file_step == 1:
+        propagate = propagate & NOT_FILE_A
+    elif file_step == -1:
+        propagate = propagate & NOT_FILE_H
+    generate = sliders | (propagate & _shift_bits(sliders, shift))
+    propagate = propagate & _shift_bits(propagate, shift)
+    generate |= propagate & _shift_bits(generate, 2 * shift)
+    propagate = propagate & _shift_bits(propagate, 2 * shift)
+    generate |= propagate & _shift_bits(generate, 4 * shift)
+    return _step(generate, rank_step, file_step)
+
+def _shift_bits(bitboards: np.ndarray, shift: int) -> np.ndarray:
+    return bitboards << np.uint64(shift) if shift > 0 else bitboards >> np.uint64(-shift)
+
+def planes_to_bitboards(planes: np.ndarray) -> np.ndarray:
+    # (N, 12) uint64, the inverse of bitboards_to_planes
+    packed = np.packbits(planes.reshape(len(planes), PLANES, 64), axis=2, bitorder="little")
+    return np.ascontiguousarray(packed).view("<u8").reshape(len(planes), PLANES).astype(np.uint64)
+
+def attack_counts(planes: np.ndarray) -> np.ndarray:
+    # (N, 2, 8, 8) uint8: how many white (index 0) and black (1) pieces attack
+    # each square. Slider rays stop on the first occupied square, which
+    # counts as attacked
+    counts = np.empty((len(planes), 2, 64), dtype=np.uint8)
+    for first in range(0, len(planes), ATTACK_CHUNK):
+        bitboards = planes_to_bitboards(planes[first:first + ATTACK_CHUNK])
+        empty = ~np.bitwise_or.reduce(bitboards, axis=1)
+        for side in range(2):
+            own = bitboards[:, side * 6:side * 6 + 6]
+            forward = 1 if side == 0 else -1
+            attacks = [_step(own[:, 0], forward, 1), _step(own[:, 0], forward, -1)]
+            attacks += [_step(own[:, 1], rank_step, file_step) for rank_step, file_step in KNIGHT_STEPS]
+            attacks += [_step(own[:, 5], rank_step, file_step) for rank_step, file_step in KING_STEPS]
+            diagonal = own[:, 2] | own[:, 4]
+            orthogonal = own[:, 3] | own[:, 4]
+            attacks += [_slide(diagonal, empty, rank_step, file_step) for rank_step, file_step in DIAGONAL_STEPS]
+            attacks += [_slide(orthogonal, empty, rank_step, file_step) for rank_step, file_step in ORTHOGONAL_STEPS]
+
+            # Every attack set holds at most one attacker per square, so the
+            # count is the number of sets a square is in
+            stacked = np.stack(attacks, axis=1).astype("<u8")
+            bits = np.unpackbits(stacked.view(np.uint8).reshape(len(stacked), len(attacks), 8), axis=2,
+                                 bitorder="little")
+            counts[first:first + ATTACK_CHUNK, side] = bits.sum(axis=1, dtype=np.uint8)
+    return counts.reshape(len(planes), 2, 8, 8)
+
+def random_boards(count: int, seed: int = 1, max_plies: int = 80) -> List[Board]:
+    # Positions from random playouts, for benchmarks and checks
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        board = board_from_fen(STARTING_FEN, BitboardBoard)
+        for _ in range(rng.randrange(max_plies)):
+            moves = board.legal_moves()
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+        boards.append(board.copy())
+    return boards
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch evaluation throughput")
+    parser.add_argument("--positions", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=2000, help="random positions to encode, tiled up to --positions")
+    args = parser.parse_args(argv)
+
+    boards = random_boards(args.distinct)
+    start = time.perf_counter()
+    planes, side_to_move = encode_boards(boards)
+    elapsed = time.perf_counter() - start
+    print("encode     %10.0f positions/sec" % (len(boards) / elapsed))
+
+    repeats = max(1, args.positions // len(boards))
+    planes = np.tile(planes, (repeats, 1, 1, 1))
+    side_to_move = np.tile(side_to_move, repeats)
+    for name, function in (("material", lambda: evaluate_material(planes)),
+                           ("evaluate", lambda: evaluate_batch(planes, side_to_move)),
+                           ("attacks", lambda: attack_counts(planes))):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        print("%-10s %10.0f positions/sec" % (name, len(planes) / elapsed))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,561 @@
+# Bitboard backend for Board: per-color and per-type occupancy kept in 64-bit
+# ints (a1 = bit 0, h8 = bit 63) with table based attack generation.
+from typing import List, Tuple
+from chess_rules import Board, Piece, PieceColor, PieceType, SquareOccupationType, EmptyObject, square_index, \
+    CASTLING_MOVES, CASTLING_PIECES, PROMOTION_TYPES
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+
+WHITE_INDEX = 0
+BLACK_INDEX = 1
+
+def color_index(color: PieceColor) -> int:
+    return WHITE_INDEX if color == PieceColor.WHITE else BLACK_INDEX
+
+def iter_squares(bitboard: int):
+    # Yield square numbers of set bits, lowest first
+    while bitboard:
+        bit = bitboard & -bitboard
+        yield bit.bit_length() - 1
+        bitboard ^= bit
+
+def _flip(bitboard: int) -> int:
+    # Mirror ranks (byte swap), used by hyperbola quintessence
+    return int.from_bytes(bitboard.to_bytes(8, "big"), "little")
+
+def _step_attacks(offsets: List[Tuple[int, int]]) -> List[int]:
+    table = []
+    for square in range(64):
+        file = square & 7
+        rank = square >> 3
+        attacks = 0
+        for file_step, rank_step in offsets:
+            new_file = file + file_step
+            new_rank = rank + rank_step
+            if 0 <= new_file <= 7 and 0 <= new_rank <= 7:
+                attacks |= 1 << (new_rank * 8 + new_file)
+        table.append(attacks)
+    return table
+
+def _line_mask(square: int, file_step: int, rank_step: int) -> int:
+    # Both rays through square along one line, excluding the square itself
+    mask = 0
+    for sign in (1, -1):
+        file = (square & 7) + sign * file_step
+        rank = (square >> 3) + sign * rank_step
+        while 0 <= file <= 7 and 0 <= rank <= 7:
+            mask |= 1 << (rank * 8 + file)
+            file += sign * file_step
+            rank += sign * rank_step
+    return mask
+
+def _first_rank_attacks() -> List[List[int]]:
+    # RANK_ATTACKS[file][inner occupancy] for a slider on the first rank, the
+    # inner occupancy is the six bits b..g since the edges never block
+    table = []
+    for file in range(8):
+        row = []
+        for inner in range(64):
+            occupancy = inner << 1
+            attacks = 0
+            for step in (1, -1):
+                current = file + step
+                while 0 <= current <= 7:
+                    attacks |= 1 << current
+                    if occupancy & (1 << current):
+                        break
+                    current += step
+            row.append(attacks)
+        table.append(row)
+    return table
+
+KNIGHT_ATTACKS = _step_attacks([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _step_attacks([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+PAWN_ATTACKS = [_step_attacks([(1, 1), (-1, 1)]), _step_attacks([(1, -1), (-1, -1)])]
+
+FILE_MASKS = [_line_mask(square, 0, 1) for square in range(64)]
+DIAGONAL_MASKS = [_line_mask(square, 1, 1) for square in range(64)]
+ANTI_DIAGONAL_MASKS = [_line_mask(square, -1, 1) for square in range(64)]
+RANK_ATTACKS = _first_rank_attacks()
+
+def _line_attacks(occupied: int, square: int, mask: int) -> int:
+    # Hyperbola quintessence: (o - 2s) ^ flip(flip(o) - 2 flip(s)) on one line
+    bit = 1 << square
+    line = occupied & mask
+    forward = (line - (bit << 1)) & FULL
+    reverse = _flip((_flip(line) - (_flip(bit) << 1)) & FULL)
+    return (forward ^ reverse) & mask
+
+def _rank_attacks(occupied: int, square: int) -> int:
+    shift = square & 56
+    return RANK_ATTACKS[square & 7][(occupied >> (shift + 1)) & 63] << shift
+
+def _hyperbola_bishop_attacks(occupied: int, square: int) -> int:
+    return _line_attacks(occupied, square, DIAGONAL_MASKS[square]) | \
+        _line_attacks(occupied, square, ANTI_DIAGONAL_MASKS[square])
+
+def _hyperbola_rook_attacks(occupied: int, square: int) -> int:
+    return _line_attacks(occupied, square, FILE_MASKS[square]) | _rank_attacks(occupied, square)
+
+# Relevant occupancy masks: the edge square of each ray never changes the attack set
+EDGES = 0xFF | (0xFF << 56) | FILE_A | FILE_H
+BISHOP_MASKS = [(DIAGONAL_MASKS[square] | ANTI_DIAGONAL_MASKS[square]) & ~EDGES & FULL for square in range(64)]
+ROOK_MASKS = [((FILE_MASKS[square] & ~(0xFF | (0xFF << 56))) | ((0x7E << (square & 56)) & ~(1 << square))) & FULL
+              for square in range(64)]
+
+# Per square attack tables keyed on relevant occupancy. Python dicts play the part
+# of the magic multiply/shift hash and are filled by hyperbola quintessence the
+# first time an occupancy pattern is seen, so import stays cheap
+BISHOP_TABLES = [{} for _ in range(64)]
+ROOK_TABLES = [{} for _ in range(64)]
+
+def bishop_attacks(occupied: int, square: int) -> int:
+    key = occupied & BISHOP_MASKS[square]
+    table = BISHOP_TABLES[square]
+    attacks = table.get(key)
+    if attacks is None:
+        attacks = table[key] = _hyperbola_bishop_attacks(key, square)
+    return attacks
+
+def rook_attacks(occupied: int, square: int) -> int:
+    key = occupied & ROOK_MASKS[square]
+    table = ROOK_TABLES[square]
+    attacks = table.get(key)
+    if attacks is None:
+        attacks = table[key] = _hyperbola_rook_attacks(key, square)
+    return attacks
+
+def queen_attacks(occupied: int, square: int) -> int:
+    return bishop_attacks(occupied, square) | rook_attacks(occupied, square)
+
+def _line_tables() -> Tuple[List[List[int]], List[List[int]]]:
+    # BETWEEN[a][b]: squares strictly between two aligned squares, LINE[a][b]:
+    # the whole board line through both. Both are 0 when a and b don't share a line
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        for masks in (FILE_MASKS, DIAGONAL_MASKS, ANTI_DIAGONAL_MASKS):
+            for other in iter_squares(masks[square]):
+                line[square][other] = masks[square] | (1 << square)
+        rank = 0xFF << (square & 56)
+        for other in iter_squares(rank & ~(1 << square)):
+            line[square][other] = rank
+        for other in range(64):
+            if line[square][other]:
+                # Rays from each end meet exactly on the squares in between
+                between[square][other] = _hyperbola_queen_attacks(1 << other, square) & \
+                    _hyperbola_queen_attacks(1 << square, other) & line[square][other]
+    return between, line
+
+def _hyperbola_queen_attacks(occupied: int, square: int) -> int:
+    return _hyperbola_bishop_attacks(occupied, square) | _hyperbola_rook_attacks(occupied, square)
+
+BETWEEN, LINE = _line_tables()
+
+RANK_1 = 0xFF
+RANK_8 = 0xFF << 56
+
+# Encoded move tuples keyed on (targets, from square) for pieces and on
+# (targets, push/capture delta + 16) for pawns. Turning a target bitboard into moves
+# is the costliest part of generation in Python, and the same patterns repeat
+# constantly, so they are memoised and the cache is dropped once it grows too big
+MOVE_LISTS = {}
+PAWN_MOVE_LISTS = {}
+MOVE_LIST_LIMIT = 1 << 18
+
+def _fill_move_list(cache: dict, key: int, square, targets: int, delta: int) -> Tuple[int, ...]:
+    moves = []
+    while targets:
+        bit = targets & -targets
+        targets ^= bit
+        to = bit.bit_length() - 1
+        moves.append((square if square is not None else to - delta) | (to << 6))
+
+    if len(cache) >= MOVE_LIST_LIMIT:
+        cache.clear()
+    move_list = cache[key] = tuple(moves)
+    return move_list
+
+# Plain int piece type indexes for the hot loops (enum attribute access is slow)
+PAWN = PieceType.PAWN.value
+KNIGHT = PieceType.KNIGHT.value
+BISHOP = PieceType.BISHOP.value
+ROOK = PieceType.ROOK.value
+QUEEN = PieceType.QUEEN.value
+KING = PieceType.KING.value
+LEAPER_TABLES = ((PieceType.KNIGHT.value, KNIGHT_ATTACKS), (PieceType.KING.value, KING_ATTACKS))
+SLIDER_FUNCTIONS = ((PieceType.BISHOP.value, bishop_attacks), (PieceType.ROOK.value, rook_attacks),
+                    (PieceType.QUEEN.value, queen_attacks))
+
+class BitboardBoard(Board):
+    def generate_moves(self, color = None) -> List[int]:
+        # Same move set as Board.generate_moves, built from set-wise pawn
+        # shifts and attack tables instead of per-square probing
+        us = (self.turn if color is None else color)._value_ - 1
+        pieces = self.bitboards[us]
+        own = self.occupancy[us]
+        enemy = self.occupancy[us ^ 1]
+        occupied = own | enemy
+        not_own = FULL ^ own
+        moves = []
+        extend = moves.extend
+        move_lists = MOVE_LISTS
+
+        for piece_type, table in LEAPER_TABLES:
+            movers = pieces[piece_type]
+            while movers:
+                bit = movers & -movers
+                movers ^= bit
+                square = bit.bit_length() - 1
+                targets = table[square] & not_own
+                key = (targets << 6) | square
+                move_list = move_lists.get(key)
+                if move_list is None:
+                    move_list = _fill_move_list(move_lists, key, square, targets, 0)
+                extend(move_list)
+
+        for piece_type, attack_function in SLIDER_FUNCTIONS:
+            movers = pieces[piece_type]
+            while movers:
+                bit = movers & -movers
+                movers ^= bit
+                square = bit.bit_length() - 1
+                targets = attack_function(occupied, square) & not_own
+                key = (targets << 6) | square
+                move_list = move_lists.get(key)
+                if move_list is None:
+                    move_list = _fill_move_list(move_lists, key, square, targets, 0)
+                extend(move_list)
+
+        pawns = pieces[PAWN]
+        if pawns:
+            empty = FULL ^ occupied
+            capture_mask = enemy | self._en_passant_bit()
+            unmoved = pawns & self.unmoved_pawns
+            if us == WHITE_INDEX:
+                pawn_targets = (((pawns << 8) & empty, 8),
+                                ((((unmoved << 8) & empty) << 8) & empty, 16),
+                                (((pawns & ~FILE_A) << 7) & capture_mask, 7),
+                                (((pawns & ~FILE_H) << 9) & capture_mask, 9))
+            else:
+                pawn_targets = (((pawns >> 8) & empty, -8),
+                                ((((unmoved >> 8) & empty) >> 8) & empty, -16),
+                                (((pawns & ~FILE_A) >> 9) & capture_mask, -9),
+                                (((pawns & ~FILE_H) >> 7) & capture_mask, -7))
+            for targets, delta in pawn_targets:
+                if targets:
+                    key = (targets << 6) | (delta + 16)
+                    move_list = PAWN_MOVE_LISTS.get(key)
+                    if move_list is None:
+                        move_list = _fill_move_list(PAWN_MOVE_LISTS, key, None, targets, delta)
+                    extend(move_list)
+
+        return moves
+
+    def legal_moves(self) -> List[int]:
+        # Fully legal moves generated directly: the checkers and pinned pieces are
+        # found first and every target set is masked with them, so no move is
+        # played and taken back to test for check
+        us = self.turn._value_ - 1
+        them = us ^ 1
+        pieces = self.bitboards[us]
+        enemy_pieces = self.bitboards[them]
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        occupied = own | enemy
+        king_bb = pieces[KING]
+        if not king_bb:
+            # Positions without a king (analysis setups) fall back to the filter
+            return Board.legal_moves(self)
+        king = king_bb.bit_length() - 1
+
+        moves = []
+        extend = moves.extend
+        move_lists = MOVE_LISTS
+
+        # King moves: squares the enemy attacks once our king no longer blocks its rays
+        danger = self._attacks_by(them, occupied ^ king_bb)
+        targets = KING_ATTACKS[king] & ~own & ~danger
+        if targets:
+            key = (targets << 6) | king
+            move_list = move_lists.get(key)
+            if move_list is None:
+                move_list = _fill_move_list(move_lists, key, king, targets, 0)
+            extend(move_list)
+
+        checkers = self._attackers_of(king, us, occupied)
+        if checkers & (checkers - 1):
+            # Double check, only the king can move
+            return moves
+        if checkers:
+            check_mask = checkers | BETWEEN[king][checkers.bit_length() - 1]
+        else:
+            check_mask = FULL
+            self._add_castling_moves(moves, us, occupied, danger)
+
+        # A piece is pinned when it is the only thing between our king and an
+        # enemy slider on the same line, it may then only move along that line
+        pinned = 0
+        snipers = (rook_attacks(0, king) & (enemy_pieces[ROOK] | enemy_pieces[QUEEN])) | \
+            (bishop_attacks(0, king) & (enemy_pieces[BISHOP] | enemy_pieces[QUEEN]))
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            blockers = BETWEEN[king][bit.bit_length() - 1] & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & own:
+                pinned |= blockers
+
+        target_mask = ~own & check_mask
+        for piece_type, table in ((KNIGHT, KNIGHT_ATTACKS),):
+            movers = pieces[piece_type] & ~pinned
+            while movers:
+                bit = movers & -movers
+                movers ^= bit
+                square = bit.bit_length() - 1
+                targets = table[square] & target_mask
+                if targets:
+                    key = (targets << 6) | square
+                    move_list = move_lists.get(key)
+                    if move_list is None:
+                        move_list = _fill_move_list(move_lists, key, square, targets, 0)
+                    extend(move_list)
+
+        for piece_type, attack_function in SLIDER_FUNCTIONS:
+            movers = pieces[piece_type]
+            while movers:
+                bit = movers & -movers
+                movers ^= bit
+                square = bit.bit_length() - 1
+                targets = attack_function(occupied, square) & target_mask
+                if bit & pinned:
+                    targets &= LINE[king][square]
+                if targets:
+                    key = (targets << 6) | square
+                    move_list = move_lists.get(key)
+                    if move_list is None:
+                        move_list = _fill_move_list(move_lists, key, square, targets, 0)
+                    extend(move_list)
+
+        pawns = pieces[PAWN]
+        if pawns:
+            self._add_pawn_moves(moves, us, pawns, occupied, enemy, check_mask, pinned, king)
+            if not isinstance(self.en_passant, EmptyObject):
+                self._add_en_passant_moves(moves, us, pawns, occupied, king)
+
+        return moves
+
+    def in_check(self, color = None) -> bool:
+        us = (self.turn if color is None else color)._value_ - 1
+        king_bb = self.bitboards[us][KING]
+        if not king_bb:
+            return False
+        return self._attackers_of(king_bb.bit_length() - 1, us, self.occupancy[0] | self.occupancy[1]) != 0
+
+    def king_square(self, color: PieceColor):
+        king_bb = self.bitboards[color._value_ - 1][KING]
+        return king_bb.bit_length() - 1 if king_bb else None
+
+    def is_square_attacked(self, square: int, by_color: PieceColor) -> bool:
+        them = by_color._value_ - 1
+        return self._attackers_of(square, them ^ 1, self.occupancy[0] | self.occupancy[1]) != 0
+
+    def _attackers_of(self, square: int, us: int, occupied: int) -> int:
+        # Enemy pieces (relative to side index us) attacking square
+        enemy_pieces = self.bitboards[us ^ 1]
+        return (KNIGHT_ATTACKS[square] & enemy_pieces[KNIGHT]) | \
+            (PAWN_ATTACKS[us][square] & enemy_pieces[PAWN]) | \
+            (KING_ATTACKS[square] & enemy_pieces[KING]) | \
+            (bishop_attacks(occupied, square) & (enemy_pieces[BISHOP] | enemy_pieces[QUEEN])) | \
+            (rook_attacks(occupied, square) & (enemy_pieces[ROOK] | enemy_pieces[QUEEN]))
+
+    def _attacks_by(self, side: int, occupied: int) -> int:
+        pieces = self.bitboards[side]
+        pawns = pieces[PAWN]
+        if side == WHITE_INDEX:
+            attacks = (((pawns & ~FILE_A) << 7) | ((pawns & ~FILE_H) << 9)) & FULL
+        else:
+            attacks = ((pawns & ~FILE_A) >> 9) | ((pawns & ~FILE_H) >> 7)
+        for piece_type, table in LEAPER_TABLES:
+            movers = pieces[piece_type]
+            while movers:
+                bit = movers & -movers
+                movers ^= bit
+                attacks |= table[bit.bit_length() - 1]
+        for piece_type, attack_function in SLIDER_FUNCTIONS:
+            movers = pieces[piece_type]
+            while movers:
+                bit = movers & -movers
+                movers ^= bit
+                attacks |= attack_function(occupied, bit.bit_length() - 1)
+        return attacks
+
+    def _add_castling_moves(self, moves: List[int], us: int, occupied: int, danger: int):
+        rooks = self.bitboards[us][ROOK]
+        for right, (king_from, king_to, empty_squares, king_squares) in CASTLING_MOVES.items():
+            if not self.castling & right or CASTLING_PIECES[right][0]._value_ - 1 != us:
+                continue
+            if not rooks >> CASTLING_PIECES[right][2] & 1:
+                continue
+            if any(occupied >> square & 1 for square in empty_squares):
+                continue
+            if any(danger >> square & 1 for square in king_squares):
+                continue
+            moves.append(king_from | (king_to << 6))
+
+    def _add_pawn_moves(self, moves: List[int], us: int, pawns: int, occupied: int, enemy: int,
+                        check_mask: int, pinned: int, king: int):
+        empty = FULL ^ occupied
+        free = pawns & ~pinned
+        groups = [(free, FULL)]
+        # Pinned pawns are rare, each gets its own pass restricted to its pin line
+        pinned_pawns = pawns & pinned
+        while pinned_pawns:
+            bit = pinned_pawns & -pinned_pawns
+            pinned_pawns ^= bit
+            groups.append((bit, LINE[king][bit.bit_length() - 1]))
+
+        for movers, line in groups:
+            mask = check_mask & line
+            unmoved = movers & self.unmoved_pawns
+            if us == WHITE_INDEX:
+                single = (movers << 8) & empty
+                pawn_targets = ((single & mask, 8),
+                                (((unmoved << 8) & empty) << 8 & empty & mask, 16),
+                                (((movers & ~FILE_A) << 7) & enemy & mask, 7),
+                                (((movers & ~FILE_H) << 9) & enemy & mask, 9))
+            else:
+                single = (movers >> 8) & empty
+                pawn_targets = ((single & mask, -8),
+                                (((unmoved >> 8) & empty) >> 8 & empty & mask, -16),
+                                (((movers & ~FILE_A) >> 9) & enemy & mask, -9),
+                                (((movers & ~FILE_H) >> 7) & enemy & mask, -7))
+            for targets, delta in pawn_targets:
+                targets &= FULL
+                promotions = targets & (RANK_1 | RANK_8)
+                targets ^= promotions
+                if targets:
+                    key = (targets << 6) | (delta + 16)
+                    move_list = PAWN_MOVE_LISTS.get(key)
+                    if move_list is None:
+                        move_list = _fill_move_list(PAWN_MOVE_LISTS, key, None, targets, delta)
+                    moves.extend(move_list)
+                while promotions:
+                    bit = promotions & -promotions
+                    promotions ^= bit
+                    to = bit.bit_length() - 1
+                    base = (to - delta) | (to << 6)
+                    moves.extend([base | (promotion << 12) for promotion in PROMOTION_TYPES])
+
+    def _add_en_passant_moves(self, moves: List[int], us: int, pawns: int, occupied: int, king: int):
+        # En passant removes two pawns from one rank, which can expose the king
+        # in ways pin detection doesn't see, so test the resulting occupancy
+        target = square_index(self.en_passant[0], self.en_passant[1])
+        captured_bit = 1 << (target - 8 if us == WHITE_INDEX else target + 8)
+        enemy_pieces = self.bitboards[us ^ 1]
+        if not captured_bit & enemy_pieces[PAWN]:
+            return
+        capturers = PAWN_ATTACKS[us ^ 1][target] & pawns
+        while capturers:
+            bit = capturers & -capturers
+            capturers ^= bit
+            after = (occupied ^ bit ^ captured_bit) | (1 << target)
+            if (bishop_attacks(after, king) & (enemy_pieces[BISHOP] | enemy_pieces[QUEEN])) or \
+                (rook_attacks(after, king) & (enemy_pieces[ROOK] | enemy_pieces[QUEEN])) or \
+                (KNIGHT_ATTACKS[king] & enemy_pieces[KNIGHT]) or \
+                (PAWN_ATTACKS[us][king] & enemy_pieces[PAWN] & ~captured_bit):
+                continue
+            moves.append((bit.bit_length() - 1) | (target << 6))
+
+    def _place_piece(self, piece: Piece, x_coord: int, y_coord: int):
+        super()._place_piece(piece, x_coord, y_coord)
+        bit = 1 << ((7 - y_coord) * 8 + x_coord)
+        index = piece.color._value_ - 1
+        self.bitboards[index][piece.type._value_] |= bit
+        self.occupancy[index] |= bit
+        if piece.type is PieceType.PAWN and not piece.moved:
+            self.unmoved_pawns |= bit
+
+    def _remove_piece(self, x_coord: int, y_coord: int):
+        piece = super()._remove_piece(x_coord, y_coord)
+        if piece is not None:
+            clear = FULL ^ (1 << ((7 - y_coord) * 8 + x_coord))
+            index = piece.color._value_ - 1
+            self.bitboards[index][piece.type._value_] &= clear
+            self.occupancy[index] &= clear
+            self.unmoved_pawns &= clear
+        return piece
+
+    def _en_passant_bit(self) -> int:
+        if isinstance(self.en_passant, EmptyObject):
+            return 0
+        return 1 << square_index(self.en_passant[0], self.en_passant[1])
+
+    def _squares_from_bitboard(self, targets: int, enemy: int) -> List[Tuple[int, int, SquareOccupationType]]:
+        squares = []
+        for square in iter_squares(targets):
+            occupation_type = SquareOccupationType.ENEMY if enemy >> square & 1 else SquareOccupationType.EMPTY
+            squares.append([square & 7, 7 - (square >> 3), occupation_type])
+        return squares
+
+    def _get_legal_pawn_squares(self, x_coord: int, y_coord: int, color: PieceColor, moved: bool) -> List[Tuple[int, int, SquareOccupationType]]:
+        squares = []
+        square = square_index(x_coord, y_coord)
+        us = color_index(color)
+        occupied = self.occupancy[0] | self.occupancy[1]
+
+        if us == WHITE_INDEX:
+            y_offset = -1
+            step = 8
+        else:
+            y_offset = 1
+            step = -8
+
+        # Single push, double push from the first move and diagonal captures
+        if 0 <= square + step <= 63 and not occupied >> (square + step) & 1:
+            squares.append((x_coord, y_coord + y_offset, SquareOccupationType.EMPTY))
+
+        for to in iter_squares(PAWN_ATTACKS[us][square] & (self.occupancy[us ^ 1] | self._en_passant_bit())):
+            squares.append((to & 7, y_coord + y_offset, SquareOccupationType.ENEMY))
+
+        if not moved and 0 <= square + 2 * step <= 63 and not occupied >> (square + step) & 1 and \
+            not occupied >> (square + 2 * step) & 1:
+            squares.append((x_coord, y_coord + (y_offset * 2), SquareOccupationType.EMPTY))
+
+        return squares
+
+    def _get_legal_knight_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        us = color_index(color)
+        targets = KNIGHT_ATTACKS[square_index(x_coord, y_coord)] & ~self.occupancy[us]
+        return self._squares_from_bitboard(targets, self.occupancy[us ^ 1])
+
+    def _get_legal_bishop_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        us = color_index(color)
+        occupied = self.occupancy[0] | self.occupancy[1]
+        targets = bishop_attacks(occupied, square_index(x_coord, y_coord)) & ~self.occupancy[us]
+        return self._squares_from_bitboard(targets, self.occupancy[us ^ 1])
+
+    def _get_legal_rook_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        us = color_index(color)
+        occupied = self.occupancy[0] | self.occupancy[1]
+        targets = rook_attacks(occupied, square_index(x_coord, y_coord)) & ~self.occupancy[us]
+        return self._squares_from_bitboard(targets, self.occupancy[us ^ 1])
+
+    def _get_legal_queen_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        us = color_index(color)
+        occupied = self.occupancy[0] | self.occupancy[1]
+        targets = queen_attacks(occupied, square_index(x_coord, y_coord)) & ~self.occupancy[us]
+        return self._squares_from_bitboard(targets, self.occupancy[us ^ 1])
+
+    def _get_legal_king_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        us = color_index(color)
+        targets = KING_ATTACKS[square_index(x_coord, y_coord)] & ~self.occupancy[us]
+        return self._squares_from_bitboard(targets, self.occupancy[us ^ 1])
+
+    def _reset(self):
+        super()._reset()
+        # bitboards[color][PieceType.value], index 0 is unused
+        self.bitboards = [[0] * 7, [0] * 7]
+        self.occupancy = [0, 0]
+        self.unmoved_pawns = 0
@@ -0,0 +1,173 @@
+# Opening book: a file of fixed-width (Zobrist key, move, weight) records
+# sorted by key. Lookups binary search a read-only mmap of the file, so opening
+# a book parses nothing and every process that opens it shares the same pages
+# through the OS page cache.
+#
+#   python book.py build --out book.bin games1.pgn games2.pgn
+#   python book.py probe book.bin --fen "..."
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from chess_rules import Board, PieceColor, move_to_uci
+from bitboard import BitboardBoard
+from fen import STARTING_FEN, board_from_fen
+from pgn import iter_moves, read_games_from_path, start_board
+
+# key, move, weight
+RECORD = struct.Struct(">QHH")
+MAX_WEIGHT = 0xFFFF
+
+# Points a move earns for the side that played it. Unfinished games and
+# unknown results are left out of the book
+RESULT_POINTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}
+
+class OpeningBook:
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size % RECORD.size:
+            self._file.close()
+            raise ValueError(path + " is not a book file")
+        self.entries = size // RECORD.size
+        # mmap refuses empty files
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def probe(self, key: int) -> List[Tuple[int, int]]:
+        # (move, weight) for every record of the position, heaviest first
+        data = self._map
+        unpack_from = RECORD.unpack_from
+        low = 0
+        high = self.entries
+        # First record with a key not below the one wanted
+        while low < high:
+            middle = (low + high) // 2
+            if unpack_from(data, middle * RECORD.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        while low < self.entries:
+            record_key, move, weight = unpack_from(data, low * RECORD.size)
+            if record_key != key:
+                break
+            moves.append((move, weight))
+            low += 1
+        moves.sort(key=lambda entry: -entry[1])
+        return moves
+
+    def choose(self, board: Board, rng: Optional[random.Random] = None) -> int:
+        # A legal book move for the position picked in proportion to its
+        # weight, 0 when the position is not in the book
+        legal = set(board.legal_moves())
+        moves = [(move, weight) for move, weight in self.probe(board.hash) if move in legal]
+        if not moves:
+            return 0
+        total = sum(weight for _, weight in moves)
+        pick = (rng or random).randrange(total)
+        for move, weight in moves:
+            pick -= weight
+            if pick < 0:
+                return move
+        return moves[-1][0]
+
+    def close(self):
+        if self.entries:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def collect_moves(pgn_paths: Iterable[str], max_plies: int = 20) -> Dict[int, Dict[int, int]]:
+    # Result points per position key and move over the first max_plies of
+    # every game, summed as the games stream past. Memory grows with the
+    # distinct positions of the book, not with the number of games
+    weights = {}
+    for path in pgn_paths:
+        for game in read_games_from_path(path):
+            points = RESULT_POINTS.get(game.result)
+            if points is None:
+                continue
+            board = start_board(game)
+            ply = 0
+            key = board.hash
+            turn = board.turn
+            try:
+                for move in iter_moves(game, board):
+                    moves = weights.get(key)
+                    if moves is None:
+                        moves = weights[key] = {}
+                    moves[move] = moves.get(move, 0) + (points[0] if turn == PieceColor.WHITE else points[1])
+                    ply += 1
+                    if ply >= max_plies:
+                        break
+                    key = board.hash
+                    turn = board.turn
+            except ValueError:
+                # Keep what came before an illegal or unreadable move
+                pass
+    return weights
+
+def write_book(weights: Dict[int, Dict[int, int]], out_path: str, min_weight: int = 1) -> int:
+    # Records sorted by key then move, written a position at a time; weights
+    # are scaled down together if any would overflow
+    largest = max((max(moves.values()) for moves in weights.values()), default=0)
+    scale = MAX_WEIGHT / largest if largest > MAX_WEIGHT else 1.0
+    count = 0
+    with open(out_path, "wb") as file:
+        for key in sorted(weights):
+            moves = weights[key]
+            for move in sorted(moves):
+                weight = moves[move]
+                if weight < min_weight:
+                    continue
+                file.write(RECORD.pack(key, move, max(1, int(weight * scale))))
+                count += 1
+    return count
+
+def build_book(pgn_paths: Iterable[str], out_path: str, max_plies: int = 20, min_weight: int = 1) -> int:
+    return write_book(collect_moves(pgn_paths, max_plies), out_path, min_weight)
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Build or probe an opening book")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a book from PGN files")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("--out", required=True)
+    build.add_argument("--max-plies", type=int, default=20)
+    build.add_argument("--min-weight", type=int, default=1, help="drop moves with fewer result points")
+    probe = commands.add_parser("probe", help="list the book moves for a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", default=STARTING_FEN)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        count = build_book(args.pgn, args.out, args.max_plies, args.min_weight)
+        print("%d entries written to %s in %.1fs" % (count, args.out, time.perf_counter() - start))
+        return 0
+
+    board = board_from_fen(args.fen, BitboardBoard)
+    with OpeningBook(args.book) as book:
+        repeats = 10000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            moves = book.probe(board.hash)
+        elapsed = time.perf_counter() - start
+        for move, weight in moves:
+            print("%s %d" % (move_to_uci(move), weight))
+        print("%d entries, probe %.1f us" % (book.entries, elapsed / repeats * 1e6))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,724 @@
+# Headless chess rules: pieces, board state and move generation.
+# Nothing in here imports pygame, so it can be used on servers without a display.
+from enum import Enum
+from typing import Callable, Dict, List, Tuple
+from zobrist import BLACK_TO_MOVE_KEY, CASTLING_KEYS, EN_PASSANT_KEYS, PIECE_KEYS
+from piece_square import ENDGAME_SCORES, MIDGAME_SCORES, PHASE_WEIGHTS
+
+class EmptyObject:
+    pass
+
+class SquareOccupationType(Enum):
+    SELF = 1
+    EMPTY = 2
+    FRIEND = 3
+    ENEMY = 4
+
+class PieceColor(Enum):
+    WHITE = 1
+    BLACK = 2
+
+class PieceType(Enum):
+    PAWN = 1
+    KNIGHT = 2
+    BISHOP = 3
+    ROOK = 4
+    QUEEN = 5
+    KING = 6
+
+class GameState(Enum):
+    ONGOING = 1
+    CHECKMATE = 2
+    STALEMATE = 3
+
+class Piece:
+    def __init__(self, piece_color: PieceColor, piece_type: PieceType):
+        # Set piece color
+        self.color = piece_color
+
+        # Set piece type
+        self.type = piece_type
+
+        # Set square coord position
+        self.x_coord = 0
+        self.y_coord = 0
+
+        # Set if piece has moved
+        self.moved = False
+
+        # Have captured flag
+        self.captured = False
+
+    def set_square(self, x_coord: int, y_coord: int):
+        # Verify input
+        if x_coord > 8 or x_coord < 0 or y_coord > 8 or y_coord < 0:
+            return
+
+        # Set coords
+        self.x_coord = x_coord
+        self.y_coord = y_coord
+
+        # Promote pawn if at last rank
+        if self.type == PieceType.PAWN:
+            if y_coord == 0 and self.color == PieceColor.WHITE:
+                self.set_type(PieceType.QUEEN)
+            elif y_coord == 7 and self.color == PieceColor.BLACK:
+                self.set_type(PieceType.QUEEN)
+
+    def set_type(self, piece_type: PieceType):
+        # Promotion and taking a promotion back both change type through here
+        self.type = piece_type
+
+    def set_square_str(self, square: str):
+        # Calculate new square coords
+        x_coord = ord(square[0]) - 97
+        y_coord = int(square[1]) - 1
+        y_coord = 7 - y_coord
+        self.set_square(x_coord, y_coord)
+
+    def move(self, x_coord: int, y_coord: int):
+        self.set_square(x_coord, y_coord)
+        self.moved = True
+
+    def set_captured(self, captured = True):
+        self.captured = captured
+
+def square_index(x_coord: int, y_coord: int) -> int:
+    # Square number with a1 = 0 and h8 = 63 (y_coord 0 is the eighth rank)
+    return (7 - y_coord) * 8 + x_coord
+
+def square_coords(square: int) -> Tuple[int, int]:
+    return square & 7, 7 - (square >> 3)
+
+# Moves are packed into an int: from square, to square and promotion type
+def encode_move(from_square: int, to_square: int, promotion: int = 0) -> int:
+    return from_square | (to_square << 6) | (promotion << 12)
+
+def move_from_square(move: int) -> int:
+    return move & 63
+
+def move_to_square(move: int) -> int:
+    return (move >> 6) & 63
+
+def move_promotion(move: int) -> int:
+    return move >> 12
+
+PROMOTION_LETTERS = {PieceType.KNIGHT.value: "n", PieceType.BISHOP.value: "b",
+                     PieceType.ROOK.value: "r", PieceType.QUEEN.value: "q"}
+
+def square_name(square: int) -> str:
+    return chr(97 + (square & 7)) + str((square >> 3) + 1)
+
+def move_to_uci(move: int) -> str:
+    # Long algebraic notation, e.g. e2e4 or e7e8q
+    return square_name(move_from_square(move)) + square_name(move_to_square(move)) + \
+        PROMOTION_LETTERS.get(move_promotion(move), "")
+
+# Castling rights bitmask
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+
+# Right -> (color, king square, rook square) that must hold unmoved pieces
+CASTLING_PIECES = {
+    WHITE_KINGSIDE: (PieceColor.WHITE, 4, 7),
+    WHITE_QUEENSIDE: (PieceColor.WHITE, 4, 0),
+    BLACK_KINGSIDE: (PieceColor.BLACK, 60, 63),
+    BLACK_QUEENSIDE: (PieceColor.BLACK, 60, 56),
+}
+
+# Rights kept when a move touches a square: moving the king or a rook, or
+# capturing a rook on its home square, clears the matching rights
+CASTLING_MASKS = [15] * 64
+for _right, (_color, _king_square, _rook_square) in CASTLING_PIECES.items():
+    CASTLING_MASKS[_king_square] &= ~_right
+    CASTLING_MASKS[_rook_square] &= ~_right
+
+# Castling right -> (king from, king to, squares that must be empty, squares the
+# king stands on or crosses, which must not be attacked)
+CASTLING_MOVES = {
+    WHITE_KINGSIDE: (4, 6, (5, 6), (4, 5, 6)),
+    WHITE_QUEENSIDE: (4, 2, (1, 2, 3), (4, 3, 2)),
+    BLACK_KINGSIDE: (60, 62, (61, 62), (60, 61, 62)),
+    BLACK_QUEENSIDE: (60, 58, (57, 58, 59), (60, 59, 58)),
+}
+
+# Promotion choices, queen first so callers that keep one move per square keep the queen
+PROMOTION_TYPES = [PieceType.QUEEN.value, PieceType.ROOK.value, PieceType.BISHOP.value, PieceType.KNIGHT.value]
+
+KNIGHT_OFFSETS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+KING_OFFSETS = [(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)]
+
+def other_color(color: PieceColor) -> PieceColor:
+    return PieceColor.BLACK if color == PieceColor.WHITE else PieceColor.WHITE
+
+# Positions whose move tables Board keeps around (oldest dropped first)
+MOVE_TABLE_CACHE_SIZE = 64
+
+# Back rank layout from the a-file to the h-file
+BACK_RANK = [PieceType.ROOK, PieceType.KNIGHT, PieceType.BISHOP, PieceType.QUEEN,
+             PieceType.KING, PieceType.BISHOP, PieceType.KNIGHT, PieceType.ROOK]
+
+def starting_pieces(make_piece: Callable[[PieceColor, PieceType], Piece] = Piece) -> List[Piece]:
+    # Build the 32 pieces of the initial position, make_piece lets callers
+    # supply their own Piece subclass (e.g. one that carries a sprite)
+    pieces = []
+    for color, pawn_rank, back_rank in [(PieceColor.WHITE, "2", "1"), (PieceColor.BLACK, "7", "8")]:
+        for file_index in range(8):
+            file = chr(97 + file_index)
+
+            pawn = make_piece(color, PieceType.PAWN)
+            pawn.set_square_str(file + pawn_rank)
+            pieces.append(pawn)
+
+            piece = make_piece(color, BACK_RANK[file_index])
+            piece.set_square_str(file + back_rank)
+            pieces.append(piece)
+
+    return pieces
+
+class Board:
+    def __init__(self):
+        self.x_size = 8
+        self.y_size = 8
+        self.en_passant = EmptyObject()
+        self.turn = PieceColor.WHITE
+        self._reset()
+
+    def set_pieces(self, pieces: List[Piece]):
+        self._reset()
+        for piece in pieces:
+            self._place_piece(piece, piece.x_coord, piece.y_coord)
+        self.castling = self._castling_from_pieces()
+        self.hash = self.compute_hash()
+
+    def compute_hash(self) -> int:
+        # Zobrist hash from scratch. make_move/unmake_move keep self.hash up to
+        # date, call this after changing turn or en_passant by hand
+        hash = 0
+        for piece in self.pieces():
+            hash ^= PIECE_KEYS[piece.color.value - 1][piece.type.value][square_index(piece.x_coord, piece.y_coord)]
+        if self.turn == PieceColor.BLACK:
+            hash ^= BLACK_TO_MOVE_KEY
+        hash ^= CASTLING_KEYS[self.castling]
+        if not isinstance(self.en_passant, EmptyObject):
+            hash ^= EN_PASSANT_KEYS[self.en_passant[0]]
+        return hash
+
+    def copy(self, board_cls = None, make_piece: Callable[[PieceColor, PieceType], Piece] = Piece) -> "Board":
+        # Independent copy of the position with fresh pieces and no undo
+        # history, e.g. a headless board to hand to another process
+        board = (board_cls or type(self))()
+        pieces = []
+        for piece in self.pieces():
+            new_piece = make_piece(piece.color, piece.type)
+            new_piece.set_square(piece.x_coord, piece.y_coord)
+            new_piece.moved = piece.moved
+            pieces.append(new_piece)
+        board.set_pieces(pieces)
+        board.turn = self.turn
+        if not isinstance(self.en_passant, EmptyObject):
+            board.en_passant = list(self.en_passant)
+        board.castling = self.castling
+        board.halfmove_clock = self.halfmove_clock
+        board.fullmove_number = self.fullmove_number
+        board.hash = board.compute_hash()
+        return board
+
+    def piece_at(self, x_coord: int, y_coord: int):
+        if x_coord < 0 or x_coord >= self.x_size or y_coord < 0 or y_coord >= self.y_size:
+            return None
+        return self.board[x_coord][y_coord]
+
+    def pieces(self, color = None) -> List[Piece]:
+        # All pieces on the board, optionally only those of one color
+        return [piece for column in self.board for piece in column
+                if piece is not None and (color is None or piece.color == color)]
+
+    def remove_piece_at_square(self, x_coord:int, y_coord:int):
+        # Set board to None at x,y
+        if x_coord < 0 or x_coord >= self.x_size or y_coord < 0 or y_coord >= self.y_size:
+            return EmptyObject()
+        return self._remove_piece(x_coord, y_coord)
+
+    def move_piece(self, piece: Piece, new_x: int, new_y: int):
+        if 0 <= new_x <= 7 and 0 <= new_y <= 7:
+            self.make_move(encode_move(square_index(piece.x_coord, piece.y_coord), square_index(new_x, new_y)))
+
+    def make_move(self, move: int):
+        # Play a packed move and push an undo record so unmake_move can restore
+        # the position exactly. The promotion field picks the piece a pawn
+        # becomes on the last rank, 0 keeps the auto-queen rule
+        from_x, from_y = square_coords(move & 63)
+        new_x, new_y = square_coords((move >> 6) & 63)
+        piece = self.board[from_x][from_y]
+        prior_hash = self.hash
+        prior_castling = self.castling
+        prior_en_passant = self.en_passant
+        prior_moved = piece.moved
+        prior_type = piece.type
+        is_pawn = prior_type == PieceType.PAWN
+
+        # Set the board
+        self._remove_piece(from_x, from_y)
+        captured = self._remove_piece(new_x, new_y)
+        if captured is not None:
+            captured.set_captured()
+
+        # Remove pawn if taking en pessant
+        en_passant_captured = None
+        if not isinstance(prior_en_passant, EmptyObject):
+            if is_pawn and new_x == prior_en_passant[0] \
+                and new_y == prior_en_passant[1]:
+                if new_y == 2:
+                    en_passant_captured = self._remove_piece(new_x, 3)
+                elif new_y == 5:
+                    en_passant_captured = self._remove_piece(new_x, 4)
+                if en_passant_captured is not None:
+                    en_passant_captured.set_captured()
+
+        # Always reset en passant after a move
+        if not isinstance(prior_en_passant, EmptyObject):
+            self.hash ^= EN_PASSANT_KEYS[prior_en_passant[0]]
+        self.en_passant = EmptyObject()
+
+        # Set en passent if first pawn move is 2 squares
+        if is_pawn and not prior_moved:
+            if piece.color == PieceColor.WHITE and new_y == 4:
+                self.en_passant = [new_x, 5]
+                self.hash ^= EN_PASSANT_KEYS[new_x]
+            elif piece.color == PieceColor.BLACK and new_y == 3:
+                self.en_passant = [new_x, 2]
+                self.hash ^= EN_PASSANT_KEYS[new_x]
+
+        # Move the piece object (this may promote it) and then put it on the board.
+        # The piece is off the board while its type changes, so the hooks hash
+        # and score the promoted type
+        piece.move(new_x, new_y)
+        promotion = move >> 12
+        if promotion and piece.type != prior_type:
+            piece.set_type(PieceType(promotion))
+        self._place_piece(piece, new_x, new_y)
+
+        # Castling is encoded as the king moving two files, bring the rook across
+        if prior_type == PieceType.KING and abs(new_x - from_x) == 2:
+            rook_x, rook_new_x = (7, 5) if new_x > from_x else (0, 3)
+            rook = self._remove_piece(rook_x, new_y)
+            rook.move(rook_new_x, new_y)
+            self._place_piece(rook, rook_new_x, new_y)
+
+        # Drop castling rights for kings and rooks that moved or were captured
+        self.castling = prior_castling & CASTLING_MASKS[move & 63] & CASTLING_MASKS[(move >> 6) & 63]
+        self.hash ^= CASTLING_KEYS[prior_castling] ^ CASTLING_KEYS[self.castling] ^ BLACK_TO_MOVE_KEY
+
+        # Pawn moves and captures reset the fifty move clock, Black's move ends a full move
+        prior_halfmove_clock = self.halfmove_clock
+        if is_pawn or captured is not None or en_passant_captured is not None:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if self.turn == PieceColor.BLACK:
+            self.fullmove_number += 1
+
+        self.turn = PieceColor.BLACK if self.turn == PieceColor.WHITE else PieceColor.WHITE
+        self.history.append((move, piece, captured, en_passant_captured, prior_en_passant, prior_moved, prior_type,
+                             prior_castling, prior_hash, prior_halfmove_clock))
+
+    def unmake_move(self):
+        # Take back the last make_move
+        move, piece, captured, en_passant_captured, prior_en_passant, prior_moved, prior_type, \
+            prior_castling, prior_hash, prior_halfmove_clock = self.history.pop()
+        from_x, from_y = square_coords(move & 63)
+        new_x, new_y = square_coords((move >> 6) & 63)
+
+        self._remove_piece(new_x, new_y)
+        if piece.type != prior_type:
+            piece.set_type(prior_type)
+        piece.set_square(from_x, from_y)
+        piece.moved = prior_moved
+        self._place_piece(piece, from_x, from_y)
+
+        if prior_type == PieceType.KING and abs(new_x - from_x) == 2:
+            rook_x, rook_new_x = (7, 5) if new_x > from_x else (0, 3)
+            rook = self._remove_piece(rook_new_x, new_y)
+            rook.set_square(rook_x, new_y)
+            rook.moved = False
+            self._place_piece(rook, rook_x, new_y)
+
+        if captured is not None:
+            captured.set_captured(False)
+            self._place_piece(captured, new_x, new_y)
+        if en_passant_captured is not None:
+            en_passant_captured.set_captured(False)
+            self._place_piece(en_passant_captured, new_x, 3 if new_y == 2 else 4)
+
+        self.en_passant = prior_en_passant
+        self.castling = prior_castling
+        self.hash = prior_hash
+        self.halfmove_clock = prior_halfmove_clock
+        self.turn = PieceColor.BLACK if self.turn == PieceColor.WHITE else PieceColor.WHITE
+        if self.turn == PieceColor.BLACK:
+            self.fullmove_number -= 1
+
+    def generate_moves(self, color = None) -> List[int]:
+        # Pseudo-legal moves for one side (default: the side to move) as packed
+        # ints: no castling, promotions left to the auto-queen, and moves that
+        # leave the king in check are included. legal_moves() is the real list
+        if color is None:
+            color = self.turn
+        moves = []
+        for piece in self.pieces(color):
+            from_square = square_index(piece.x_coord, piece.y_coord)
+            for square in self._get_legal_squares(piece):
+                moves.append(encode_move(from_square, square_index(square[0], square[1])))
+        return moves
+
+    def legal_moves(self) -> List[int]:
+        # Reference implementation: expand promotions, add castling, then play
+        # every pseudo-legal move and drop those that leave the king in check.
+        # BitboardBoard generates legal moves directly and is much faster
+        color = self.turn
+        enemy = other_color(color)
+        candidates = []
+        for move in self.generate_moves(color):
+            from_x, from_y = square_coords(move & 63)
+            to_square = (move >> 6) & 63
+            if self.board[from_x][from_y].type == PieceType.PAWN and to_square >> 3 in (0, 7):
+                candidates.extend(move | (promotion << 12) for promotion in PROMOTION_TYPES)
+            else:
+                candidates.append(move)
+
+        moves = []
+        for move in candidates:
+            self.make_move(move)
+            king_square = self.king_square(color)
+            if king_square is None or not self.is_square_attacked(king_square, enemy):
+                moves.append(move)
+            self.unmake_move()
+
+        moves.extend(self._castling_moves(color))
+        return moves
+
+    def king_square(self, color: PieceColor):
+        for piece in self.pieces(color):
+            if piece.type == PieceType.KING:
+                return square_index(piece.x_coord, piece.y_coord)
+        return None
+
+    def is_square_attacked(self, square: int, by_color: PieceColor) -> bool:
+        x_coord, y_coord = square_coords(square)
+
+        # Pawns attack diagonally forward, so look one rank behind the square
+        pawn_y = y_coord + 1 if by_color == PieceColor.WHITE else y_coord - 1
+        for pawn_x in (x_coord - 1, x_coord + 1):
+            piece = self.piece_at(pawn_x, pawn_y)
+            if piece is not None and piece.color == by_color and piece.type == PieceType.PAWN:
+                return True
+
+        for offsets, piece_type in ((KNIGHT_OFFSETS, PieceType.KNIGHT), (KING_OFFSETS, PieceType.KING)):
+            for x_offset, y_offset in offsets:
+                piece = self.piece_at(x_coord + x_offset, y_coord + y_offset)
+                if piece is not None and piece.color == by_color and piece.type == piece_type:
+                    return True
+
+        # Sliders: the first piece along each ray
+        for x_offset, y_offset in KING_OFFSETS:
+            sliders = (PieceType.BISHOP, PieceType.QUEEN) if x_offset and y_offset else (PieceType.ROOK, PieceType.QUEEN)
+            current_x = x_coord + x_offset
+            current_y = y_coord + y_offset
+            while 0 <= current_x <= 7 and 0 <= current_y <= 7:
+                piece = self.board[current_x][current_y]
+                if piece is not None:
+                    if piece.color == by_color and piece.type in sliders:
+                        return True
+                    break
+                current_x += x_offset
+                current_y += y_offset
+
+        return False
+
+    def in_check(self, color = None) -> bool:
+        color = self.turn if color is None else color
+        king_square = self.king_square(color)
+        return king_square is not None and self.is_square_attacked(king_square, other_color(color))
+
+    def game_state(self) -> GameState:
+        if self.move_table():
+            return GameState.ONGOING
+        return GameState.CHECKMATE if self.in_check() else GameState.STALEMATE
+
+    def _castling_moves(self, color: PieceColor) -> List[int]:
+        moves = []
+        enemy = other_color(color)
+        for right, (king_from, king_to, empty_squares, king_squares) in CASTLING_MOVES.items():
+            if not self.castling & right or CASTLING_PIECES[right][0] != color:
+                continue
+            if any(self.piece_at(*square_coords(square)) is not None for square in empty_squares):
+                continue
+            if any(self.is_square_attacked(square, enemy) for square in king_squares):
+                continue
+            moves.append(encode_move(king_from, king_to))
+        return moves
+
+    def move_table(self) -> Dict[int, Dict[int, int]]:
+        # Legal moves for the side to move as from square -> to square -> move
+        # (promotions keep the queen), built
+        # once per position and cached by hash so repeated lookups (highlights,
+        # click validation) are plain dict indexing
+        table = self._move_tables.get(self.hash)
+        if table is None:
+            table = {}
+            for move in self.legal_moves():
+                table.setdefault(move & 63, {}).setdefault((move >> 6) & 63, move)
+            if len(self._move_tables) >= MOVE_TABLE_CACHE_SIZE:
+                del self._move_tables[next(iter(self._move_tables))]
+            self._move_tables[self.hash] = table
+        return table
+
+    def _place_piece(self, piece: Piece, x_coord: int, y_coord: int):
+        # Every write to the board goes through here and _remove_piece so
+        # subclasses can keep derived state in sync
+        self.board[x_coord][y_coord] = piece
+        # _value_ is the plain attribute behind Enum.value, without the descriptor cost
+        color = piece.color._value_ - 1
+        piece_type = piece.type._value_
+        square = (7 - y_coord) * 8 + x_coord
+        self.hash ^= PIECE_KEYS[color][piece_type][square]
+        self.midgame_score += MIDGAME_SCORES[color][piece_type][square]
+        self.endgame_score += ENDGAME_SCORES[color][piece_type][square]
+        self.phase += PHASE_WEIGHTS[piece_type]
+
+    def _remove_piece(self, x_coord: int, y_coord: int):
+        piece = self.board[x_coord][y_coord]
+        if piece is not None:
+            self.board[x_coord][y_coord] = None
+            color = piece.color._value_ - 1
+            piece_type = piece.type._value_
+            square = (7 - y_coord) * 8 + x_coord
+            self.hash ^= PIECE_KEYS[color][piece_type][square]
+            self.midgame_score -= MIDGAME_SCORES[color][piece_type][square]
+            self.endgame_score -= ENDGAME_SCORES[color][piece_type][square]
+            self.phase -= PHASE_WEIGHTS[piece_type]
+        return piece
+
+    def _castling_from_pieces(self) -> int:
+        castling = 0
+        for right, (color, king_square, rook_square) in CASTLING_PIECES.items():
+            king = self.piece_at(*square_coords(king_square))
+            rook = self.piece_at(*square_coords(rook_square))
+            if isinstance(king, Piece) and king.type == PieceType.KING and king.color == color and not king.moved and \
+                isinstance(rook, Piece) and rook.type == PieceType.ROOK and rook.color == color and not rook.moved:
+                castling |= right
+        return castling
+
+    def _get_legal_squares(self, piece: Piece) -> List[Tuple[int, int, SquareOccupationType]]:
+        if piece.type == PieceType.PAWN:
+            return self._get_legal_pawn_squares(piece.x_coord, piece.y_coord, piece.color, piece.moved)
+        elif piece.type == PieceType.KNIGHT:
+            return self._get_legal_knight_squares(piece.x_coord, piece.y_coord, piece.color)
+        elif piece.type == PieceType.BISHOP:
+            return self._get_legal_bishop_squares(piece.x_coord, piece.y_coord, piece.color)
+        elif piece.type == PieceType.ROOK:
+            return self._get_legal_rook_squares(piece.x_coord, piece.y_coord, piece.color)
+        elif piece.type == PieceType.QUEEN:
+            return self._get_legal_queen_squares(piece.x_coord, piece.y_coord, piece.color)
+        elif piece.type == PieceType.KING:
+            return self._get_legal_king_squares(piece.x_coord, piece.y_coord, piece.color)
+        else:
+            return []
+
+    def _get_legal_pawn_squares(self, x_coord: int, y_coord: int, color: PieceColor, moved: bool) -> List[Tuple[int, int, SquareOccupationType]]:
+        squares = []
+
+        if color == PieceColor.WHITE:
+            y_offset = -1
+        else:
+            y_offset = 1
+
+        # Check square in front
+        if self._square_type(x_coord, y_coord + y_offset, color) == SquareOccupationType.EMPTY:
+            squares.append((x_coord, y_coord + y_offset, SquareOccupationType.EMPTY))
+
+        # Check enemy squares diagonally
+        if y_coord + y_offset >= 0 and y_coord + y_offset <= 7:
+            if self._square_type(x_coord - 1, y_coord + y_offset, color) == SquareOccupationType.ENEMY or \
+                [x_coord - 1, y_coord + y_offset] == self.en_passant:
+                squares.append((x_coord - 1, y_coord + y_offset, SquareOccupationType.ENEMY))
+            if self._square_type(x_coord + 1, y_coord + y_offset, color) == SquareOccupationType.ENEMY or \
+                [x_coord + 1, y_coord + y_offset] == self.en_passant:
+                squares.append((x_coord + 1, y_coord + y_offset, SquareOccupationType.ENEMY))
+
+        # If hasn't moved then allow moving two squares, as long as it isn't jumping a piece
+        if not moved and self._square_type(x_coord, y_coord + y_offset, color) == SquareOccupationType.EMPTY and \
+            self._square_type(x_coord, y_coord + (y_offset * 2), color) == SquareOccupationType.EMPTY:
+            squares.append((x_coord, y_coord + (y_offset * 2), SquareOccupationType.EMPTY))
+
+        return squares
+
+    def _get_legal_knight_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        squares = []
+
+        possible_moves = [
+            (x_coord + 2, y_coord + 1),
+            (x_coord + 2, y_coord - 1),
+            (x_coord - 2, y_coord + 1),
+            (x_coord - 2, y_coord - 1),
+            (x_coord + 1, y_coord + 2),
+            (x_coord + 1, y_coord - 2),
+            (x_coord - 1, y_coord + 2),
+            (x_coord - 1, y_coord - 2)
+        ]
+
+        for [new_x, new_y] in possible_moves:
+            if 0 <= new_x <= 7 and 0 <= new_y <= 7:
+                destination_type = self._square_type(new_x, new_y, color)
+                if destination_type == SquareOccupationType.EMPTY or destination_type == SquareOccupationType.ENEMY:
+                    squares.append([new_x, new_y, destination_type])
+
+        return squares
+
+    def _get_legal_bishop_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        squares = []
+        directions = [[-1, -1], [-1, 1], [1, -1], [1, 1]]
+
+        for direction in directions:
+            current_x = x_coord
+            current_y = y_coord
+
+            while (True):
+                current_x += direction[0]
+                current_y += direction[1]
+
+                if (0 > current_x or current_x > 7 or 0 > current_y or current_y > 7):
+                    break
+
+                square_type = self._square_type(current_x, current_y, color)
+
+                if square_type == SquareOccupationType.FRIEND:
+                    break
+
+                squares.append([current_x, current_y, square_type])
+
+                if square_type == SquareOccupationType.ENEMY:
+                    break
+
+        return squares
+
+    def _get_legal_rook_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        squares = []
+        directions = [[-1, 0], [0, 1], [1, 0], [0, -1]]
+
+        for direction in directions:
+            current_x = x_coord
+            current_y = y_coord
+
+            while (True):
+                current_x += direction[0]
+                current_y += direction[1]
+
+                if (0 > current_x or current_x > 7 or 0 > current_y or current_y > 7):
+                    break
+
+                square_type = self._square_type(current_x, current_y, color)
+
+                if square_type == SquareOccupationType.FRIEND:
+                    break
+
+                squares.append([current_x, current_y, square_type])
+
+                if square_type == SquareOccupationType.ENEMY:
+                    break
+
+        return squares
+
+    def _get_legal_queen_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        squares = []
+        directions = []
+
+        for i in range(-1, 2):
+            for j in range (-1, 2):
+                directions.append([i, j])
+
+        for direction in directions:
+            current_x = x_coord
+            current_y = y_coord
+
+            while (True):
+                current_x += direction[0]
+                current_y += direction[1]
+
+                if (0 > current_x or current_x > 7 or 0 > current_y or current_y > 7):
+                    break
+
+                square_type = self._square_type(current_x, current_y, color)
+
+                if square_type == SquareOccupationType.FRIEND:
+                    break
+
+                squares.append([current_x, current_y, square_type])
+
+                if square_type == SquareOccupationType.ENEMY:
+                    break
+
+        return squares
+
+    def _get_legal_king_squares(self, x_coord: int, y_coord: int, color: PieceColor) -> List[Tuple[int, int, SquareOccupationType]]:
+        squares = []
+        directions = []
+
+        for i in range(-1, 2):
+            for j in range (-1, 2):
+                directions.append([i, j])
+
+        for direction in directions:
+            current_x = x_coord + direction[0]
+            current_y = y_coord + direction[1]
+
+            if (0 > current_x or current_x > 7 or 0 > current_y or current_y > 7):
+                continue
+
+            square_type = self._square_type(current_x, current_y, color)
+
+            if square_type == SquareOccupationType.FRIEND:
+                continue
+
+            squares.append([current_x, current_y, square_type])
+
+        return squares
+
+    def _square_type(self, x_coord: int, y_coord: int, friendly_color: PieceColor) -> SquareOccupationType:
+        if 0 > x_coord or x_coord > 7 or 0 > y_coord or y_coord > 7:
+            return
+
+        other_piece = self.board[x_coord][y_coord]
+
+        if other_piece is None:
+            return SquareOccupationType.EMPTY
+
+        if isinstance(other_piece, Piece) and other_piece.color != friendly_color:
+            return SquareOccupationType.ENEMY
+
+        return SquareOccupationType.FRIEND
+
+    def _reset(self):
+        self.board = [[None] * self.x_size for _ in range(self.y_size)]
+        # Undo records pushed by make_move, newest last
+        self.history = []
+        self.castling = 0
+        self.hash = 0
+        # Running material and piece-square totals (White minus Black) and game
+        # phase, kept up to date by _place_piece/_remove_piece
+        self.midgame_score = 0
+        self.endgame_score = 0
+        self.phase = 0
+        # Plies since the last capture or pawn move, and the FEN move number
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self._move_tables = {}
+
+def new_game_board(board_cls = Board) -> Board:
+    # Headless board set up in the initial position
+    board = board_cls()
+    board.set_pieces(starting_pieces())
+    return board
@@ -0,0 +1,251 @@
+# Compact game state for holding many live games at once: one bytearray with
+# a code per square plus the side to move, castling rights, en passant square
+# and move counters packed into a few trailing bytes. A Board with its piece
+# objects, 8x8 lists and undo history runs to kilobytes; a CompactState is a
+# couple of hundred bytes, and make_move rewrites it in place without creating
+# any objects.
+#
+#   python compact_state.py --games 100000
+#
+# Layout of CompactState.data:
+#   0-63  square code, a1 = 0: 0 empty, else PieceType value, +8 for Black
+#   64    side to move (bit 0, set for Black) | castling rights << 1
+#   65    en passant target square + 1, 0 for none
+#   66    halfmove clock (saturates at 255)
+#   67-68 fullmove number, big endian
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable
+from chess_rules import CASTLING_MASKS, CASTLING_PIECES, Board, EmptyObject, Piece, PieceColor, PieceType, \
+    new_game_board, square_coords, square_index
+from bitboard import BitboardBoard
+from zobrist import BLACK_TO_MOVE_KEY, CASTLING_KEYS, EN_PASSANT_KEYS, PIECE_KEYS
+
+STATE_SIZE = 69
+FLAGS = 64
+EN_PASSANT = 65
+HALFMOVE = 66
+FULLMOVE = 67
+
+BLACK = 8
+EMPTY = 0
+PAWN = PieceType.PAWN.value
+KING = PieceType.KING.value
+QUEEN = PieceType.QUEEN.value
+
+# Shifting a packed move can give an int above the small int cache, which
+# Python allocates, so the to square is looked up instead of computed
+TO_SQUARES = bytes((move >> 6) & 63 for move in range(1 << 15))
+
+# Castling masks shifted past the side to move bit of the flags byte
+FLAG_MASKS = bytes(1 | mask << 1 for mask in CASTLING_MASKS)
+
+def piece_code(color: PieceColor, piece_type: PieceType) -> int:
+    return piece_type.value | (BLACK if color == PieceColor.BLACK else 0)
+
+class CompactState:
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes = None):
+        self.data = bytearray(data) if data is not None else bytearray(STATE_SIZE)
+        if len(self.data) != STATE_SIZE:
+            raise ValueError("Compact state needs %d bytes, got %d" % (STATE_SIZE, len(self.data)))
+
+    @classmethod
+    def from_board(cls, board: Board) -> "CompactState":
+        state = cls()
+        data = state.data
+        for piece in board.pieces():
+            data[square_index(piece.x_coord, piece.y_coord)] = piece.type._value_ | (8 if piece.color == PieceColor.BLACK else 0)
+        data[FLAGS] = (1 if board.turn == PieceColor.BLACK else 0) | board.castling << 1
+        if not isinstance(board.en_passant, EmptyObject):
+            data[EN_PASSANT] = square_index(*board.en_passant) + 1
+        data[HALFMOVE] = min(board.halfmove_clock, 255)
+        data[FULLMOVE] = board.fullmove_number >> 8 & 255
+        data[FULLMOVE + 1] = board.fullmove_number & 255
+        return state
+
+    def to_board(self, board_cls = BitboardBoard, make_piece: Callable[[PieceColor, PieceType], Piece] = Piece) -> Board:
+        data = self.data
+        castling = data[FLAGS] >> 1
+
+        # Moved flags are not stored: pawns off their starting rank have moved,
+        # kings and rooks are unmoved only while a castling right needs them
+        unmoved_squares = set()
+        for right, (_, king_square, rook_square) in CASTLING_PIECES.items():
+            if castling & right:
+                unmoved_squares.update((king_square, rook_square))
+
+        pieces = []
+        for square in range(64):
+            code = data[square]
+            if code == EMPTY:
+                continue
+            color = PieceColor.BLACK if code & BLACK else PieceColor.WHITE
+            piece = make_piece(color, PieceType(code & 7))
+            piece.set_square(*square_coords(square))
+            if piece.type == PieceType.PAWN:
+                piece.moved = square >> 3 != (1 if color == PieceColor.WHITE else 6)
+            elif piece.type in (PieceType.KING, PieceType.ROOK):
+                piece.moved = square not in unmoved_squares
+            pieces.append(piece)
+
+        board = board_cls()
+        board.set_pieces(pieces)
+        board.turn = PieceColor.BLACK if data[FLAGS] & 1 else PieceColor.WHITE
+        board.castling = castling
+        if data[EN_PASSANT]:
+            board.en_passant = list(square_coords(data[EN_PASSANT] - 1))
+        board.halfmove_clock = data[HALFMOVE]
+        board.fullmove_number = self.fullmove_number
+        board.hash = board.compute_hash()
+        return board
+
+    @property
+    def turn(self) -> PieceColor:
+        return PieceColor.BLACK if self.data[FLAGS] & 1 else PieceColor.WHITE
+
+    @property
+    def fullmove_number(self) -> int:
+        return self.data[FULLMOVE] << 8 | self.data[FULLMOVE + 1]
+
+    def zobrist(self) -> int:
+        # Same key as Board.hash for the position
+        data = self.data
+        key = 0
+        for square in range(64):
+            code = data[square]
+            if code:
+                key ^= PIECE_KEYS[code >> 3][code & 7][square]
+        if data[FLAGS] & 1:
+            key ^= BLACK_TO_MOVE_KEY
+        key ^= CASTLING_KEYS[data[FLAGS] >> 1]
+        if data[EN_PASSANT]:
+            key ^= EN_PASSANT_KEYS[(data[EN_PASSANT] - 1) & 7]
+        return key
+
+    def copy(self) -> "CompactState":
+        return CompactState(self.data)
+
+    def make_move(self, move: int):
+        # Play a packed move in place, following Board.make_move's rules. The
+        # move is trusted: check it against Board.legal_moves first
+        data = self.data
+        from_square = move & 63
+        to_square = TO_SQUARES[move & 32767]
+        code = data[from_square]
+        piece_type = code & 7
+        captured = data[to_square]
+        data[from_square] = EMPTY
+
+        en_passant = data[EN_PASSANT]
+        data[EN_PASSANT] = 0
+        if piece_type == PAWN:
+            # Taking en passant removes the pawn beside the from square
+            if en_passant and to_square == en_passant - 1:
+                data[(from_square & 56) | (to_square & 7)] = EMPTY
+            # A double push leaves the square it crossed as the en passant target
+            elif to_square - from_square == 16 or from_square - to_square == 16:
+                data[EN_PASSANT] = ((from_square + to_square) >> 1) + 1
+            # Reaching the last rank promotes, to a queen unless the move says otherwise
+            if to_square >= 56 or to_square < 8:
+                code = (move >> 12 or QUEEN) | (code & BLACK)
+        elif piece_type == KING and (to_square - from_square == 2 or from_square - to_square == 2):
+            # Castling is encoded as the king moving two files, bring the rook across
+            if to_square > from_square:
+                data[to_square - 1] = data[to_square + 1]
+                data[to_square + 1] = EMPTY
+            else:
+                data[to_square + 1] = data[to_square - 2]
+                data[to_square - 2] = EMPTY
+        data[to_square] = code
+
+        # Pawn moves and captures reset the fifty move clock, Black's move ends a full move
+        if piece_type == PAWN or captured:
+            data[HALFMOVE] = 0
+        elif data[HALFMOVE] < 255:
+            data[HALFMOVE] += 1
+        if data[FLAGS] & 1:
+            if data[FULLMOVE + 1] == 255:
+                data[FULLMOVE + 1] = 0
+                data[FULLMOVE] += 1
+            else:
+                data[FULLMOVE + 1] += 1
+
+        # Drop castling rights for kings and rooks that moved or were captured, flip the side to move
+        data[FLAGS] = (data[FLAGS] & FLAG_MASKS[from_square] & FLAG_MASKS[to_square]) ^ 1
+
+def _random_games(count: int, plies: int, seed: int):
+    # Boards a few random plies into a game, for the benchmark
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = new_game_board(BitboardBoard)
+        for _ in range(rng.randrange(plies + 1)):
+            legal = board.legal_moves()
+            if not legal:
+                break
+            board.make_move(rng.choice(legal))
+        boards.append(board)
+    return boards
+
+def _measure(build: Callable[[], list]) -> int:
+    # Bytes still allocated by what build returns
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-game memory of CompactState against Board")
+    parser.add_argument("--games", type=int, default=100000, help="compact states to hold")
+    parser.add_argument("--boards", type=int, default=1000, help="full boards to measure, kept smaller as they are slow to build")
+    parser.add_argument("--plies", type=int, default=40, help="random plies played into each sample game")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    samples = _random_games(min(args.boards, args.games), args.plies, args.seed)
+    states = [CompactState.from_board(board) for board in samples]
+
+    # A fresh BitboardBoard copy drops the undo history a live game would also carry
+    board_bytes = _measure(lambda: [board.copy() for board in samples]) / len(samples)
+    state_bytes = _measure(lambda: [states[index % len(states)].copy() for index in range(args.games)]) / args.games
+    print("Board          %8.0f bytes/game" % board_bytes)
+    print("CompactState   %8.0f bytes/game  (%.0fx smaller)" % (state_bytes, board_bytes / state_bytes))
+
+    start = time.perf_counter()
+    for state in states:
+        state.to_board()
+    to_board = (time.perf_counter() - start) / len(states)
+    start = time.perf_counter()
+    for board in samples:
+        CompactState.from_board(board)
+    from_board = (time.perf_counter() - start) / len(samples)
+    print("from_board %.1f us, to_board %.1f us" % (from_board * 1e6, to_board * 1e6))
+
+    # Replay a game on one state and check no memory is left behind by the moves
+    board = new_game_board(BitboardBoard)
+    rng = random.Random(args.seed)
+    moves = []
+    while len(moves) < 200 and board.legal_moves():
+        moves.append(rng.choice(board.legal_moves()))
+        board.make_move(moves[-1])
+    state = CompactState.from_board(new_game_board(BitboardBoard))
+    tracemalloc.start()
+    start = time.perf_counter()
+    for move in moves:
+        state.make_move(move)
+    elapsed = time.perf_counter() - start
+    blocks = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print("make_move %.2f us, %d bytes held after %d moves" % (elapsed / len(moves) * 1e6, blocks, len(moves)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+# Training data export: streams games from PGN files, self-play runs and game
+# archives, replays them in worker processes and writes one row per position
+# into chunked .npy files that load back as memory maps.
+#
+#   python dataset.py --out data games.pgn runs/selfplay/games.bin games.cga
+#
+# Each chunk i holds the same number of rows in four files:
+#   planes_%05d.npy        (N, 12, 8, 8) uint8, batch_eval plane order
+#   side_to_move_%05d.npy  (N,) int8, +1 White, -1 Black
+#   result_%05d.npy        (N,) int8 game result from White's side: 1, 0, -1
+#   move_%05d.npy          (N,) uint16 packed move played from the position
+# and dataset.json lists the chunks with totals.
+#
+# Workers send back piece bitboards (96 bytes a position) rather than planes;
+# the parent deduplicates on the Zobrist hash, unpacks the planes and fills a
+# chunk at a time, with a bounded number of jobs in flight.
+#
+# Deduplication remembers hashes in a fixed table of --dedupe-slots entries
+# (8 bytes each), so its memory does not grow with the corpus. A position
+# evicts whatever shared its slot, which lets some repeats through once the
+# corpus has many more unique positions than slots; none are wrongly dropped.
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Union
+import numpy as np
+from bitboard import BitboardBoard
+from batch_eval import PLANES, bitboards_to_planes, board_bitboards
+from chess_rules import PieceColor
+from compact_state import CompactState
+from fen import STARTING_FEN, board_from_fen
+from pgn import read_games_from_path, san_to_move
+from archive import GameArchive
+from selfplay import INITIAL_SETUP, RUN_FILE, GameResult, read_games
+
+FIELDS = ["planes", "side_to_move", "result", "move"]
+INDEX_FILE = "dataset.json"
+RESULT_VALUES = {"1-0": 1, "0-1": -1, "1/2-1/2": 0}
+DEFAULT_DEDUPE_SLOTS = 1 << 22
+SELFPLAY_RESULTS = {GameResult.WHITE_WIN: "1-0", GameResult.BLACK_WIN: "0-1", GameResult.DRAW: "1/2-1/2"}
+
+class GameSource(NamedTuple):
+    # Start position as a FEN or CompactState bytes, and the moves as packed
+    # ints or, from PGN, SAN text
+    start: Union[str, bytes]
+    moves: Union[List[int], List[str]]
+    result: str
+
+class EncodedPositions(NamedTuple):
+    hashes: np.ndarray
+    bitboards: np.ndarray
+    side_to_move: np.ndarray
+    result: np.ndarray
+    move: np.ndarray
+    skipped_games: int
+
+def iter_sources(path: str) -> Iterator[GameSource]:
+    # Games from one input file, picked by extension
+    if path.endswith(".pgn"):
+        for game in read_games_from_path(path):
+            yield GameSource(game.tags.get("FEN", STARTING_FEN), game.sans, game.result)
+    elif path.endswith(".cga"):
+        with GameArchive(path) as games:
+            for game in games:
+                yield GameSource(bytes(game.state_at(0).data), game.moves(), game.result)
+    elif path.endswith(".bin"):
+        # Self-play openings are listed in the run file next to the games
+        run_path = os.path.join(os.path.dirname(path), RUN_FILE)
+        openings = []
+        if os.path.exists(run_path):
+            with open(run_path) as file:
+                openings = json.load(file).get("openings", [])
+        for record in read_games(path):
+            if record.opening == INITIAL_SETUP:
+                start = STARTING_FEN
+            elif record.opening < len(openings):
+                start = openings[record.opening]
+            else:
+                raise ValueError("%s: opening %d of game %d is not listed in %s" % (
+                    path, record.opening, record.index, run_path))
+            yield GameSource(start, record.moves, SELFPLAY_RESULTS[record.result])
+    else:
+        raise ValueError("Unknown game file type: " + path)
+
+def encode_games(games: List[GameSource]) -> EncodedPositions:
+    # Replay each game and collect every position that had a move played
+    # from it. Unfinished games and games with an unreadable move are skipped
+    hashes = []
+    bitboards = []
+    sides = []
+    results = []
+    moves = []
+    skipped = 0
+    for game in games:
+        result = RESULT_VALUES.get(game.result)
+        if result is None:
+            skipped += 1
+            continue
+        first = len(moves)
+        try:
+            if isinstance(game.start, bytes):
+                board = CompactState(game.start).to_board()
+            else:
+                board = board_from_fen(game.start, BitboardBoard)
+            for move in game.moves:
+                if isinstance(move, str):
+                    move = san_to_move(board, move)
+                hashes.append(board.hash)
+                bitboards.append(board_bitboards(board))
+                sides.append(1 if board.turn == PieceColor.WHITE else -1)
+                moves.append(move)
+                board.make_move(move)
+        except Exception:
+            # Packed moves from a damaged file are not checked, and fail in
+            # whatever part of the rules code they reach first. Drop the whole
+            # game rather than keep a prefix with the wrong result
+            del hashes[first:], bitboards[first:], sides[first:], moves[first:]
+            skipped += 1
+            continue
+        results.extend([result] * (len(moves) - first))
+
+    return EncodedPositions(np.array(hashes, dtype=np.uint64),
+                            np.array(bitboards, dtype=np.uint64).reshape(len(bitboards), PLANES),
+                            np.array(sides, dtype=np.int8), np.array(results, dtype=np.int8),
+                            np.array(moves, dtype=np.uint16), skipped)
+
+def _batches(paths: List[str], games_per_job: int) -> Iterator[List[GameSource]]:
+    batch = []
+    for path in paths:
+        for game in iter_sources(path):
+            batch.append(game)
+            if len(batch) == games_per_job:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+class DedupeTable:
+    # Direct-mapped table of recently seen hashes, one per slot. Keys in a
+    # slot share their low bits, bit 0 included, so storing key | 1 keeps
+    # them apart while no stored tag is ever the empty 0
+    def __init__(self, slots: int = DEFAULT_DEDUPE_SLOTS):
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError("Dedupe slots must be a power of two of at least 2, not %d" % slots)
+        self.mask = np.uint64(slots - 1)
+        self.tags = np.zeros(slots, dtype=np.uint64)
+
+    def first_seen(self, hashes: np.ndarray) -> np.ndarray:
+        # True for each hash not seen before, in this batch or an earlier one
+        keep = np.zeros(len(hashes), dtype=bool)
+        keep[np.unique(hashes, return_index=True)[1]] = True
+        slots = hashes & self.mask
+        tags = hashes | np.uint64(1)
+        keep &= self.tags[slots] != tags
+        self.tags[slots[keep]] = tags[keep]
+        return keep
+
+def chunk_path(out_dir: str, field: str, chunk: int) -> str:
+    return os.path.join(out_dir, "%s_%05d.npy" % (field, chunk))
+
+class ChunkWriter:
+    # Fills fixed-size memory-mapped chunks row by row
+    def __init__(self, out_dir: str, chunk_rows: int):
+        self.out_dir = out_dir
+        self.chunk_rows = chunk_rows
+        self.chunks: List[int] = []
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._rows = 0
+
+    def _open_chunk(self):
+        chunk = len(self.chunks)
+        shapes = {"planes": (self.chunk_rows, PLANES, 8, 8), "side_to_move": (self.chunk_rows,),
+                  "result": (self.chunk_rows,), "move": (self.chunk_rows,)}
+        dtypes = {"planes": np.uint8, "side_to_move": np.int8, "result": np.int8, "move": np.uint16}
+        self._arrays = {field: np.lib.format.open_memmap(chunk_path(self.out_dir, field, chunk), mode="w+",
+                                                         dtype=dtypes[field], shape=shapes[field])
+                        for field in FIELDS}
+        self._rows = 0
+
+    def _close_chunk(self):
+        chunk = len(self.chunks)
+        arrays = self._arrays
+        self._arrays = None
+        for field in FIELDS:
+            arrays[field].flush()
+            if self._rows < self.chunk_rows:
+                # The last chunk is rewritten at its real length, after its
+                # map is dropped
+                rows = np.array(arrays[field][:self._rows])
+                arrays[field] = None
+                np.save(chunk_path(self.out_dir, field, chunk), rows)
+        self.chunks.append(self._rows)
+
+    def write(self, columns: Dict[str, np.ndarray]):
+        total = len(columns["move"])
+        done = 0
+        while done < total:
+            if self._arrays is None:
+                self._open_chunk()
+            count = min(total - done, self.chunk_rows - self._rows)
+            for field in FIELDS:
+                self._arrays[field][self._rows:self._rows + count] = columns[field][done:done + count]
+            self._rows += count
+            done += count
+            if self._rows == self.chunk_rows:
+                self._close_chunk()
+
+    def close(self):
+        if self._arrays is not None:
+            self._close_chunk()
+
+def export(paths: List[str], out_dir: str, workers: int = 1, games_per_job: int = 64, chunk_rows: int = 1 << 18,
+           dedupe: bool = True, max_pending: Optional[int] = None,
+           dedupe_slots: int = DEFAULT_DEDUPE_SLOTS) -> dict:
+    seen = DedupeTable(dedupe_slots) if dedupe else None
+    os.makedirs(out_dir, exist_ok=True)
+    max_pending = max_pending or workers * 4
+    writer = ChunkWriter(out_dir, chunk_rows)
+    positions = 0
+    duplicates = 0
+    games = 0
+    skipped = 0
+
+    def consume(encoded: EncodedPositions):
+        nonlocal positions, duplicates
+        if seen is not None:
+            keep = seen.first_seen(encoded.hashes)
+        else:
+            keep = np.ones(len(encoded.hashes), dtype=bool)
+        kept = int(keep.sum())
+        duplicates += len(keep) - kept
+        positions += kept
+        writer.write({"planes": bitboards_to_planes(encoded.bitboards[keep]),
+                      "side_to_move": encoded.side_to_move[keep], "result": encoded.result[keep],
+                      "move": encoded.move[keep]})
+
+    start = time.perf_counter()
+    last_report = start
+    with ProcessPoolExecutor(workers) as pool:
+        # Results are taken in submission order so a rerun writes the same rows
+        pending = deque()
+        for batch in _batches(paths, games_per_job):
+            games += len(batch)
+            pending.append(pool.submit(encode_games, batch))
+            while len(pending) >= max_pending or (pending and pending[0].done()):
+                encoded = pending.popleft().result()
+                skipped += encoded.skipped_games
+                consume(encoded)
+            if time.perf_counter() - last_report >= 10:
+                last_report = time.perf_counter()
+                print("%d games, %d positions, %.0f positions/sec" % (
+                    games, positions, positions / (last_report - start)))
+        while pending:
+            encoded = pending.popleft().result()
+            skipped += encoded.skipped_games
+            consume(encoded)
+    writer.close()
+    elapsed = time.perf_counter() - start
+
+    summary = {
+        "sources": paths,
+        "fields": FIELDS,
+        "chunks": writer.chunks,
+        "positions": positions,
+        "duplicates": duplicates,
+        "games": games,
+        "skipped_games": skipped,
+        "seconds": round(elapsed, 3),
+        "positions_per_sec": positions / elapsed if elapsed > 0 else 0.0,
+        "workers": workers,
+        "dedupe_slots": dedupe_slots if dedupe else 0,
+    }
+    with open(os.path.join(out_dir, INDEX_FILE), "w") as file:
+        json.dump(summary, file, indent=2)
+    return summary
+
+def open_dataset(out_dir: str) -> List[Dict[str, np.ndarray]]:
+    # Every chunk's arrays, memory-mapped read-only
+    with open(os.path.join(out_dir, INDEX_FILE)) as file:
+        chunks = json.load(file)["chunks"]
+    return [{field: np.load(chunk_path(out_dir, field, chunk), mmap_mode="r") for field in FIELDS}
+            for chunk in range(len(chunks))]
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Export game positions as training arrays")
+    parser.add_argument("games", nargs="+", help=".pgn, self-play games.bin or .cga archive files")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--games-per-job", type=int, default=64)
+    parser.add_argument("--chunk-rows", type=int, default=1 << 18, help="positions per .npy chunk")
+    parser.add_argument("--no-dedupe", action="store_true", help="keep repeated positions")
+    parser.add_argument("--dedupe-slots", type=int, default=DEFAULT_DEDUPE_SLOTS,
+                        help="power of two hashes remembered for dedupe, 8 bytes each; with many more unique "
+                             "positions than this, some repeats are kept")
+    args = parser.parse_args(argv)
+    if args.dedupe_slots < 2 or args.dedupe_slots & (args.dedupe_slots - 1):
+        parser.error("--dedupe-slots must be a power of two of at least 2")
+
+    try:
+        summary = export(args.games, args.out, args.workers, args.games_per_job, args.chunk_rows,
+                         not args.no_dedupe, dedupe_slots=args.dedupe_slots)
+    except ValueError as error:
+        print("export failed: %s" % error)
+        return 1
+    print(json.dumps({key: value for key, value in summary.items() if key != "chunks"}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Runs the engine on a background thread so the pygame loop keeps servicing
+# events while it thinks. The search works on its own copy of the position;
+# results come back through a queue that the frame loop polls.
+import queue
+import threading
+from enum import Enum
+from typing import List, Optional, Tuple
+from chess_rules import Board
+from bitboard import BitboardBoard
+from search import MAX_PLY, SearchResult, Searcher
+
+class EngineMessage(Enum):
+    # Best move so far after a completed depth
+    INFO = 1
+    # Search finished, the result's move is the one to play
+    DONE = 2
+
+class EngineRunner:
+    def __init__(self, searcher: Optional[Searcher] = None):
+        self.searcher = searcher if searcher is not None else Searcher()
+        self.messages = queue.Queue()
+        # Hash of the position being searched, so a result can be checked
+        # against the board before it is played
+        self.position_hash = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._cancelled = False
+
+    @property
+    def thinking(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, board: Board, time_limit: Optional[float] = None, max_depth: int = MAX_PLY - 1):
+        # Start searching a copy of the board; the caller's board is never touched
+        if self.thinking:
+            raise RuntimeError("engine is already thinking")
+        position = board.copy(BitboardBoard)
+        # The copy has no undo history, pass the game's positions along so
+        # the search still sees repetitions of them
+        game_hashes = [record[8] for record in board.history]
+        self.position_hash = board.hash
+        self._stop_event = threading.Event()
+        self._cancelled = False
+        # Daemon, so closing the window never waits on a search
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        args=(position, time_limit, max_depth, self._stop_event, game_hashes))
+        self._thread.start()
+
+    def stop(self):
+        # Finish now and report the best move found so far
+        self._stop_event.set()
+
+    def cancel(self, wait: bool = True):
+        # Stop and throw the result away
+        self._cancelled = True
+        self._stop_event.set()
+        if wait and self._thread is not None:
+            self._thread.join()
+        # Drop anything published before the flag was seen
+        self.poll()
+
+    def poll(self) -> List[Tuple[EngineMessage, SearchResult]]:
+        # Everything published since the last poll, never blocks
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def _run(self, position: Board, time_limit: Optional[float], max_depth: int, stop_event: threading.Event,
+             game_hashes: List[int]):
+        def publish(result: SearchResult):
+            if not self._cancelled:
+                self.messages.put((EngineMessage.INFO, result))
+
+        result = self.searcher.search(position, max_depth, time_limit, stop_event=stop_event, on_iteration=publish,
+                                      game_hashes=game_hashes)
+        if not self._cancelled:
+            self.messages.put((EngineMessage.DONE, result))
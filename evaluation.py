@@ -0,0 +1,90 @@
+# Static evaluation: material plus piece-square tables, blended from the
+# midgame to the endgame values by game phase. Boards keep the midgame and
+# endgame totals and the phase up to date as pieces are placed and removed
+# (see piece_square.py), so evaluate() reads three numbers instead of
+# scanning the board. compute_scores() rescans the board as a debug check.
+#
+#   python evaluation.py --games 200
+import argparse
+import random
+import sys
+import time
+from typing import NamedTuple
+from chess_rules import Board, new_game_board
+from bitboard import BitboardBoard
+from piece_square import ENDGAME_SCORES, MIDGAME_SCORES, PHASE_WEIGHTS, TOTAL_PHASE
+
+class EvaluationScores(NamedTuple):
+    midgame: int
+    endgame: int
+    phase: int
+
+def evaluate(board: Board) -> int:
+    # Tapered score from the side to move's point of view. Promotions can push
+    # the phase past the starting total, which still counts as a full midgame
+    phase = board.phase if board.phase < TOTAL_PHASE else TOTAL_PHASE
+    score = (board.midgame_score * phase + board.endgame_score * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+    return score if board.turn._value_ == 1 else -score
+
+def compute_scores(board: Board) -> EvaluationScores:
+    # The running totals from scratch
+    midgame = 0
+    endgame = 0
+    phase = 0
+    for piece in board.pieces():
+        color = piece.color.value - 1
+        square = (7 - piece.y_coord) * 8 + piece.x_coord
+        midgame += MIDGAME_SCORES[color][piece.type.value][square]
+        endgame += ENDGAME_SCORES[color][piece.type.value][square]
+        phase += PHASE_WEIGHTS[piece.type.value]
+    return EvaluationScores(midgame, endgame, phase)
+
+def check_scores(board: Board):
+    # Raise if the incremental totals have drifted from the position
+    expected = compute_scores(board)
+    actual = EvaluationScores(board.midgame_score, board.endgame_score, board.phase)
+    if actual != expected:
+        raise AssertionError("Incremental evaluation %s, recomputed %s" % (actual, expected))
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Check the incremental evaluation against a full recompute")
+    parser.add_argument("--games", type=int, default=100, help="random games to play, checking every position")
+    parser.add_argument("--plies", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    positions = 0
+    boards = []
+    for _ in range(args.games):
+        board = new_game_board(BitboardBoard)
+        for _ in range(args.plies):
+            legal = board.legal_moves()
+            if not legal:
+                break
+            board.make_move(rng.choice(legal))
+            check_scores(board)
+            positions += 1
+        # Taking every move back must land on the starting totals again
+        while board.history:
+            board.unmake_move()
+            check_scores(board)
+        boards.append(board)
+    print("%d positions checked" % positions)
+
+    # Incremental against full rescans
+    repeats = 100000
+    board = boards[-1]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        evaluate(board)
+    incremental = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats // 100):
+        compute_scores(board)
+    full = (time.perf_counter() - start) / (repeats // 100)
+    print("evaluate %.2f us, full recompute %.2f us" % (incremental * 1e6, full * 1e6))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# FEN (Forsyth-Edwards Notation) position setup and export for Board
+from typing import Callable, Tuple
+from chess_rules import BLACK_KINGSIDE, BLACK_QUEENSIDE, WHITE_KINGSIDE, WHITE_QUEENSIDE, Board, EmptyObject, Piece, \
+    PieceColor, PieceType
+
+FEN_PIECE_TYPES = {
+    "p": PieceType.PAWN,
+    "n": PieceType.KNIGHT,
+    "b": PieceType.BISHOP,
+    "r": PieceType.ROOK,
+    "q": PieceType.QUEEN,
+    "k": PieceType.KING,
+}
+
+FEN_LETTERS = {piece_type: letter for letter, piece_type in FEN_PIECE_TYPES.items()}
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Castling flag -> (king square, rook square) that must still be unmoved
+CASTLING_SQUARES = {
+    "K": ("e1", "h1"),
+    "Q": ("e1", "a1"),
+    "k": ("e8", "h8"),
+    "q": ("e8", "a8"),
+}
+
+# Castling right bit -> FEN flag, in FEN order
+CASTLING_FLAGS = [(WHITE_KINGSIDE, "K"), (WHITE_QUEENSIDE, "Q"), (BLACK_KINGSIDE, "k"), (BLACK_QUEENSIDE, "q")]
+
+def square_from_str(square: str) -> Tuple[int, int]:
+    if len(square) != 2 or not "a" <= square[0] <= "h" or not "1" <= square[1] <= "8":
+        raise ValueError("Bad square: " + square)
+    return ord(square[0]) - 97, 7 - (int(square[1]) - 1)
+
+def square_to_str(x_coord: int, y_coord: int) -> str:
+    return chr(97 + x_coord) + str(8 - y_coord)
+
+def board_from_fen(fen: str, board_cls = Board,
+                   make_piece: Callable[[PieceColor, PieceType], Piece] = Piece) -> Board:
+    fields = fen.split()
+    if len(fields) < 2:
+        raise ValueError("FEN needs at least placement and side to move: " + fen)
+
+    placement = fields[0]
+    castling = fields[2] if len(fields) > 2 else "-"
+    en_passant = fields[3] if len(fields) > 3 else "-"
+
+    ranks = placement.split("/")
+    if len(ranks) != 8:
+        raise ValueError("FEN placement must have 8 ranks: " + placement)
+
+    pieces = []
+    for y_coord, rank in enumerate(ranks):
+        x_coord = 0
+        for char in rank:
+            if char.isdigit():
+                x_coord += int(char)
+                continue
+            if char.lower() not in FEN_PIECE_TYPES or x_coord > 7:
+                raise ValueError("Bad FEN rank: " + rank)
+
+            color = PieceColor.WHITE if char.isupper() else PieceColor.BLACK
+            piece = make_piece(color, FEN_PIECE_TYPES[char.lower()])
+            piece.set_square(x_coord, y_coord)
+
+            # FEN does not record which pieces moved, so infer it: pawns off their
+            # starting rank have moved, kings and rooks only count as unmoved when
+            # a castling right still needs them
+            if piece.type == PieceType.PAWN:
+                piece.moved = y_coord != (6 if color == PieceColor.WHITE else 1)
+            elif piece.type in (PieceType.KING, PieceType.ROOK):
+                piece.moved = True
+
+            pieces.append(piece)
+            x_coord += 1
+
+        if x_coord != 8:
+            raise ValueError("Bad FEN rank: " + rank)
+
+    unmoved_squares = set()
+    for flag in castling.replace("-", ""):
+        if flag not in CASTLING_SQUARES:
+            raise ValueError("Bad FEN castling field: " + castling)
+        unmoved_squares.update(square_from_str(square) for square in CASTLING_SQUARES[flag])
+    for piece in pieces:
+        if piece.type in (PieceType.KING, PieceType.ROOK) and (piece.x_coord, piece.y_coord) in unmoved_squares:
+            piece.moved = False
+
+    if fields[1] not in ("w", "b"):
+        raise ValueError("Bad FEN side to move: " + fields[1])
+
+    # The en passant target is behind a pawn that just moved two squares: on
+    # the sixth rank with White to move, the third with Black to move
+    en_passant_square = EmptyObject()
+    if en_passant != "-":
+        en_passant_square = list(square_from_str(en_passant))
+        if en_passant_square[1] != (2 if fields[1] == "w" else 5):
+            raise ValueError("Bad FEN en passant square for the side to move: " + en_passant)
+
+    board = board_cls()
+    board.set_pieces(pieces)
+    board.en_passant = en_passant_square
+    board.turn = PieceColor.WHITE if fields[1] == "w" else PieceColor.BLACK
+
+    # Move counters are optional, default to a fresh game
+    try:
+        board.halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+        board.fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+    except ValueError:
+        raise ValueError("Bad FEN move counters: " + fen)
+    board.hash = board.compute_hash()
+
+    return board
+
+def board_to_fen(board: Board) -> str:
+    ranks = []
+    for y_coord in range(8):
+        rank = ""
+        empty = 0
+        for x_coord in range(8):
+            piece = board.board[x_coord][y_coord]
+            if piece is None:
+                empty += 1
+                continue
+            if empty:
+                rank += str(empty)
+                empty = 0
+            letter = FEN_LETTERS[piece.type]
+            rank += letter.upper() if piece.color == PieceColor.WHITE else letter
+        if empty:
+            rank += str(empty)
+        ranks.append(rank)
+
+    castling = "".join(flag for right, flag in CASTLING_FLAGS if board.castling & right) or "-"
+    en_passant = "-" if isinstance(board.en_passant, EmptyObject) else square_to_str(*board.en_passant)
+    return "%s %s %s %s %d %d" % ("/".join(ranks), "w" if board.turn == PieceColor.WHITE else "b",
+                                  castling, en_passant, board.halfmove_clock, board.fullmove_number)
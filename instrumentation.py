@@ -0,0 +1,185 @@
+# Opt-in timing for the GUI and the rules code. Nothing here runs unless a
+# session asks for it: method counters are installed by wrapping the class
+# attributes, and uninstall() puts the originals back, so an uninstrumented
+# run executes exactly the code it always did. The frame loop only makes
+# timing calls when it was started with --instrument.
+#
+#   python animate.py --instrument --report-every 5
+#   python animate.py --profile session.prof
+import cProfile
+import pstats
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, NamedTuple, Optional
+
+# Rules methods counted by default. BitboardBoard generates legal moves
+# directly, so legal_moves is where a bitboard game spends its move generation
+# time; the per-piece generators run for the reference Board
+RULES_METHODS = [
+    "_get_legal_pawn_squares",
+    "_get_legal_knight_squares",
+    "_get_legal_bishop_squares",
+    "_get_legal_rook_squares",
+    "_get_legal_queen_squares",
+    "_get_legal_king_squares",
+    "legal_moves",
+    "move_piece",
+]
+
+# Frame sections in report order. highlights runs inside draw, so it is part
+# of draw's time too
+FRAME_SECTIONS = ["events", "draw", "highlights", "flip", "frame"]
+
+# Frames kept for the rolling percentiles
+DEFAULT_WINDOW = 600
+
+class SectionTiming(NamedTuple):
+    # Milliseconds over the rolling window
+    p50: float
+    p99: float
+    mean: float
+    max: float
+
+class CallTiming(NamedTuple):
+    count: int
+    total: float
+    mean: float
+
+class InstrumentationSnapshot(NamedTuple):
+    frames: int
+    sections: Dict[str, SectionTiming]
+    calls: Dict[str, CallTiming]
+
+class _CallCounter:
+    __slots__ = ("count", "total")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+class Instrumentation:
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self.frames = 0
+        self._history: Dict[str, Deque[float]] = {}
+        self._current: Dict[str, float] = {}
+        self._frame_start = None
+        self._calls: Dict[str, _CallCounter] = {}
+        # (class, attribute, original or None when the class only inherited it)
+        self._installed = []
+
+    # Method counters
+    def wrap(self, cls: type, name: str, key: Optional[str] = None, section: Optional[str] = None):
+        # Count calls and time of cls.name; section also adds the time to the
+        # current frame
+        original = getattr(cls, name)
+        own = cls.__dict__.get(name)
+        counter = self._calls.setdefault(key or name, _CallCounter())
+        current = self._current
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                counter.count += 1
+                counter.total += elapsed
+                if section is not None:
+                    current[section] = current.get(section, 0.0) + elapsed
+
+        wrapper.__name__ = name
+        wrapper.__wrapped__ = original
+        setattr(cls, name, wrapper)
+        self._installed.append((cls, name, own))
+
+    def install(self, board_cls: type, methods: List[str] = RULES_METHODS):
+        for name in methods:
+            if hasattr(board_cls, name):
+                self.wrap(board_cls, name)
+        if hasattr(board_cls, "_determine_highlights"):
+            self.wrap(board_cls, "_determine_highlights", section="highlights")
+
+    def uninstall(self):
+        # Newest first, so a method wrapped twice unwinds to the original
+        for cls, name, own in reversed(self._installed):
+            if own is None:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, own)
+        self._installed = []
+
+    # Frame timing
+    def begin_frame(self):
+        self._current.clear()
+        self._frame_start = time.perf_counter()
+
+    @contextmanager
+    def section(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current[name] = self._current.get(name, 0.0) + time.perf_counter() - start
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        self._current["frame"] = time.perf_counter() - self._frame_start
+        for name, elapsed in self._current.items():
+            history = self._history.get(name)
+            if history is None:
+                history = self._history[name] = deque(maxlen=self.window)
+            history.append(elapsed)
+        self.frames += 1
+        self._frame_start = None
+
+    # Reporting
+    def snapshot(self) -> InstrumentationSnapshot:
+        sections = {}
+        for name, history in self._history.items():
+            values = [elapsed * 1e3 for elapsed in history]
+            sections[name] = SectionTiming(percentile(values, 0.50), percentile(values, 0.99),
+                                           sum(values) / len(values), max(values))
+        calls = {name: CallTiming(counter.count, counter.total, counter.total / counter.count if counter.count else 0.0)
+                 for name, counter in self._calls.items()}
+        return InstrumentationSnapshot(self.frames, sections, calls)
+
+    def report(self) -> str:
+        snapshot = self.snapshot()
+        lines = ["%d frames, last %d:" % (snapshot.frames, min(snapshot.frames, self.window)),
+                 "  %-12s %9s %9s %9s %9s" % ("section", "p50 ms", "p99 ms", "mean ms", "max ms")]
+        names = [name for name in FRAME_SECTIONS if name in snapshot.sections]
+        names += sorted(name for name in snapshot.sections if name not in FRAME_SECTIONS)
+        for name in names:
+            timing = snapshot.sections[name]
+            lines.append("  %-12s %9.3f %9.3f %9.3f %9.3f" % (name, timing.p50, timing.p99, timing.mean, timing.max))
+        lines.append("  %-26s %9s %11s %9s" % ("call", "count", "total ms", "mean us"))
+        for name, timing in sorted(snapshot.calls.items(), key=lambda item: -item[1].total):
+            lines.append("  %-26s %9d %11.2f %9.2f" % (name, timing.count, timing.total * 1e3, timing.mean * 1e6))
+        return "\n".join(lines)
+
+@contextmanager
+def profile_session(path: Optional[str], top: int = 25):
+    # Run the block under cProfile, dump the stats to path and print the
+    # heaviest functions. Does nothing without a path
+    if not path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print("profile written to " + path)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(top)
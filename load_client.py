@@ -0,0 +1,99 @@
+# Load test for server.py: opens many connections, each playing random games
+# as fast as the server answers, and reports move throughput and the latency of
+# move requests (send to reply, so it includes queueing in the validator).
+#
+#   python server.py --port 7777 &
+#   python load_client.py --port 7777 --connections 2000 --seconds 20
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import List
+
+class LoadStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.games = 0
+        self.moves = 0
+        self.errors = 0
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, line: str) -> str:
+    writer.write(line.encode("ascii") + b"\n")
+    await writer.drain()
+    return (await reader.readline()).decode("ascii").strip()
+
+async def _player(index: int, args: argparse.Namespace, deadline: float, stats: LoadStats):
+    rng = random.Random("%d:%d" % (args.seed, index))
+    try:
+        if args.unix:
+            reader, writer = await asyncio.open_unix_connection(args.unix)
+        else:
+            reader, writer = await asyncio.open_connection(args.host, args.port)
+    except OSError:
+        stats.errors += 1
+        return
+
+    try:
+        while time.perf_counter() < deadline:
+            await _request(reader, writer, "new")
+            stats.games += 1
+            for _ in range(args.max_plies):
+                reply = await _request(reader, writer, "moves")
+                moves = reply.split()[1:]
+                if not moves or time.perf_counter() >= deadline:
+                    break
+                start = time.perf_counter()
+                reply = await _request(reader, writer, "move " + rng.choice(moves))
+                stats.latencies.append(time.perf_counter() - start)
+                if not reply.startswith("ok"):
+                    stats.errors += 1
+                    break
+                stats.moves += 1
+                if reply != "ok ongoing":
+                    break
+        await _request(reader, writer, "quit")
+    except (ConnectionError, asyncio.IncompleteReadError):
+        stats.errors += 1
+    finally:
+        writer.close()
+
+async def run(args: argparse.Namespace) -> LoadStats:
+    stats = LoadStats()
+    deadline = time.perf_counter() + args.seconds
+    await asyncio.gather(*(_player(index, args, deadline, stats) for index in range(args.connections)))
+    return stats
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the chess server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--max-plies", type=int, default=200, help="start a new game after this many plies")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    stats = asyncio.run(run(args))
+    elapsed = time.perf_counter() - start
+
+    # Rejected moves have a latency but were not played
+    moves = stats.moves
+    print("%d connections, %d games, %d moves in %.1fs, %d errors" % (
+        args.connections, stats.games, moves, elapsed, stats.errors))
+    print("%.0f moves/sec" % (moves / elapsed if elapsed > 0 else 0.0))
+    print("move latency p50 %.2f ms, p99 %.2f ms, max %.2f ms" % (
+        percentile(stats.latencies, 0.50) * 1e3, percentile(stats.latencies, 0.99) * 1e3,
+        max(stats.latencies, default=0.0) * 1e3))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
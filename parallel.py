@@ -0,0 +1,152 @@
+# Multi-process search (Lazy SMP). Every worker process runs the normal
+# iterative deepening search on the same position; they share one
+# transposition table in shared memory, so a helper's results become cutoffs
+# and move ordering for the others. The main worker's result is returned and
+# the helpers are stopped as soon as it finishes.
+#
+#   python parallel.py --workers 1,2,4,8 --depth 5
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+from chess_rules import Board
+from bitboard import BitboardBoard
+from fen import STARTING_FEN, board_from_fen
+from search import MAX_PLY, SearchResult, Searcher, format_result
+from transposition import TranspositionTable, table_bytes
+
+# Positions for the speedup report: opening, open middlegames and an endgame
+BENCHMARK_POSITIONS = [
+    ("start", STARTING_FEN),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("italian", "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQK2R b KQkq - 0 5"),
+    ("middlegame", "r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 w - - 0 10"),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"),
+]
+
+# Worker process state, set up once by _init_worker
+_worker_searcher = None
+_worker_stop = None
+_worker_memory = None
+
+def _init_worker(memory_name: str, memory_mb: float, stop_event):
+    global _worker_searcher, _worker_stop, _worker_memory
+    # Keep a reference to the block, the table's views point into it
+    _worker_memory = shared_memory.SharedMemory(name=memory_name)
+    _worker_searcher = Searcher(TranspositionTable(memory_mb, buffer=_worker_memory.buf))
+    _worker_stop = stop_event
+
+def _worker_search(board: Board, worker: int, max_depth: int, time_limit: Optional[float],
+                   node_limit: Optional[int]) -> SearchResult:
+    searcher = _worker_searcher
+    if worker:
+        # Helpers order quiet moves slightly differently so they don't all
+        # walk the same tree in lockstep
+        seeded = random.Random(worker)
+        searcher.history = [[seeded.randrange(64) for _ in range(64)] for _ in range(64)]
+        # and search until the main worker is done
+        max_depth = MAX_PLY - 1
+        node_limit = None
+    return searcher.search(board, max_depth, time_limit, node_limit, _worker_stop)
+
+class ParallelSearcher:
+    def __init__(self, workers: int = os.cpu_count() or 1, memory_mb: float = 64):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.memory_mb = memory_mb
+        context = multiprocessing.get_context()
+        self._memory = shared_memory.SharedMemory(create=True, size=table_bytes(memory_mb))
+        self._stop = context.Event()
+        self.table = TranspositionTable(memory_mb, buffer=self._memory.buf)
+        self._pool = ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                         initargs=(self._memory.name, memory_mb, self._stop))
+
+    def clear(self):
+        # Empty the shared table for every worker
+        self.table.clear()
+
+    def search(self, board: Board, max_depth: int = MAX_PLY - 1, time_limit: Optional[float] = None,
+               node_limit: Optional[int] = None) -> SearchResult:
+        # Same limits as Searcher.search. nodes in the result counts every worker
+        start = time.perf_counter()
+        self._stop.clear()
+        position = board.copy(BitboardBoard)
+        futures = [self._pool.submit(_worker_search, position, worker, max_depth, time_limit, node_limit)
+                   for worker in range(self.workers)]
+
+        result = futures[0].result()
+        self._stop.set()
+        nodes = result.nodes + sum(future.result().nodes for future in futures[1:])
+        elapsed = time.perf_counter() - start
+        return result._replace(nodes=nodes, elapsed=elapsed, nps=nodes / elapsed if elapsed > 0 else 0.0)
+
+    def close(self):
+        self._stop.set()
+        self._pool.shutdown()
+        # Drop our views before the block goes away
+        self.table = None
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def benchmark(worker_counts: List[int], depth: int, memory_mb: float) -> Dict[int, float]:
+    # Time to reach a fixed depth on every benchmark position, single-process
+    # Searcher first, then the pool at each worker count. Tables start empty
+    boards = [(name, board_from_fen(fen, BitboardBoard)) for name, fen in BENCHMARK_POSITIONS]
+
+    def run(label: str, searcher) -> float:
+        total = 0.0
+        for name, board in boards:
+            searcher.clear()
+            result = searcher.search(board, depth)
+            total += result.elapsed
+            print("%-12s %-10s %s" % (label, name, format_result(result)))
+        return total
+
+    baseline = run("single", Searcher(TranspositionTable(memory_mb)))
+    times = {}
+    for workers in worker_counts:
+        with ParallelSearcher(workers, memory_mb) as searcher:
+            # Start the pool (imports, table views) outside the timing
+            searcher.search(boards[0][1], 1)
+            times[workers] = run("%d workers" % workers, searcher)
+
+    print()
+    print("single process  %7.2fs" % baseline)
+    for workers, elapsed in times.items():
+        print("%2d workers      %7.2fs  speedup %.2fx" % (workers, elapsed, baseline / elapsed if elapsed > 0 else 0.0))
+    return times
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Parallel search and speedup benchmark")
+    parser.add_argument("--workers", default=str(os.cpu_count() or 1),
+                        help="worker count, or a comma separated list to benchmark")
+    parser.add_argument("--depth", type=int, default=4, help="benchmark depth")
+    parser.add_argument("--hash-mb", type=float, default=64)
+    parser.add_argument("--fen", help="search this position instead of running the benchmark")
+    parser.add_argument("--time", type=float, default=5.0, help="time budget when searching --fen")
+    args = parser.parse_args(argv)
+
+    worker_counts = [int(count) for count in args.workers.split(",")]
+    if args.fen:
+        with ParallelSearcher(worker_counts[0], args.hash_mb) as searcher:
+            result = searcher.search(board_from_fen(args.fen, BitboardBoard), time_limit=args.time)
+        print(format_result(result))
+        return 0
+
+    benchmark(worker_counts, args.depth, args.hash_mb)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+# Perft: count leaf nodes of the move tree to a fixed depth. Used both as a
+# move generator correctness check and as a throughput benchmark.
+#
+#   python perft.py                   run the suite and print nodes/sec
+#   python perft.py --check           fail if node counts differ from the baseline
+#   python perft.py --update          rewrite the baseline with this run
+#   python perft.py --check --check-speed
+#                                     also fail on a nodes/sec drop; the shipped
+#                                     speeds come from another machine, so record
+#                                     a local baseline with --update first
+#   python perft.py --fen "..." --depth 3 --divide
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from chess_rules import Board, move_to_uci
+from bitboard import BitboardBoard
+from fen import STARTING_FEN, board_from_fen
+from transposition import SCORE_OFFSET, BoundType, TranspositionTable
+
+BACKENDS = {
+    "list": Board,
+    "bitboard": BitboardBoard,
+}
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perft_baseline.json")
+
+# (name, fen, depth): the start position plus the standard tricky positions
+PERFT_POSITIONS = [
+    ("start", STARTING_FEN, 4),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 3),
+    ("en-passant", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 4),
+    ("en-passant-capture", "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", 3),
+    ("promotion", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3),
+    ("promotion-castling", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 3),
+]
+
+def perft(board: Board, depth: int, table: Optional[TranspositionTable] = None) -> int:
+    # With a table, subtree counts are cached by position hash and depth so
+    # transpositions are counted with a single lookup
+    if table is not None and depth > 1:
+        entry = table.probe(board.hash)
+        if entry is not None and entry.depth == depth:
+            return entry.score
+
+    moves = board.legal_moves()
+    if depth <= 1:
+        # Bulk count the last ply instead of playing every leaf move
+        return len(moves) if depth == 1 else 1
+
+    nodes = 0
+    for move in moves:
+        board.make_move(move)
+        nodes += perft(board, depth - 1, table)
+        board.unmake_move()
+
+    if table is not None and nodes < SCORE_OFFSET:
+        table.store(board.hash, depth, BoundType.EXACT, nodes)
+    return nodes
+
+def divide(board: Board, depth: int, table: Optional[TranspositionTable] = None) -> Dict[str, int]:
+    # Node count below each root move, the usual way to bisect a perft mismatch
+    counts = {}
+    for move in board.legal_moves():
+        board.make_move(move)
+        counts[move_to_uci(move)] = perft(board, depth - 1, table)
+        board.unmake_move()
+    return counts
+
+def run_position(fen: str, depth: int, backend: str) -> Tuple[int, float]:
+    board = board_from_fen(fen, BACKENDS[backend])
+    start = time.perf_counter()
+    nodes = perft(board, depth)
+    elapsed = time.perf_counter() - start
+    return nodes, nodes / elapsed if elapsed > 0 else 0.0
+
+def run_suite(backend: str, positions = PERFT_POSITIONS) -> Dict[str, Dict]:
+    results = {}
+    for name, fen, depth in positions:
+        nodes, nps = run_position(fen, depth, backend)
+        results[name] = {"fen": fen, "depth": depth, "nodes": nodes, "nps": round(nps)}
+        print("%-20s depth %d  %10d nodes  %10.0f nodes/sec" % (name, depth, nodes, nps))
+    return results
+
+def compare_to_baseline(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float,
+                        check_speed: bool = False) -> List[str]:
+    failures = []
+    for name, expected in baseline.items():
+        actual = results.get(name)
+        if actual is None:
+            failures.append("%s: missing from this run" % name)
+        elif actual["depth"] != expected["depth"] or actual["nodes"] != expected["nodes"]:
+            failures.append("%s: expected %d nodes at depth %d, got %d at depth %d" %
+                            (name, expected["nodes"], expected["depth"], actual["nodes"], actual["depth"]))
+        elif check_speed and actual["nps"] < expected["nps"] * (1.0 - tolerance):
+            failures.append("%s: %d nodes/sec is more than %d%% below the baseline %d" %
+                            (name, actual["nps"], tolerance * 100, expected["nps"]))
+    return failures
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Perft correctness and throughput suite")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="bitboard")
+    parser.add_argument("--fen", help="run a single position instead of the suite")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print node counts per root move")
+    parser.add_argument("--hash-mb", type=float, default=0,
+                        help="cache subtree counts in a transposition table of this size (single position only)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--check", action="store_true", help="compare node counts against the baseline, exit 1 on a mismatch")
+    parser.add_argument("--check-speed", action="store_true",
+                        help="with --check, also fail on a nodes/sec drop (use a baseline recorded on this machine)")
+    parser.add_argument("--update", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed fractional drop in nodes/sec before --check-speed fails")
+    args = parser.parse_args(argv)
+
+    if args.fen:
+        board = board_from_fen(args.fen, BACKENDS[args.backend])
+        table = TranspositionTable(args.hash_mb) if args.hash_mb > 0 else None
+        start = time.perf_counter()
+        if args.divide:
+            counts = divide(board, args.depth, table)
+            for move, nodes in sorted(counts.items()):
+                print("%s: %d" % (move, nodes))
+            total = sum(counts.values())
+        else:
+            total = perft(board, args.depth, table)
+        elapsed = time.perf_counter() - start
+        print("nodes %d  time %.3fs  %.0f nodes/sec" % (total, elapsed, total / elapsed if elapsed > 0 else 0.0))
+        if table is not None:
+            print("hash " + ", ".join("%s %s" % item for item in table.stats().items()))
+        return 0
+
+    results = run_suite(args.backend)
+
+    if args.update:
+        with open(args.baseline, "w") as file:
+            json.dump({"backend": args.backend, "positions": results}, file, indent=2)
+            file.write("\n")
+        print("baseline written to " + args.baseline)
+
+    if args.check:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline["backend"] != args.backend:
+            print("baseline was recorded with the %s backend" % baseline["backend"])
+            return 1
+        failures = compare_to_baseline(results, baseline["positions"], args.tolerance, args.check_speed)
+        for failure in failures:
+            print("FAIL " + failure)
+        if failures:
+            return 1
+        print("perft matches baseline")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# Streaming PGN (Portable Game Notation) reader and writer.
+#
+# read_games() walks a file line by line and yields one game at a time, so
+# memory stays flat however large the file is. Moves stay as SAN text until a
+# caller replays them; iter_positions() does that on a single board, yielding
+# every position of every game without building any of them up front.
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+from chess_rules import Board, PieceColor, PieceType, move_from_square, move_promotion, move_to_square, square_coords, square_name
+from bitboard import BitboardBoard
+from fen import STARTING_FEN, board_from_fen, board_to_fen
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+# Seven tag roster, written first and in this order
+ROSTER = ["Event", "Site", "Date", "Round", "White", "Black", "Result"]
+
+SAN_LETTERS = {"N": PieceType.KNIGHT, "B": PieceType.BISHOP, "R": PieceType.ROOK, "Q": PieceType.QUEEN,
+               "K": PieceType.KING}
+PIECE_LETTERS = {piece_type: letter for letter, piece_type in SAN_LETTERS.items()}
+
+TAG_PATTERN = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# Movetext tokens: comments, variation brackets, NAGs, move numbers and moves
+TOKEN_PATTERN = re.compile(r'\{|;|\(|\)|\$\d+|\d+\.(?:\.\.)?|[^\s{}();]+')
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+LINE_WIDTH = 80
+
+class PgnGame(NamedTuple):
+    tags: Dict[str, str]
+    # Main line only, in SAN with check marks and annotations stripped
+    sans: List[str]
+    result: str
+
+def read_games(file: TextIO) -> Iterator[PgnGame]:
+    # Yields games as their movetext ends. Comments, NAGs and variations are skipped
+    tags = {}
+    sans = []
+    in_comment = False
+    variation_depth = 0
+    for line in file:
+        if in_comment:
+            end = line.find("}")
+            if end < 0:
+                continue
+            line = line[end + 1:]
+            in_comment = False
+
+        stripped = line.strip()
+        if not stripped or stripped.startswith("%"):
+            continue
+
+        if stripped.startswith("[") and variation_depth == 0:
+            match = TAG_PATTERN.match(stripped)
+            if match:
+                # Tags after movetext without a result start the next game
+                if sans:
+                    yield PgnGame(tags, sans, tags.get("Result", "*"))
+                    tags = {}
+                    sans = []
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+                continue
+
+        position = 0
+        while position < len(line):
+            match = TOKEN_PATTERN.search(line, position)
+            if match is None:
+                break
+            token = match.group(0)
+            position = match.end()
+
+            if token == "{":
+                end = line.find("}", position)
+                if end < 0:
+                    in_comment = True
+                    break
+                position = end + 1
+            elif token == ";":
+                break
+            elif token == "(":
+                variation_depth += 1
+            elif token == ")":
+                variation_depth = max(variation_depth - 1, 0)
+            elif variation_depth or token[0] == "$" or token[0].isdigit() and token.endswith("."):
+                continue
+            elif token in RESULTS:
+                yield PgnGame(tags, sans, token)
+                tags = {}
+                sans = []
+            else:
+                sans.append(token)
+
+    if tags or sans:
+        yield PgnGame(tags, sans, tags.get("Result", "*"))
+
+def read_games_from_path(path: str) -> Iterator[PgnGame]:
+    with open(path, encoding="utf-8", errors="replace") as file:
+        yield from read_games(file)
+
+def start_board(game: PgnGame, board_cls = BitboardBoard) -> Board:
+    # Games with a FEN tag start from that position
+    return board_from_fen(game.tags.get("FEN", STARTING_FEN), board_cls)
+
+def san_to_move(board: Board, san: str) -> int:
+    # Packed legal move for a SAN string in the current position
+    text = san.rstrip("+#!?")
+    legal = board.legal_moves()
+
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        file = 6 if len(text) == 3 else 2
+        for move in legal:
+            from_x, from_y = square_coords(move_from_square(move))
+            to_x = move_to_square(move) & 7
+            if board.board[from_x][from_y].type == PieceType.KING and from_x == 4 and to_x == file:
+                return move
+        raise ValueError("Illegal castling: " + san)
+
+    match = SAN_PATTERN.match(text)
+    if match is None:
+        raise ValueError("Bad SAN: " + san)
+    letter, from_file, from_rank, target, promotion = match.groups()
+    piece_type = SAN_LETTERS[letter] if letter else PieceType.PAWN
+    to_square = (int(target[1]) - 1) * 8 + ord(target[0]) - 97
+    # Without a promotion piece a pawn becomes a queen
+    promotion_value = SAN_LETTERS[promotion].value if promotion else PieceType.QUEEN.value
+
+    found = None
+    for move in legal:
+        if move_to_square(move) != to_square:
+            continue
+        from_square = move_from_square(move)
+        from_x, from_y = square_coords(from_square)
+        if board.board[from_x][from_y].type != piece_type:
+            continue
+        if from_file and from_x != ord(from_file) - 97:
+            continue
+        if from_rank and from_square >> 3 != int(from_rank) - 1:
+            continue
+        if move_promotion(move) and move_promotion(move) != promotion_value:
+            continue
+        if found is not None:
+            raise ValueError("Ambiguous SAN: " + san)
+        found = move
+    if found is None:
+        raise ValueError("Illegal SAN %s in %s" % (san, board_to_fen(board)))
+    return found
+
+def move_to_san(board: Board, move: int) -> str:
+    # SAN for a legal move in the current position, with check and mate marks
+    from_square = move_from_square(move)
+    to_square = move_to_square(move)
+    from_x, from_y = square_coords(from_square)
+    to_x, to_y = square_coords(to_square)
+    piece = board.board[from_x][from_y]
+
+    if piece.type == PieceType.KING and abs(to_x - from_x) == 2:
+        san = "O-O" if to_x > from_x else "O-O-O"
+    elif piece.type == PieceType.PAWN:
+        san = ""
+        if from_x != to_x:
+            san = chr(97 + from_x) + "x"
+        san += square_name(to_square)
+        if move_promotion(move):
+            san += "=" + PIECE_LETTERS[PieceType(move_promotion(move))]
+    else:
+        # Name the file, the rank or both when another piece of the type can
+        # reach the same square
+        rivals = []
+        for other in board.legal_moves():
+            if other != move and move_to_square(other) == to_square:
+                other_from = move_from_square(other)
+                other_x, other_y = square_coords(other_from)
+                if board.board[other_x][other_y].type == piece.type:
+                    rivals.append(other_from)
+        disambiguation = ""
+        if rivals:
+            if all(rival & 7 != from_x for rival in rivals):
+                disambiguation = chr(97 + from_x)
+            elif all(rival >> 3 != from_square >> 3 for rival in rivals):
+                disambiguation = str((from_square >> 3) + 1)
+            else:
+                disambiguation = square_name(from_square)
+        capture = "x" if board.board[to_x][to_y] is not None else ""
+        san = PIECE_LETTERS[piece.type] + disambiguation + capture + square_name(to_square)
+
+    board.make_move(move)
+    if board.in_check():
+        san += "#" if not board.legal_moves() else "+"
+    board.unmake_move()
+    return san
+
+def iter_moves(game: PgnGame, board: Board) -> Iterator[int]:
+    # Play the game's moves on board, yielding each packed move after it is made
+    for san in game.sans:
+        move = san_to_move(board, san)
+        board.make_move(move)
+        yield move
+
+def iter_positions(games: Iterable[PgnGame], board_cls = BitboardBoard) -> Iterator[Tuple[PgnGame, Board]]:
+    # Every position of every game, start position included. The board is
+    # reused between yields, copy it (Board.copy, board_to_fen) to keep one
+    for game in games:
+        board = start_board(game, board_cls)
+        yield game, board
+        for _ in iter_moves(game, board):
+            yield game, board
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+def format_game(moves: List[int], tags: Optional[Dict[str, str]] = None, result: str = "*",
+                board: Optional[Board] = None) -> str:
+    # PGN text for packed moves played from board (default: the initial
+    # setup). The board is left as it was
+    tags = dict(tags or {})
+    tags["Result"] = result
+    if board is None:
+        board = board_from_fen(STARTING_FEN, BitboardBoard)
+    start_fen = board_to_fen(board)
+    if start_fen != STARTING_FEN:
+        tags["SetUp"] = "1"
+        tags["FEN"] = start_fen
+
+    lines = []
+    for name in ROSTER:
+        lines.append('[%s "%s"]' % (name, _escape(tags.get(name, "?"))))
+    for name, value in tags.items():
+        if name not in ROSTER:
+            lines.append('[%s "%s"]' % (name, _escape(value)))
+    lines.append("")
+
+    tokens = []
+    played = 0
+    for move in moves:
+        if board.turn == PieceColor.WHITE:
+            tokens.append("%d." % board.fullmove_number)
+        elif played == 0:
+            tokens.append("%d..." % board.fullmove_number)
+        tokens.append(move_to_san(board, move))
+        board.make_move(move)
+        played += 1
+    for _ in range(played):
+        board.unmake_move()
+    tokens.append(result)
+
+    # Wrap movetext the way most PGN tools do
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = token if not line else line + " " + token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+class PgnWriter:
+    def __init__(self, file: TextIO):
+        self.file = file
+        self.games = 0
+
+    def write(self, moves: List[int], tags: Optional[Dict[str, str]] = None, result: str = "*",
+              board: Optional[Board] = None):
+        self.file.write(format_game(moves, tags, result, board))
+        self.games += 1
+
+    def write_game(self, game: PgnGame):
+        # Copy a game that was read, through a board so the SAN is normalised
+        board = start_board(game)
+        moves = list(iter_moves(game, board))
+        for _ in moves:
+            board.unmake_move()
+        self.write(moves, game.tags, game.result, board)
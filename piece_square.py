@@ -0,0 +1,114 @@
+# Material and piece-square values for the midgame and the endgame. Boards add
+# a piece's entry when it is placed and take it away when it is removed, so
+# their running totals always match the position; evaluation.py blends the
+# two totals by game phase.
+#
+# Tables are from White's side with a1 = index 0; Black uses them mirrored
+# vertically. Index 0 of every piece type axis is unused so PieceType.value
+# indexes directly.
+
+# Centipawns by PieceType.value
+MIDGAME_MATERIAL = [0, 100, 320, 330, 500, 900, 0]
+ENDGAME_MATERIAL = [0, 120, 300, 320, 520, 940, 0]
+
+# Pawn..king, midgame
+MIDGAME_TABLES = [
+    # Pawn
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     5, 10, 10, -20, -20, 10, 10, 5,
+     5, -5, -10, 0, 0, -10, -5, 5,
+     0, 0, 0, 20, 20, 0, 0, 0,
+     5, 5, 10, 25, 25, 10, 5, 5,
+     10, 10, 20, 30, 30, 20, 10, 10,
+     50, 50, 50, 50, 50, 50, 50, 50,
+     0, 0, 0, 0, 0, 0, 0, 0],
+    # Knight
+    [-50, -40, -30, -30, -30, -30, -40, -50,
+     -40, -20, 0, 5, 5, 0, -20, -40,
+     -30, 5, 10, 15, 15, 10, 5, -30,
+     -30, 0, 15, 20, 20, 15, 0, -30,
+     -30, 5, 15, 20, 20, 15, 5, -30,
+     -30, 0, 10, 15, 15, 10, 0, -30,
+     -40, -20, 0, 0, 0, 0, -20, -40,
+     -50, -40, -30, -30, -30, -30, -40, -50],
+    # Bishop
+    [-20, -10, -10, -10, -10, -10, -10, -20,
+     -10, 5, 0, 0, 0, 0, 5, -10,
+     -10, 10, 10, 10, 10, 10, 10, -10,
+     -10, 0, 10, 10, 10, 10, 0, -10,
+     -10, 5, 5, 10, 10, 5, 5, -10,
+     -10, 0, 5, 10, 10, 5, 0, -10,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -20, -10, -10, -10, -10, -10, -10, -20],
+    # Rook
+    [0, 0, 0, 5, 5, 0, 0, 0,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     -5, 0, 0, 0, 0, 0, 0, -5,
+     5, 10, 10, 10, 10, 10, 10, 5,
+     0, 0, 0, 0, 0, 0, 0, 0],
+    # Queen
+    [-20, -10, -10, -5, -5, -10, -10, -20,
+     -10, 0, 5, 0, 0, 0, 0, -10,
+     -10, 5, 5, 5, 5, 5, 0, -10,
+     0, 0, 5, 5, 5, 5, 0, -5,
+     -5, 0, 5, 5, 5, 5, 0, -5,
+     -10, 0, 5, 5, 5, 5, 0, -10,
+     -10, 0, 0, 0, 0, 0, 0, -10,
+     -20, -10, -10, -5, -5, -10, -10, -20],
+    # King, sheltered behind its pawns
+    [20, 30, 10, 0, 0, 10, 30, 20,
+     20, 20, 0, 0, 0, 0, 20, 20,
+     -10, -20, -20, -20, -20, -20, -20, -10,
+     -20, -30, -30, -40, -40, -30, -30, -20,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30],
+]
+
+# Pawn..king, endgame: pawns are worth more the closer they are to promoting
+# and the king belongs in the centre. Minor and major pieces keep their
+# midgame tables
+ENDGAME_TABLES = [
+    # Pawn
+    [0, 0, 0, 0, 0, 0, 0, 0,
+     5, 5, 5, 5, 5, 5, 5, 5,
+     10, 10, 10, 10, 10, 10, 10, 10,
+     20, 20, 20, 20, 20, 20, 20, 20,
+     35, 35, 35, 35, 35, 35, 35, 35,
+     55, 55, 55, 55, 55, 55, 55, 55,
+     80, 80, 80, 80, 80, 80, 80, 80,
+     0, 0, 0, 0, 0, 0, 0, 0],
+    MIDGAME_TABLES[1],
+    MIDGAME_TABLES[2],
+    MIDGAME_TABLES[3],
+    MIDGAME_TABLES[4],
+    # King
+    [-50, -30, -30, -30, -30, -30, -30, -50,
+     -30, -30, 0, 0, 0, 0, -30, -30,
+     -30, -10, 20, 30, 30, 20, -10, -30,
+     -30, -10, 30, 40, 40, 30, -10, -30,
+     -30, -10, 30, 40, 40, 30, -10, -30,
+     -30, -10, 20, 30, 30, 20, -10, -30,
+     -30, -20, -10, 0, 0, -10, -20, -30,
+     -50, -40, -30, -20, -20, -30, -40, -50],
+]
+
+# Game phase: the starting position's pieces add up to TOTAL_PHASE, bare
+# kings and pawns to 0
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+TOTAL_PHASE = 24
+
+def _signed_scores(material, tables):
+    # [color.value - 1][piece_type.value][square]: material plus table, positive
+    # for White and negative for Black
+    white = [[0] * 64] + [[material[piece_type] + tables[piece_type - 1][square] for square in range(64)]
+                          for piece_type in range(1, 7)]
+    black = [[-white[piece_type][square ^ 56] for square in range(64)] for piece_type in range(7)]
+    return [white, black]
+
+MIDGAME_SCORES = _signed_scores(MIDGAME_MATERIAL, MIDGAME_TABLES)
+ENDGAME_SCORES = _signed_scores(ENDGAME_MATERIAL, ENDGAME_TABLES)
@@ -0,0 +1,62 @@
+# Dirty-rectangle renderer for the pygame board. The checkerboard is drawn
+# once into a cached surface; each frame only the squares whose piece or
+# highlight changed since the last frame are redrawn and handed to
+# pygame.display.update.
+import pygame
+from typing import List, Tuple
+
+def render_checkerboard(square_size: int, light_color: Tuple[int, int, int],
+                        dark_color: Tuple[int, int, int]) -> pygame.Surface:
+    background = pygame.Surface((square_size * 8, square_size * 8))
+    for row in range(8):
+        for col in range(8):
+            color = light_color if (row + col) % 2 == 0 else dark_color
+            background.fill(color, (col * square_size, row * square_size, square_size, square_size))
+    if pygame.display.get_surface() is not None:
+        background = background.convert()
+    return background
+
+class DirtyRenderer:
+    def __init__(self, board, square_size: int, light_color: Tuple[int, int, int],
+                 dark_color: Tuple[int, int, int]):
+        self.board = board
+        self.square_size = square_size
+        self.background = render_checkerboard(square_size, light_color, dark_color)
+        # What each square showed last frame: (piece color, piece type, highlight)
+        self._drawn = [None] * 64
+        self._full_redraw = True
+
+    def invalidate(self):
+        # Redraw everything next frame (window exposed, resized, ...)
+        self._full_redraw = True
+
+    def render(self, screen: pygame.Surface, clicked_piece) -> List[pygame.Rect]:
+        # Draw the squares that changed and return their rects for display.update
+        board = self.board
+        board._determine_highlights(clicked_piece)
+        highlights = {}
+        for [x_coord, y_coord, occupation_type] in board.highlights:
+            highlights[(x_coord, y_coord)] = occupation_type
+
+        size = self.square_size
+        rects = []
+        for x_coord in range(8):
+            column = board.board[x_coord]
+            for y_coord in range(8):
+                piece = column[y_coord]
+                state = (None if piece is None else (piece.color, piece.type), highlights.get((x_coord, y_coord)))
+                index = y_coord * 8 + x_coord
+                if not self._full_redraw and self._drawn[index] == state:
+                    continue
+                self._drawn[index] = state
+
+                rect = pygame.Rect(x_coord * size, y_coord * size, size, size)
+                screen.blit(self.background, rect, rect)
+                if piece is not None:
+                    piece.draw(screen)
+                if state[1] is not None:
+                    board._draw_highlight(screen, x_coord, y_coord, state[1])
+                rects.append(rect)
+
+        self._full_redraw = False
+        return rects
@@ -0,0 +1,83 @@
+# Replay viewer for game archives, drawn with the game window's board.
+#
+#   python replay.py games.cga --game 0
+#
+# Left/Right step a ply, Page Up/Page Down jump 10, Home/End go to the start
+# and the end, Up/Down switch to the previous or next game.
+import argparse
+import sys
+import pygame
+from archive import GameArchive
+from animate import DrawableBoard, WHITE, make_sprite_piece, screen_height, screen_width, sprite_atlas
+from chess_rules import EmptyObject, move_to_uci
+
+# Key -> plies to step by
+PLY_KEYS = {
+    pygame.K_LEFT: -1,
+    pygame.K_RIGHT: 1,
+    pygame.K_PAGEUP: -10,
+    pygame.K_PAGEDOWN: 10,
+}
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Step through archived games")
+    parser.add_argument("archive")
+    parser.add_argument("--game", type=int, default=0)
+    parser.add_argument("--ply", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    archive = GameArchive(args.archive)
+    if not len(archive):
+        print(args.archive + " holds no games")
+        return 1
+
+    pygame.init()
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    sprite_atlas.preload()
+    sprite_atlas.convert_for_display()
+
+    game_index = args.game % len(archive)
+    game = archive[game_index]
+    ply = max(0, min(args.ply, game.plies))
+    changed = True
+    running = True
+
+    while running:
+        if changed:
+            # Seeking rebuilds the board from the nearest keyframe, so any ply
+            # is as quick to reach as the next one
+            board = game.board_at(ply, DrawableBoard, make_sprite_piece)
+            screen.fill(WHITE)
+            board.draw(screen, EmptyObject())
+            pygame.display.flip()
+            last_move = " " + move_to_uci(game.move(ply - 1)) if ply else ""
+            pygame.display.set_caption("Replay - game %d/%d, ply %d/%d%s, %s" % (
+                game_index + 1, len(archive), ply, game.plies, last_move, game.result))
+            changed = False
+
+        for event in [pygame.event.wait()] + pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                changed = True
+            elif event.type == pygame.KEYDOWN:
+                if event.key in PLY_KEYS:
+                    ply = max(0, min(ply + PLY_KEYS[event.key], game.plies))
+                elif event.key == pygame.K_HOME:
+                    ply = 0
+                elif event.key == pygame.K_END:
+                    ply = game.plies
+                elif event.key in (pygame.K_UP, pygame.K_DOWN):
+                    game_index = (game_index + (1 if event.key == pygame.K_DOWN else -1)) % len(archive)
+                    game = archive[game_index]
+                    ply = 0
+                else:
+                    continue
+                changed = True
+
+    pygame.quit()
+    archive.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
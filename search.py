@@ -0,0 +1,363 @@
+# Game tree search: negamax alpha-beta with iterative deepening, a quiescence
+# search over captures, the transposition table, and MVV-LVA / killer / history
+# move ordering. Works on any Board backend through legal_moves and
+# make_move/unmake_move.
+#
+#   python search.py --fen "..." --time 2.0
+#   python search.py --depth 5
+import argparse
+import sys
+import time
+from typing import Callable, List, NamedTuple, Optional, Sequence
+from chess_rules import Board, PieceType, move_to_uci
+from bitboard import BitboardBoard
+from evaluation import evaluate
+from fen import STARTING_FEN, board_from_fen
+from transposition import BoundType, TranspositionTable
+
+# Centipawn values indexed by PieceType.value, index 0 unused
+PIECE_VALUES = [0, 100, 320, 330, 500, 900, 0]
+
+INFINITY = 1000000
+MATE_SCORE = 100000
+# Scores beyond this are mates, stored in the table relative to the node
+MATE_BOUND = MATE_SCORE - 1000
+MAX_PLY = 128
+
+# How many nodes go by between clock checks
+CHECK_INTERVAL = 1024
+
+# Move ordering bands, highest searched first
+TT_MOVE_ORDER = 1 << 30
+CAPTURE_ORDER = 1 << 20
+KILLER_ORDER = 1 << 19
+HISTORY_LIMIT = 1 << 18
+
+class SearchAborted(Exception):
+    pass
+
+class SearchResult(NamedTuple):
+    move: int
+    score: int
+    depth: int
+    pv: List[int]
+    nodes: int
+    elapsed: float
+    nps: float
+    # Node growth from one completed iteration to the next
+    branching_factor: float
+    # Nodes searched by each completed iteration, depth 1 first
+    iteration_nodes: List[int]
+
+def is_mate_score(score: int) -> bool:
+    return abs(score) >= MATE_BOUND
+
+def _score_to_table(score: int, ply: int) -> int:
+    # Mate scores count plies from the root, the table stores them from the node
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+def _score_from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+class Searcher:
+    def __init__(self, table: Optional[TranspositionTable] = None, evaluate = evaluate):
+        # The table and the history scores persist across searches so the next
+        # move starts warm
+        self.table = table if table is not None else TranspositionTable()
+        self.evaluate = evaluate
+        self.history = [[0] * 64 for _ in range(64)]
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.nodes = 0
+        self._pv = [[] for _ in range(MAX_PLY + 1)]
+        self._deadline = None
+        self._node_limit = None
+        self._stop_event = None
+        self._next_check = CHECK_INTERVAL
+        self._can_stop = False
+        # Hashes of the positions before the searched board's own history
+        self._game_hashes = []
+
+    def clear(self):
+        self.table.clear()
+        self.history = [[0] * 64 for _ in range(64)]
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+
+    def search(self, board: Board, max_depth: int = MAX_PLY - 1, time_limit: Optional[float] = None,
+               node_limit: Optional[int] = None, stop_event = None,
+               on_iteration: Optional[Callable[[SearchResult], None]] = None,
+               game_hashes: Sequence[int] = ()) -> SearchResult:
+        # Iterative deepening until max_depth, the wall-clock budget (seconds)
+        # or the node budget runs out, or stop_event (a threading or
+        # multiprocessing Event) is set. Depth 1 always completes so there is
+        # a move to return; an interrupted iteration is thrown away.
+        # on_iteration gets the result so far after every completed depth.
+        # game_hashes, oldest first, are the positions played before the
+        # board's history starts, e.g. the game a Board.copy was taken from,
+        # so repetitions of them are seen too
+        start = time.perf_counter()
+        self._game_hashes = list(game_hashes)
+        self._deadline = start + time_limit if time_limit is not None else None
+        self._node_limit = node_limit
+        self._stop_event = stop_event
+        self._can_stop = False
+        self.nodes = 0
+        self._next_check = CHECK_INTERVAL if node_limit is None else min(CHECK_INTERVAL, node_limit)
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.table.new_search()
+        history_length = len(board.history)
+
+        best_move = 0
+        best_score = 0
+        best_pv = []
+        completed = 0
+        iteration_nodes = []
+        for depth in range(1, min(max_depth, MAX_PLY - 1) + 1):
+            nodes_before = self.nodes
+            try:
+                score = self._negamax(board, depth, -INFINITY, INFINITY, 0)
+            except SearchAborted:
+                # Take back whatever the interrupted iteration left on the board
+                while len(board.history) > history_length:
+                    board.unmake_move()
+                break
+            self._can_stop = True
+            completed = depth
+            best_score = score
+            best_pv = list(self._pv[0])
+            best_move = best_pv[0] if best_pv else 0
+            iteration_nodes.append(self.nodes - nodes_before)
+            if on_iteration is not None:
+                on_iteration(self._result(best_move, best_score, completed, best_pv, start, iteration_nodes))
+
+            # No legal moves, or a forced mate found: deeper won't change it
+            if not best_pv or is_mate_score(score):
+                break
+            if self._deadline is not None and time.perf_counter() >= self._deadline:
+                break
+            if stop_event is not None and stop_event.is_set():
+                break
+
+        return self._result(best_move, best_score, completed, best_pv, start, iteration_nodes)
+
+    def _result(self, move: int, score: int, depth: int, pv: List[int], start: float,
+                iteration_nodes: List[int]) -> SearchResult:
+        elapsed = time.perf_counter() - start
+        if len(iteration_nodes) >= 2 and iteration_nodes[-2]:
+            branching_factor = iteration_nodes[-1] / iteration_nodes[-2]
+        else:
+            branching_factor = float(iteration_nodes[0]) if iteration_nodes else 0.0
+        return SearchResult(move, score, depth, list(pv), self.nodes, elapsed,
+                            self.nodes / elapsed if elapsed > 0 else 0.0, branching_factor, list(iteration_nodes))
+
+    def _count_node(self):
+        self.nodes += 1
+        if self.nodes >= self._next_check:
+            self._next_check = self.nodes + CHECK_INTERVAL
+            if self._can_stop:
+                if self._node_limit is not None and self.nodes >= self._node_limit:
+                    raise SearchAborted()
+                if self._deadline is not None and time.perf_counter() >= self._deadline:
+                    raise SearchAborted()
+                if self._stop_event is not None and self._stop_event.is_set():
+                    raise SearchAborted()
+            if self._node_limit is not None:
+                self._next_check = max(min(self._next_check, self._node_limit), self.nodes + 1)
+
+    def _is_repetition(self, board: Board) -> bool:
+        # The position occurred before with the same side to move. Records hold
+        # the hash before their move, so every other record going back matches;
+        # nothing before the last capture or pawn move can repeat
+        history = board.history
+        hash = board.hash
+        limit = len(history) - board.halfmove_clock
+        for index in range(len(history) - 4, max(limit, 0) - 1, -2):
+            if history[index][8] == hash:
+                return True
+        if limit >= 0 or not self._game_hashes:
+            return False
+
+        # The window reaches back into the game before the board's history.
+        # Index the game hashes as if they came first, starting from the last
+        # one with the same parity as the positions checked above
+        game = self._game_hashes
+        index = len(game) + len(history) - 4
+        if index >= len(game):
+            index -= ((index - len(game)) // 2 + 1) * 2
+        for index in range(index, max(len(game) + limit, 0) - 1, -2):
+            if game[index] == hash:
+                return True
+        return False
+
+    def _negamax(self, board: Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self._quiescence(board, alpha, beta, ply)
+
+        self._count_node()
+        self._pv[ply] = []
+        if ply and self._is_repetition(board):
+            return 0
+
+        # Table cutoffs, except at the root where the move and PV are needed
+        tt_move = 0
+        entry = self.table.probe(board.hash)
+        if entry is not None:
+            tt_move = entry.move
+            if ply and entry.depth >= depth:
+                score = _score_from_table(entry.score, ply)
+                if entry.bound == BoundType.EXACT or \
+                    (entry.bound == BoundType.LOWER and score >= beta) or \
+                    (entry.bound == BoundType.UPPER and score <= alpha):
+                    if tt_move:
+                        self._pv[ply] = [tt_move]
+                    return score
+
+        moves = board.legal_moves()
+        if not moves:
+            return -MATE_SCORE + ply if board.in_check() else 0
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        for move in self._order_moves(board, moves, tt_move, ply):
+            board.make_move(move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self._pv[ply] = [move] + self._pv[ply + 1]
+                    if alpha >= beta:
+                        if not self._is_capture(board, move):
+                            self._record_cutoff(move, depth, ply)
+                        break
+
+        if best_score <= original_alpha:
+            bound = BoundType.UPPER
+        elif best_score >= beta:
+            bound = BoundType.LOWER
+        else:
+            bound = BoundType.EXACT
+        self.table.store(board.hash, depth, bound, _score_to_table(best_score, ply), best_move)
+        return best_score
+
+    def _quiescence(self, board: Board, alpha: int, beta: int, ply: int) -> int:
+        # Only captures and promotions, so the static eval is never taken in
+        # the middle of an exchange
+        self._count_node()
+        self._pv[ply] = []
+
+        stand_pat = self.evaluate(board)
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        captures = [move for move in board.legal_moves() if self._is_capture(board, move) or move >> 12]
+        for move in self._order_moves(board, captures, 0, ply):
+            board.make_move(move)
+            score = -self._quiescence(board, -beta, -alpha, ply + 1)
+            board.unmake_move()
+
+            if score > alpha:
+                alpha = score
+                self._pv[ply] = [move] + self._pv[ply + 1]
+                if alpha >= beta:
+                    break
+        return alpha
+
+    def _is_capture(self, board: Board, move: int) -> bool:
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        if board.board[to_square & 7][7 - (to_square >> 3)] is not None:
+            return True
+        # A pawn changing file onto an empty square is taking en passant
+        return (from_square ^ to_square) & 7 != 0 and \
+            board.board[from_square & 7][7 - (from_square >> 3)].type == PieceType.PAWN
+
+    def _order_moves(self, board: Board, moves: List[int], tt_move: int, ply: int) -> List[int]:
+        # Table move, then captures by MVV-LVA (most valuable victim, least
+        # valuable attacker), then killers, then quiet moves by history score
+        squares = board.board
+        killers = self.killers[ply]
+        history = self.history
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                scored.append((TT_MOVE_ORDER, move))
+                continue
+            from_square = move & 63
+            to_square = (move >> 6) & 63
+            attacker = squares[from_square & 7][7 - (from_square >> 3)].type._value_
+            victim = squares[to_square & 7][7 - (to_square >> 3)]
+            if victim is not None:
+                order = CAPTURE_ORDER + PIECE_VALUES[victim.type._value_] * 16 - attacker
+            elif attacker == 1 and (from_square ^ to_square) & 7:
+                order = CAPTURE_ORDER + PIECE_VALUES[1] * 16 - attacker
+            elif move >> 12:
+                order = CAPTURE_ORDER + PIECE_VALUES[move >> 12]
+            elif move == killers[0]:
+                order = KILLER_ORDER + 1
+            elif move == killers[1]:
+                order = KILLER_ORDER
+            else:
+                order = history[from_square][to_square]
+            scored.append((order, move))
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    def _record_cutoff(self, move: int, depth: int, ply: int):
+        # Quiet moves that cause a cutoff are tried early in sibling nodes
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        self.history[from_square][to_square] += depth * depth
+        if self.history[from_square][to_square] >= HISTORY_LIMIT:
+            # Halve everything so old results fade and scores stay below the killers
+            self.history = [[score // 2 for score in row] for row in self.history]
+
+def format_result(result: SearchResult) -> str:
+    if is_mate_score(result.score):
+        plies = MATE_SCORE - abs(result.score)
+        score = "mate %d" % ((plies + 1) // 2 if result.score > 0 else -((plies + 1) // 2))
+    else:
+        score = "cp %d" % result.score
+    return "depth %d  score %s  nodes %d  time %.3fs  nps %.0f  ebf %.2f  pv %s" % (
+        result.depth, score, result.nodes, result.elapsed, result.nps, result.branching_factor,
+        " ".join(move_to_uci(move) for move in result.pv))
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Search a position and print the best move")
+    parser.add_argument("--fen", default=STARTING_FEN)
+    parser.add_argument("--depth", type=int, default=MAX_PLY - 1)
+    parser.add_argument("--time", type=float, help="wall-clock budget in seconds")
+    parser.add_argument("--nodes", type=int, help="node budget")
+    parser.add_argument("--hash-mb", type=float, default=16)
+    args = parser.parse_args(argv)
+
+    if args.time is None and args.nodes is None and args.depth == MAX_PLY - 1:
+        args.time = 1.0
+
+    board = board_from_fen(args.fen, BitboardBoard)
+    searcher = Searcher(TranspositionTable(args.hash_mb))
+    result = searcher.search(board, args.depth, args.time, args.nodes)
+    print(format_result(result))
+    print("bestmove " + (move_to_uci(result.move) if result.move else "(none)"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
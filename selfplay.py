@@ -0,0 +1,253 @@
+# Headless self-play: plays N engine-vs-engine games in worker processes and
+# streams each finished game to disk as a compact binary record.
+#
+#   python selfplay.py --games 1000 --workers 8 --seed 7 --out runs/selfplay
+#   python selfplay.py --games 2000 --workers 8 --seed 7 --out runs/selfplay   (resumes, plays 1000 more)
+#
+# Every game is seeded from (run seed, game index) and the engine searches a
+# fixed node budget with a table cleared per game, so a game replays exactly
+# no matter which worker plays it or in what order. Rerunning into the same
+# directory skips the games already on disk.
+#
+# games.bin is a 4 byte magic followed by one record per game:
+#   >IHHBB header: game index, opening index (0xFFFF = initial setup), plies,
+#                  GameResult, Termination
+#   >H per ply:    packed move (from | to << 6 | promotion << 12)
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+from collections import Counter
+from enum import Enum
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+from chess_rules import Board, PieceColor, PieceType, new_game_board
+from bitboard import BitboardBoard
+from fen import board_from_fen
+from search import Searcher
+from transposition import TranspositionTable
+
+MAGIC = b"SPG1"
+HEADER = struct.Struct(">IHHBB")
+MOVE = struct.Struct(">H")
+INITIAL_SETUP = 0xFFFF
+
+# Files inside the output directory
+GAMES_FILE = "games.bin"
+RUN_FILE = "run.json"
+SUMMARY_FILE = "summary.json"
+
+class GameResult(Enum):
+    WHITE_WIN = 1
+    BLACK_WIN = 2
+    DRAW = 3
+
+class Termination(Enum):
+    CHECKMATE = 1
+    STALEMATE = 2
+    REPETITION = 3
+    FIFTY_MOVES = 4
+    INSUFFICIENT_MATERIAL = 5
+    MAX_PLIES = 6
+
+class GameRecord(NamedTuple):
+    index: int
+    opening: int
+    result: GameResult
+    termination: Termination
+    moves: List[int]
+
+def encode_game(record: GameRecord) -> bytes:
+    return HEADER.pack(record.index, record.opening, len(record.moves), record.result.value,
+                       record.termination.value) + struct.pack(">%dH" % len(record.moves), *record.moves)
+
+def read_games(path: str) -> Iterator[GameRecord]:
+    # Stream records back one at a time; a record cut off by an interrupted
+    # run is ignored
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a self-play game file")
+        while True:
+            header = file.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            index, opening, plies, result, termination = HEADER.unpack(header)
+            body = file.read(plies * MOVE.size)
+            if len(body) < plies * MOVE.size:
+                return
+            yield GameRecord(index, opening, GameResult(result), Termination(termination),
+                             list(struct.unpack(">%dH" % plies, body)))
+
+def _complete_length(path: str) -> int:
+    # Byte length of the complete records, so a partial tail can be truncated
+    length = len(MAGIC)
+    with open(path, "rb") as file:
+        file.seek(length)
+        while True:
+            header = file.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return length
+            plies = HEADER.unpack(header)[2]
+            if len(file.read(plies * MOVE.size)) < plies * MOVE.size:
+                return length
+            length += HEADER.size + plies * MOVE.size
+
+def insufficient_material(board: Board) -> bool:
+    # Bare kings, or kings plus a single knight or bishop
+    others = [piece for piece in board.pieces() if piece.type != PieceType.KING]
+    return len(others) == 0 or (len(others) == 1 and others[0].type in (PieceType.KNIGHT, PieceType.BISHOP))
+
+# Worker process state
+_searcher = None
+
+def _init_worker(hash_mb: float):
+    global _searcher
+    _searcher = Searcher(TranspositionTable(hash_mb))
+
+def play_game(index: int, seed: int, opening: int, fen: Optional[str], nodes: int, random_plies: int,
+              max_plies: int, searcher: Optional[Searcher] = None) -> GameRecord:
+    # The first random_plies moves are random for variety, the rest are the
+    # engine's choice with a fixed node budget
+    searcher = searcher if searcher is not None else _searcher
+    searcher.clear()
+    rng = random.Random("%d:%d" % (seed, index))
+    board = board_from_fen(fen, BitboardBoard) if fen else new_game_board(BitboardBoard)
+
+    moves = []
+    seen = Counter([board.hash])
+    while True:
+        legal = board.legal_moves()
+        if not legal:
+            if board.in_check():
+                winner = GameResult.BLACK_WIN if board.turn == PieceColor.WHITE else GameResult.WHITE_WIN
+                return GameRecord(index, opening, winner, Termination.CHECKMATE, moves)
+            return GameRecord(index, opening, GameResult.DRAW, Termination.STALEMATE, moves)
+        if seen[board.hash] >= 3:
+            return GameRecord(index, opening, GameResult.DRAW, Termination.REPETITION, moves)
+        if board.halfmove_clock >= 100:
+            return GameRecord(index, opening, GameResult.DRAW, Termination.FIFTY_MOVES, moves)
+        if insufficient_material(board):
+            return GameRecord(index, opening, GameResult.DRAW, Termination.INSUFFICIENT_MATERIAL, moves)
+        if len(moves) >= max_plies:
+            return GameRecord(index, opening, GameResult.DRAW, Termination.MAX_PLIES, moves)
+
+        if len(moves) < random_plies:
+            move = rng.choice(legal)
+        else:
+            move = searcher.search(board, node_limit=nodes).move
+
+        board.make_move(move)
+        moves.append(move)
+        seen[board.hash] += 1
+
+def _play_encoded(job: Tuple) -> bytes:
+    return encode_game(play_game(*job))
+
+def load_openings(path: str) -> List[str]:
+    # One FEN per line, blank lines and # comments skipped
+    with open(path) as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+def summarize(path: str, elapsed: Optional[float] = None, played: int = 0) -> dict:
+    results = Counter()
+    terminations = Counter()
+    lengths = []
+    for record in read_games(path):
+        results[record.result.name] += 1
+        terminations[record.termination.name] += 1
+        lengths.append(len(record.moves))
+
+    summary = {
+        "games": len(lengths),
+        "results": dict(results),
+        "terminations": dict(terminations),
+        "plies_mean": sum(lengths) / len(lengths) if lengths else 0.0,
+        "plies_min": min(lengths) if lengths else 0,
+        "plies_max": max(lengths) if lengths else 0,
+        "bytes": os.path.getsize(path),
+    }
+    if elapsed is not None:
+        summary["played_this_run"] = played
+        summary["seconds"] = round(elapsed, 3)
+        summary["games_per_sec"] = played / elapsed if elapsed > 0 else 0.0
+    return summary
+
+def run(out_dir: str, games: int, workers: int, seed: int, nodes: int, random_plies: int, max_plies: int,
+        openings: Optional[List[str]] = None, hash_mb: float = 1) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    games_path = os.path.join(out_dir, GAMES_FILE)
+    run_path = os.path.join(out_dir, RUN_FILE)
+
+    # A resumed run must use the settings the existing games were played with.
+    # The table size counts too: it changes which move a node-limited search picks
+    settings = {"seed": seed, "nodes": nodes, "random_plies": random_plies, "max_plies": max_plies,
+                "openings": openings or [], "hash_mb": hash_mb}
+    if os.path.exists(run_path):
+        with open(run_path) as file:
+            previous = json.load(file)
+        if previous != settings:
+            raise ValueError("%s was played with different settings: %s" % (out_dir, previous))
+    else:
+        with open(run_path, "w") as file:
+            json.dump(settings, file, indent=2)
+
+    done = set()
+    if os.path.exists(games_path):
+        done = {record.index for record in read_games(games_path)}
+        with open(games_path, "r+b") as file:
+            file.truncate(_complete_length(games_path))
+    else:
+        with open(games_path, "wb") as file:
+            file.write(MAGIC)
+
+    jobs = []
+    for index in range(games):
+        if index in done:
+            continue
+        if openings:
+            opening = index % len(openings)
+            jobs.append((index, seed, opening, openings[opening], nodes, random_plies, max_plies))
+        else:
+            jobs.append((index, seed, INITIAL_SETUP, None, nodes, random_plies, max_plies))
+
+    start = time.perf_counter()
+    with open(games_path, "ab") as file, \
+        multiprocessing.Pool(workers, initializer=_init_worker, initargs=(hash_mb,)) as pool:
+        # Records are written as games finish, in whatever order that is
+        for count, data in enumerate(pool.imap_unordered(_play_encoded, jobs), 1):
+            file.write(data)
+            file.flush()
+            if count % 100 == 0:
+                print("%d/%d games" % (count, len(jobs)))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(games_path, elapsed, len(jobs))
+    summary["workers"] = workers
+    with open(os.path.join(out_dir, SUMMARY_FILE), "w") as file:
+        json.dump(summary, file, indent=2)
+    return summary
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Batch engine self-play")
+    parser.add_argument("--games", type=int, default=100, help="total games in the run, including ones on disk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default="selfplay_games")
+    parser.add_argument("--nodes", type=int, default=2000, help="engine node budget per move")
+    parser.add_argument("--random-plies", type=int, default=8, help="random opening moves per game")
+    parser.add_argument("--max-plies", type=int, default=300, help="adjudicate a draw after this many plies")
+    parser.add_argument("--openings", help="file with one starting FEN per line")
+    parser.add_argument("--hash-mb", type=float, default=1, help="transposition table per worker")
+    args = parser.parse_args(argv)
+
+    openings = load_openings(args.openings) if args.openings else None
+    summary = run(args.out, args.games, args.workers, args.seed, args.nodes, args.random_plies, args.max_plies,
+                  openings, args.hash_mb)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
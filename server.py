@@ -0,0 +1,232 @@
+# Asyncio game server: hosts many games over a line based protocol on TCP or a
+# Unix socket, all on one thread. Each request is one line and gets one reply.
+#
+#   python server.py --port 7777
+#   python server.py --unix /tmp/chess.sock
+#
+#   new [fen]      start a game and make it the connection's game -> ok <id>
+#   join <id>      switch to an existing game                    -> ok <id>
+#   move <uci>     play a move in the current game               -> ok ongoing|checkmate|stalemate, or illegal
+#   moves          legal moves of the current game               -> ok e2e4 d2d4 ...
+#   fen            position of the current game                  -> ok <fen>
+#   stats          server counters                               -> ok games=... moves=... ...
+#   quit                                                         -> bye
+#
+# Moves are not checked by the handler that reads them: they are queued, and a
+# single validator task drains the queue and checks every waiting move in one
+# pass, so a burst from many connections costs one wake-up. Games nobody has
+# touched for a while are parked as a CompactState and rebuilt on their next
+# request.
+import argparse
+import asyncio
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from chess_rules import Board, GameState, move_to_uci
+from bitboard import BitboardBoard
+from compact_state import CompactState
+from fen import STARTING_FEN, board_from_fen, board_to_fen
+
+# Longest request line accepted, a FEN with room to spare
+MAX_LINE = 256
+
+class GameSession:
+    def __init__(self, game_id: int, board: Board):
+        self.game_id = game_id
+        self.board = board
+        self.state = None
+        # UCI text -> packed move for the current position, built on demand
+        self.legal = None
+        self.last_active = time.monotonic()
+
+    def wake(self) -> Board:
+        if self.board is None:
+            self.board = self.state.to_board()
+            self.state = None
+        self.last_active = time.monotonic()
+        return self.board
+
+    def park(self):
+        # Drop the board and its undo history, keeping only the position
+        if self.board is not None:
+            self.state = CompactState.from_board(self.board)
+            self.board = None
+            self.legal = None
+
+    def legal_moves(self) -> Dict[str, int]:
+        # Waking on every call also marks the game active when the cache hits
+        board = self.wake()
+        if self.legal is None:
+            self.legal = {move_to_uci(move): move for move in board.legal_moves()}
+        return self.legal
+
+    def game_state(self) -> GameState:
+        if self.legal_moves():
+            return GameState.ONGOING
+        return GameState.CHECKMATE if self.board.in_check() else GameState.STALEMATE
+
+    def play(self, uci: str) -> str:
+        move = self.legal_moves().get(uci)
+        if move is None:
+            return "illegal " + uci
+        self.board.make_move(move)
+        self.legal = None
+        return "ok " + self.game_state().name.lower()
+
+class GameServer:
+    def __init__(self, park_after: float = 60.0):
+        if park_after <= 0:
+            raise ValueError("park_after must be positive, got %r" % park_after)
+        self.park_after = park_after
+        self.sessions: Dict[int, GameSession] = {}
+        self.connections = 0
+        self.moves = 0
+        self.batches = 0
+        self._next_id = 1
+        self._pending: List[Tuple[GameSession, str, asyncio.Future]] = []
+        self._pending_event = asyncio.Event()
+        self._tasks = []
+
+    def new_game(self, fen: Optional[str] = None) -> GameSession:
+        session = GameSession(self._next_id, board_from_fen(fen or STARTING_FEN, BitboardBoard))
+        self.sessions[session.game_id] = session
+        self._next_id += 1
+        return session
+
+    async def validate_move(self, session: GameSession, uci: str) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((session, uci, future))
+        self._pending_event.set()
+        return await future
+
+    async def _validator(self):
+        while True:
+            await self._pending_event.wait()
+            self._pending_event.clear()
+            batch, self._pending = self._pending, []
+            self.batches += 1
+            # In arrival order, so two moves queued for one game apply in turn
+            for session, uci, future in batch:
+                if future.done():
+                    continue
+                # A move that breaks the rules code fails on its own, the
+                # validator has to keep serving every other client
+                try:
+                    reply = session.play(uci)
+                except Exception as error:
+                    reply = "error %s: %s" % (type(error).__name__, error)
+                # Only moves actually played count towards the stats
+                if reply.startswith("ok"):
+                    self.moves += 1
+                future.set_result(reply)
+
+    async def _parker(self):
+        while True:
+            await asyncio.sleep(self.park_after / 2)
+            cutoff = time.monotonic() - self.park_after
+            for session in self.sessions.values():
+                if session.board is not None and session.last_active < cutoff:
+                    session.park()
+
+    def stats(self) -> str:
+        live = sum(1 for session in self.sessions.values() if session.board is not None)
+        return "games=%d live=%d connections=%d moves=%d batches=%d" % (
+            len(self.sessions), live, self.connections, self.moves, self.batches)
+
+    async def handle_request(self, line: str, session: Optional[GameSession]) -> Tuple[str, Optional[GameSession]]:
+        # Reply to one request line, and the connection's game afterwards
+        command, _, argument = line.strip().partition(" ")
+        argument = argument.strip()
+        if command == "new":
+            try:
+                session = self.new_game(argument or None)
+            except ValueError as error:
+                return "error " + str(error), session
+            return "ok %d" % session.game_id, session
+        if command == "join":
+            joined = self.sessions.get(int(argument)) if argument.isdigit() else None
+            if joined is None:
+                return "error no game " + argument, session
+            return "ok %d" % joined.game_id, joined
+        if command == "stats":
+            return "ok " + self.stats(), session
+        if command not in ("move", "moves", "fen"):
+            return "error unknown command " + command, session
+        if session is None:
+            return "error no game, send new or join first", session
+
+        if command == "move":
+            return await self.validate_move(session, argument), session
+        if command == "moves":
+            return "ok " + " ".join(session.legal_moves()), session
+        return "ok " + board_to_fen(session.wake()), session
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        session = None
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    writer.write(b"error line too long\n")
+                    break
+                try:
+                    text = line.decode("ascii").strip()
+                except UnicodeDecodeError:
+                    writer.write(b"error requests must be ASCII\n")
+                    await writer.drain()
+                    continue
+                if text == "quit":
+                    writer.write(b"bye\n")
+                    break
+                # One bad request gets an error reply, not a dropped connection
+                try:
+                    reply, session = await self.handle_request(text, session)
+                except Exception as error:
+                    reply = "error %s: %s" % (type(error).__name__, error)
+                writer.write(reply.encode("ascii", "replace") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    def start_background(self):
+        self._tasks = [asyncio.create_task(self._validator()), asyncio.create_task(self._parker())]
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 7777, unix_path: Optional[str] = None,
+                    ready: Optional[asyncio.Event] = None):
+        self.start_background()
+        if unix_path:
+            server = await asyncio.start_unix_server(self._handle_client, unix_path, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self._handle_client, host, port, limit=MAX_LINE, backlog=4096)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Multi-game chess server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="listen on a Unix socket at this path instead of TCP")
+    parser.add_argument("--park-after", type=float, default=60.0, help="seconds before an idle game is compacted")
+    args = parser.parse_args(argv)
+    # Zero would spin the parker, a negative value would park every game
+    if args.park_after <= 0:
+        parser.error("--park-after must be positive")
+
+    print("listening on %s" % (args.unix or "%s:%d" % (args.host, args.port)))
+    try:
+        asyncio.run(GameServer(args.park_after).serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+# Endgame tablebases for king and one piece against a bare king (KQK, KRK,
+# KPK), built by retrograde analysis and probed from memory-mapped files.
+#
+# Tables are stored from the strong side's point of view as White. Pawnless
+# tables put the strong king in the a1-d1-d4 triangle (8-fold symmetry), the
+# pawn table puts the pawn on files a-d (mirror symmetry). Each position is
+# one byte:
+#   0        draw
+#   1..254   mate distance + 1 in plies; even distances are losses for the
+#            side to move (0 = already mated), odd distances are wins
+#   255      not a legal position
+#
+#   python tablebase.py generate --out tablebases --workers 3
+#   python tablebase.py probe tablebases --fen "8/8/8/4k3/8/8/8/4K2R w - - 0 1"
+import argparse
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from chess_rules import Board, Piece, PieceColor, PieceType, move_to_uci, square_coords
+from bitboard import BitboardBoard
+from fen import board_from_fen
+
+MAGIC = b"CTB1"
+DRAW = 0
+ILLEGAL = 255
+MAX_DISTANCE = 253
+
+SIGNATURE_PIECES = {"KQK": PieceType.QUEEN, "KRK": PieceType.ROOK, "KPK": PieceType.PAWN}
+# Tables a signature's positions can convert into (by promotion)
+DEPENDENCIES = {"KQK": [], "KRK": [], "KPK": ["KQK", "KRK"]}
+PROMOTION_SIGNATURES = {PieceType.QUEEN.value: "KQK", PieceType.ROOK.value: "KRK"}
+
+# Strong king squares in the a1-d1-d4 triangle -> 0..9
+TRIANGLE = [-1] * 64
+for _square in range(64):
+    if (_square & 7) <= 3 and (_square >> 3) <= (_square & 7):
+        TRIANGLE[_square] = max(TRIANGLE) + 1
+TRIANGLE_SQUARES = [square for square in range(64) if TRIANGLE[square] >= 0]
+
+# Pawn squares on files a-d, ranks 2-7 -> 0..23
+PAWN_SQUARES = [rank * 8 + file for rank in range(1, 7) for file in range(4)]
+PAWN_INDEX = [-1] * 64
+for _index, _square in enumerate(PAWN_SQUARES):
+    PAWN_INDEX[_square] = _index
+
+class TablebaseResult(Enum):
+    WIN = 1
+    DRAW = 2
+    LOSS = 3
+
+class TablebaseEntry(NamedTuple):
+    # From the side to move's point of view
+    result: TablebaseResult
+    # Plies to mate with best play, 0 for draws
+    plies: int
+
+def table_size(signature: str) -> int:
+    if SIGNATURE_PIECES[signature] == PieceType.PAWN:
+        return len(PAWN_SQUARES) * 64 * 64 * 2
+    return len(TRIANGLE_SQUARES) * 64 * 64 * 2
+
+def table_index(signature: str, strong_king: int, piece: int, weak_king: int, strong_to_move: bool) -> int:
+    # Squares are a1 = 0 with the strong side moving up the board
+    side = 0 if strong_to_move else 1
+    if SIGNATURE_PIECES[signature] == PieceType.PAWN:
+        if piece & 7 > 3:
+            strong_king ^= 7
+            piece ^= 7
+            weak_king ^= 7
+        return ((PAWN_INDEX[piece] * 64 + strong_king) * 64 + weak_king) * 2 + side
+
+    if strong_king & 7 > 3:
+        strong_king ^= 7
+        piece ^= 7
+        weak_king ^= 7
+    if strong_king >> 3 > 3:
+        strong_king ^= 56
+        piece ^= 56
+        weak_king ^= 56
+    if strong_king >> 3 > strong_king & 7:
+        # Reflect in the a1-h8 diagonal
+        strong_king = ((strong_king & 7) << 3) | (strong_king >> 3)
+        piece = ((piece & 7) << 3) | (piece >> 3)
+        weak_king = ((weak_king & 7) << 3) | (weak_king >> 3)
+    return ((TRIANGLE[strong_king] * 64 + piece) * 64 + weak_king) * 2 + side
+
+def _positions(signature: str) -> Iterator[Tuple[int, int, int, int, bool]]:
+    # (index, strong king, piece, weak king, strong to move) for every index
+    pawn = SIGNATURE_PIECES[signature] == PieceType.PAWN
+    for first in (PAWN_SQUARES if pawn else TRIANGLE_SQUARES):
+        for second in range(64):
+            for weak_king in range(64):
+                strong_king, piece = (second, first) if pawn else (first, second)
+                for strong_to_move in (True, False):
+                    index = table_index(signature, strong_king, piece, weak_king, strong_to_move)
+                    yield index, strong_king, piece, weak_king, strong_to_move
+
+def _place(color: PieceColor, piece_type: PieceType, square: int) -> Piece:
+    piece = Piece(color, piece_type)
+    x_coord, y_coord = square_coords(square)
+    piece.set_square(x_coord, y_coord)
+    # Pawns off their start rank can't double push
+    piece.moved = piece_type != PieceType.PAWN or square >> 3 != 1
+    return piece
+
+def _successor(signature: str, move: int, strong_king: int, piece: int, weak_king: int, strong_to_move: bool,
+               offsets: Dict[str, int], draw_node: int) -> int:
+    # Node of the position after move: an index in this table, in a table it
+    # promotes into (shifted by that table's offset), or the draw node
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    if from_square == strong_king:
+        strong_king = to_square
+    elif from_square == weak_king:
+        if to_square == piece:
+            # Bare kings
+            return draw_node
+        weak_king = to_square
+    else:
+        piece = to_square
+        promotion = move >> 12
+        if promotion:
+            target = PROMOTION_SIGNATURES.get(promotion)
+            if target is None:
+                # King and minor piece against king
+                return draw_node
+            return offsets[target] + table_index(target, strong_king, piece, weak_king, not strong_to_move)
+    return offsets[signature] + table_index(signature, strong_king, piece, weak_king, not strong_to_move)
+
+def generate_table(signature: str, dependencies: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    # uint8 table for the signature. Tables it promotes into must be given
+    dependencies = dependencies or {}
+    size = table_size(signature)
+    piece_type = SIGNATURE_PIECES[signature]
+
+    # Every node a move can lead to: this table, then the promotion tables,
+    # then one node standing for every drawn (bare king / minor piece) ending
+    offsets = {signature: 0}
+    node_count = size
+    for name in DEPENDENCIES[signature]:
+        offsets[name] = node_count
+        node_count += len(dependencies[name])
+    draw_node = node_count
+    node_count += 1
+
+    values = np.zeros(size, dtype=np.uint8)
+    resolved = np.zeros(size, dtype=bool)
+    sources = []
+    targets = []
+    board = BitboardBoard()
+    for index, strong_king, piece, weak_king, strong_to_move in _positions(signature):
+        if len({strong_king, piece, weak_king}) < 3:
+            values[index] = ILLEGAL
+            resolved[index] = True
+            continue
+
+        board.set_pieces([_place(PieceColor.WHITE, PieceType.KING, strong_king),
+                          _place(PieceColor.WHITE, piece_type, piece),
+                          _place(PieceColor.BLACK, PieceType.KING, weak_king)])
+        board.turn = PieceColor.WHITE if strong_to_move else PieceColor.BLACK
+        board.hash = board.compute_hash()
+        # The side that just moved can't be in check
+        if board.in_check(PieceColor.BLACK if strong_to_move else PieceColor.WHITE):
+            values[index] = ILLEGAL
+            resolved[index] = True
+            continue
+
+        moves = board.legal_moves()
+        if not moves:
+            values[index] = 1 if board.in_check() else DRAW
+            resolved[index] = True
+            continue
+        for move in moves:
+            sources.append(index)
+            targets.append(_successor(signature, move, strong_king, piece, weak_king, strong_to_move,
+                                      offsets, draw_node))
+
+    sources = np.array(sources, dtype=np.int64)
+    targets = np.array(targets, dtype=np.int64)
+    degree = np.bincount(sources, minlength=size)
+
+    nodes = np.zeros(node_count, dtype=np.uint8)
+    nodes_resolved = np.ones(node_count, dtype=bool)
+    for name in DEPENDENCIES[signature]:
+        nodes[offsets[name]:offsets[name] + len(dependencies[name])] = dependencies[name]
+    external_plies = max([int(np.max(np.where(table == ILLEGAL, 0, table))) for table in dependencies.values()] + [0])
+
+    # Retrograde passes: after pass n every position that is mate in n plies
+    # or less is known. A position wins in n if a move reaches a loss in n - 1,
+    # and loses in n once every move reaches a win and the longest is n - 1
+    for distance in range(1, MAX_DISTANCE + 1):
+        nodes[:size] = values
+        nodes_resolved[:size] = resolved
+        child = nodes[targets]
+        known = nodes_resolved[targets] & (child != DRAW) & (child != ILLEGAL)
+        child_plies = child.astype(np.int32) - 1
+        losing = known & (child_plies % 2 == 0)
+        winning = known & (child_plies % 2 == 1)
+
+        wins = np.bincount(sources, weights=losing & (child_plies == distance - 1), minlength=size) > 0
+        all_winning = np.bincount(sources, weights=winning & (child_plies <= distance - 1), minlength=size) == degree
+        new_wins = wins & ~resolved
+        new_losses = all_winning & (degree > 0) & ~resolved & ~new_wins
+        changed = new_wins | new_losses
+        values[changed] = distance + 1
+        resolved |= changed
+        if not changed.any() and distance > external_plies + 1:
+            break
+
+    # Whatever is still open can't be forced either way
+    return values
+
+def table_path(directory: str, signature: str) -> str:
+    return os.path.join(directory, signature + ".tb")
+
+def write_table(path: str, values: np.ndarray):
+    # Write then rename, so a reader never maps a half written table
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(MAGIC)
+        file.write(values.tobytes())
+    os.replace(temporary, path)
+
+def read_table(path: str) -> np.ndarray:
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a tablebase file")
+        return np.frombuffer(file.read(), dtype=np.uint8)
+
+def _generate_file(signature: str, directory: str) -> Tuple[str, float]:
+    start = time.perf_counter()
+    dependencies = {name: read_table(table_path(directory, name)) for name in DEPENDENCIES[signature]}
+    write_table(table_path(directory, signature), generate_table(signature, dependencies))
+    return signature, time.perf_counter() - start
+
+def generate_all(directory: str, signatures: Optional[List[str]] = None, workers: int = os.cpu_count() or 1):
+    # Generate in waves: every signature whose dependencies are on disk is
+    # built in parallel, one process each
+    os.makedirs(directory, exist_ok=True)
+    pending = list(signatures or SIGNATURE_PIECES)
+    for signature in list(pending):
+        for dependency in DEPENDENCIES[signature]:
+            if dependency not in pending and not os.path.exists(table_path(directory, dependency)):
+                pending.append(dependency)
+
+    done = set()
+    with ProcessPoolExecutor(workers) as pool:
+        while pending:
+            ready = [signature for signature in pending
+                     if all(dependency in done or (dependency not in pending and
+                                                   os.path.exists(table_path(directory, dependency)))
+                            for dependency in DEPENDENCIES[signature])]
+            for signature, seconds in pool.map(_generate_file, ready, [directory] * len(ready)):
+                print("%s generated in %.1fs" % (signature, seconds))
+                done.add(signature)
+                pending.remove(signature)
+
+def _material(board: Board) -> Optional[Tuple[str, PieceColor, int, int, int]]:
+    # (signature, strong color, strong king, piece, weak king) for positions
+    # the tables cover, squares flipped so the strong side moves up
+    pieces = board.pieces()
+    if len(pieces) != 3:
+        return None
+    others = [piece for piece in pieces if piece.type != PieceType.KING]
+    if len(others) != 1:
+        return None
+    piece = others[0]
+    signature = next((name for name, piece_type in SIGNATURE_PIECES.items() if piece_type == piece.type), None)
+    if signature is None:
+        return None
+
+    strong = piece.color
+    flip = 0 if strong == PieceColor.WHITE else 56
+    squares = {}
+    for each in pieces:
+        square = ((7 - each.y_coord) * 8 + each.x_coord) ^ flip
+        if each.type == PieceType.KING:
+            squares["strong_king" if each.color == strong else "weak_king"] = square
+        else:
+            squares["piece"] = square
+    return signature, strong, squares["strong_king"], squares["piece"], squares["weak_king"]
+
+class Tablebase:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._maps = {}
+
+    def _table(self, signature: str):
+        table = self._maps.get(signature)
+        if table is None:
+            path = table_path(self.directory, signature)
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as file:
+                table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if table[:len(MAGIC)] != MAGIC:
+                raise ValueError(path + " is not a tablebase file")
+            self._maps[signature] = table
+        return table
+
+    def probe(self, board: Board) -> Optional[TablebaseEntry]:
+        # Result for the side to move, None when no table covers the position
+        pieces = board.pieces()
+        if len(pieces) == 2 or (len(pieces) == 3 and
+                                any(piece.type in (PieceType.KNIGHT, PieceType.BISHOP) for piece in pieces)):
+            return TablebaseEntry(TablebaseResult.DRAW, 0)
+        material = _material(board)
+        if material is None:
+            return None
+        signature, strong, strong_king, piece, weak_king = material
+        table = self._table(signature)
+        if table is None:
+            return None
+
+        value = table[len(MAGIC) + table_index(signature, strong_king, piece, weak_king, board.turn == strong)]
+        if value == ILLEGAL:
+            return None
+        if value == DRAW:
+            return TablebaseEntry(TablebaseResult.DRAW, 0)
+        plies = value - 1
+        return TablebaseEntry(TablebaseResult.WIN if plies % 2 else TablebaseResult.LOSS, plies)
+
+    def best_move(self, board: Board) -> int:
+        # The fastest mate when winning, the longest defence when losing and
+        # any drawing move otherwise; 0 if the position isn't covered
+        entry = self.probe(board)
+        if entry is None:
+            return 0
+        best_move = 0
+        best_key = None
+        for move in board.legal_moves():
+            board.make_move(move)
+            child = self.probe(board)
+            board.unmake_move()
+            if child is None:
+                continue
+            if child.result == TablebaseResult.LOSS:
+                key = (2, -child.plies)
+            elif child.result == TablebaseResult.DRAW:
+                key = (1, 0)
+            else:
+                key = (0, child.plies)
+            if best_key is None or key > best_key:
+                best_move = move
+                best_key = key
+        return best_move
+
+    def close(self):
+        for table in self._maps.values():
+            table.close()
+        self._maps = {}
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate or probe endgame tablebases")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate")
+    generate.add_argument("--out", default="tablebases")
+    generate.add_argument("--signatures", default=",".join(SIGNATURE_PIECES))
+    generate.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    probe = commands.add_parser("probe")
+    probe.add_argument("directory")
+    probe.add_argument("--fen", required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        start = time.perf_counter()
+        generate_all(args.out, args.signatures.split(","), args.workers)
+        print("done in %.1fs" % (time.perf_counter() - start))
+        return 0
+
+    tablebase = Tablebase(args.directory)
+    board = board_from_fen(args.fen, BitboardBoard)
+    entry = tablebase.probe(board)
+    if entry is None:
+        print("not in the tablebases")
+        return 1
+    move = tablebase.best_move(board)
+    print("%s in %d plies, best move %s" % (entry.result.name.lower(), entry.plies, move_to_uci(move) if move else "-"))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# Game archive: seeking from a keyframe must reach the same position as
+# replaying the game from its start.
+import random
+import pytest
+from archive import MAX_KEYFRAME_INTERVAL, ArchiveWriter, GameArchive, encode_game
+from bitboard import BitboardBoard
+from chess_rules import new_game_board
+from compact_state import CompactState
+from fen import board_from_fen, board_to_fen
+from perft import PERFT_POSITIONS
+
+def random_moves(rng: random.Random, board, plies: int):
+    moves = []
+    for _ in range(plies):
+        legal = board.legal_moves()
+        if not legal:
+            break
+        moves.append(rng.choice(legal))
+        board.make_move(moves[-1])
+    for _ in moves:
+        board.unmake_move()
+    return moves
+
+@pytest.mark.parametrize("interval", [1, 5, 16, 1000])
+def test_state_at_matches_replay(tmp_path, interval):
+    rng = random.Random(interval)
+    path = str(tmp_path / "games.cga")
+    games = []
+    with ArchiveWriter(path, interval) as writer:
+        for index in range(8):
+            fen = PERFT_POSITIONS[index % len(PERFT_POSITIONS)][1]
+            board = board_from_fen(fen, BitboardBoard)
+            moves = random_moves(rng, board, rng.randrange(0, 120))
+            writer.write_game(CompactState.from_board(board), moves, "1-0")
+            games.append((fen, moves))
+
+    with GameArchive(path) as archive:
+        assert len(archive) == len(games)
+        for game, (fen, moves) in zip(archive, games):
+            assert game.plies == len(moves)
+            assert game.keyframe_interval == interval
+            assert game.result == "1-0"
+            assert game.moves() == moves
+            board = board_from_fen(fen, BitboardBoard)
+            for ply in range(len(moves) + 1):
+                state = game.state_at(ply)
+                assert state.data == CompactState.from_board(board).data
+                assert board_to_fen(game.board_at(ply)) == board_to_fen(board)
+                if ply < len(moves):
+                    assert game.move(ply) == moves[ply]
+                    board.make_move(moves[ply])
+            with pytest.raises(IndexError):
+                game.state_at(len(moves) + 1)
+
+def test_writer_appends_and_skips_a_torn_game(tmp_path):
+    path = str(tmp_path / "games.cga")
+    rng = random.Random(1)
+    board = new_game_board(BitboardBoard)
+    for _ in range(3):
+        with ArchiveWriter(path) as writer:
+            for move in random_moves(rng, board, 30):
+                board.make_move(move)
+            writer.write_board(board, "*")
+            board = new_game_board(BitboardBoard)
+    with GameArchive(path) as archive:
+        assert len(archive) == 3
+    # A game cut off part way through its record is left out
+    with open(path, "r+b") as file:
+        file.truncate(file.seek(0, 2) - 1)
+    with GameArchive(path) as archive:
+        assert len(archive) == 2
+
+@pytest.mark.parametrize("interval", [0, -1, MAX_KEYFRAME_INTERVAL + 1])
+def test_bad_keyframe_interval_is_rejected(tmp_path, interval):
+    path = tmp_path / "games.cga"
+    with pytest.raises(ValueError):
+        ArchiveWriter(str(path), interval)
+    assert not path.exists()
+    with pytest.raises(ValueError):
+        encode_game(CompactState.from_board(new_game_board(BitboardBoard)), [], "*", interval)
+
+def test_non_archive_is_rejected(tmp_path):
+    path = tmp_path / "games.cga"
+    path.write_bytes(b"not an archive")
+    with pytest.raises(ValueError):
+        GameArchive(str(path))
+    with pytest.raises(ValueError):
+        ArchiveWriter(str(path))
@@ -0,0 +1,55 @@
+# Batched arrays against the boards they came from: planes, scores and
+# attack counts must agree with the per-board answers.
+import numpy as np
+from batch_eval import (attack_counts, board_bitboards, encode_boards, evaluate_batch, evaluate_material,
+                        planes_to_bitboards, planes_to_squares, random_boards)
+from chess_rules import Board, PieceColor, square_index
+from fen import board_from_fen, board_to_fen
+from piece_square import MIDGAME_MATERIAL
+
+BOARDS = random_boards(60, seed=4)
+
+def test_evaluate_batch_matches_midgame_score():
+    planes, side_to_move = encode_boards(BOARDS)
+    scores = evaluate_batch(planes)
+    assert scores.tolist() == [board.midgame_score for board in BOARDS]
+    relative = evaluate_batch(planes, side_to_move)
+    assert relative.tolist() == [score if board.turn == PieceColor.WHITE else -score
+                                 for score, board in zip(scores.tolist(), BOARDS)]
+
+def test_material_and_squares_match_the_pieces():
+    planes, _ = encode_boards(BOARDS)
+    squares = planes_to_squares(planes)
+    material = evaluate_material(planes)
+    for index, board in enumerate(BOARDS):
+        expected = [0] * 64
+        balance = 0
+        for piece in board.pieces():
+            sign = 1 if piece.color == PieceColor.WHITE else -1
+            expected[square_index(piece.x_coord, piece.y_coord)] = sign * piece.type.value
+            balance += sign * MIDGAME_MATERIAL[piece.type.value]
+        assert squares[index].tolist() == expected
+        assert material[index] == balance
+
+def test_list_board_encodes_like_bitboard_board():
+    # board_bitboards has a path for each backend
+    boards = [board_from_fen(board_to_fen(board), Board) for board in BOARDS[:10]]
+    assert [board_bitboards(board) for board in boards] == [board_bitboards(board) for board in BOARDS[:10]]
+
+def test_planes_round_trip_through_bitboards():
+    planes, _ = encode_boards(BOARDS)
+    bitboards = planes_to_bitboards(planes)
+    assert bitboards.dtype == np.uint64
+    assert bitboards.tolist() == [board_bitboards(board) for board in BOARDS]
+
+def test_attack_counts_match_the_board():
+    planes, _ = encode_boards(BOARDS)
+    counts = attack_counts(planes).reshape(len(BOARDS), 2, 64)
+    for index, board in enumerate(BOARDS):
+        occupied = board.occupancy[0] | board.occupancy[1]
+        for square in range(64):
+            # _attackers_of gives the pieces of the side opposite to its us
+            white = board._attackers_of(square, 1, occupied)
+            black = board._attackers_of(square, 0, occupied)
+            assert counts[index, 0, square] == bin(white).count("1")
+            assert counts[index, 1, square] == bin(black).count("1")
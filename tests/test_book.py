@@ -0,0 +1,75 @@
+# Opening book: built from a small PGN, probes return the played moves
+# weighted by result, and unfinished games are left out.
+import random
+import pytest
+from book import RECORD, OpeningBook, build_book
+from bitboard import BitboardBoard
+from chess_rules import move_to_uci, new_game_board
+from fen import board_from_fen
+from pgn import san_to_move
+
+PGN = """[Event "a"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 Nc6 1-0
+
+[Event "b"]
+[Result "0-1"]
+
+1. e4 c5 2. Nf3 0-1
+
+[Event "c"]
+[Result "1/2-1/2"]
+
+1. d4 d5 1/2-1/2
+
+[Event "d"]
+[Result "*"]
+
+1. c4 e5 *
+
+[Event "e"]
+[Result "1-0"]
+
+1. e4 e5 2. Bc4 1-0
+"""
+
+@pytest.fixture
+def book(tmp_path):
+    pgn_path = tmp_path / "games.pgn"
+    pgn_path.write_text(PGN)
+    book_path = str(tmp_path / "book.bin")
+    build_book([str(pgn_path)], book_path)
+    with OpeningBook(book_path) as book:
+        yield book
+
+def probe_uci(book: OpeningBook, sans):
+    board = new_game_board(BitboardBoard)
+    for san in sans:
+        board.make_move(san_to_move(board, san))
+    return [(move_to_uci(move), weight) for move, weight in book.probe(board.hash)]
+
+def test_probe_weights_moves_by_result(book):
+    # Two points a win, one a draw, for the side that played the move. Moves
+    # only ever played by the loser score nothing and fall under min_weight
+    assert probe_uci(book, []) == [("e2e4", 4), ("d2d4", 1)]
+    assert probe_uci(book, ["e4"]) == [("c7c5", 2)]
+    assert sorted(probe_uci(book, ["e4", "e5"])) == [("f1c4", 2), ("g1f3", 2)]
+    assert probe_uci(book, ["d4"]) == [("d7d5", 1)]
+
+def test_unfinished_games_are_left_out(book):
+    assert probe_uci(book, ["c4"]) == []
+    assert ("c2c4", 1) not in probe_uci(book, [])
+
+def test_choose_picks_a_legal_book_move(book):
+    rng = random.Random(1)
+    board = new_game_board(BitboardBoard)
+    picks = {move_to_uci(book.choose(board, rng)) for _ in range(200)}
+    assert picks == {"e2e4", "d2d4"}
+    # Out of book
+    assert book.choose(board_from_fen("4k3/8/8/8/8/8/8/4K3 w - - 0 1", BitboardBoard), rng) == 0
+
+def test_records_are_sorted(book):
+    keys = [RECORD.unpack_from(book._map, index * RECORD.size)[0] for index in range(book.entries)]
+    assert keys == sorted(keys)
+    assert book.entries == 6
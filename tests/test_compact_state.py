@@ -0,0 +1,48 @@
+# CompactState against Board: playing moves on the packed state must land on
+# the same positions as playing them on a board.
+import random
+import pytest
+from bitboard import BitboardBoard
+from chess_rules import Board, new_game_board
+from compact_state import STATE_SIZE, CompactState
+from fen import board_from_fen, board_to_fen
+from perft import PERFT_POSITIONS
+
+@pytest.mark.parametrize("seed", range(5))
+def test_state_follows_board_over_random_games(seed):
+    rng = random.Random(seed)
+    for _ in range(10):
+        board = new_game_board(BitboardBoard)
+        state = CompactState.from_board(board)
+        for _ in range(200):
+            assert state.data == CompactState.from_board(board).data
+            assert state.zobrist() == board.hash
+            assert state.turn == board.turn
+            assert state.fullmove_number == board.fullmove_number
+            assert board_to_fen(state.to_board()) == board_to_fen(board)
+            legal = board.legal_moves()
+            if not legal:
+                break
+            move = rng.choice(legal)
+            board.make_move(move)
+            state.make_move(move)
+
+@pytest.mark.parametrize("board_cls", [Board, BitboardBoard])
+@pytest.mark.parametrize("fen", [fen for _, fen, _ in PERFT_POSITIONS])
+def test_to_board_keeps_the_legal_moves(board_cls, fen):
+    # Castling, en passant and promotion positions rebuild with the same moves
+    board = board_from_fen(fen, board_cls)
+    rebuilt = CompactState.from_board(board).to_board(board_cls)
+    assert board_to_fen(rebuilt) == fen
+    assert rebuilt.hash == board.hash
+    assert sorted(rebuilt.legal_moves()) == sorted(board.legal_moves())
+
+def test_copy_is_independent():
+    state = CompactState.from_board(new_game_board(BitboardBoard))
+    copy = state.copy()
+    copy.make_move(new_game_board(BitboardBoard).legal_moves()[0])
+    assert copy.data != state.data
+
+def test_wrong_size_is_rejected():
+    with pytest.raises(ValueError):
+        CompactState(bytes(STATE_SIZE - 1))
@@ -0,0 +1,125 @@
+# Training data export: the arrays read back through open_dataset must hold
+# each position once, in game order, split into chunks of the asked size.
+import os
+import random
+import numpy as np
+import pytest
+from archive import ArchiveWriter
+from batch_eval import encode_boards
+from bitboard import BitboardBoard
+from chess_rules import new_game_board
+from compact_state import CompactState
+from dataset import DedupeTable, GameSource, encode_games, export, open_dataset
+from fen import STARTING_FEN
+from pgn import PgnWriter
+from selfplay import GAMES_FILE, RUN_FILE, read_games, run
+
+def random_game(rng: random.Random, plies: int):
+    board = new_game_board(BitboardBoard)
+    boards = []
+    moves = []
+    for _ in range(plies):
+        legal = board.legal_moves()
+        if not legal:
+            break
+        boards.append(board.copy())
+        moves.append(rng.choice(legal))
+        board.make_move(moves[-1])
+    return boards, moves
+
+def write_pgn(path: str, games):
+    with open(path, "w") as file:
+        writer = PgnWriter(file)
+        for moves, result in games:
+            writer.write(moves, result=result)
+
+def concatenated(chunks, field: str) -> np.ndarray:
+    return np.concatenate([chunk[field] for chunk in chunks])
+
+def test_export_round_trip(tmp_path):
+    rng = random.Random(1)
+    first_boards, first_moves = random_game(rng, 30)
+    second_boards, second_moves = random_game(rng, 25)
+    pgn_path = str(tmp_path / "games.pgn")
+    # The first game twice, the second as a loss for White, and an unfinished game
+    write_pgn(pgn_path, [(first_moves, "1-0"), (first_moves, "1-0"), (second_moves, "0-1"),
+                         (random_game(rng, 10)[1], "*")])
+
+    out_dir = str(tmp_path / "data")
+    summary = export([pgn_path], out_dir, workers=1, games_per_job=1, chunk_rows=7)
+    # The start position is shared by both games, so the second keeps one row fewer
+    positions = len(first_moves) + len(second_moves) - 1
+    assert summary["games"] == 4
+    assert summary["skipped_games"] == 1
+    assert summary["positions"] == positions
+    assert summary["duplicates"] == len(first_moves) + 1
+    assert summary["chunks"] == [7] * (positions // 7) + ([positions % 7] if positions % 7 else [])
+
+    chunks = open_dataset(out_dir)
+    assert [len(chunk["move"]) for chunk in chunks] == summary["chunks"]
+    for chunk in chunks:
+        assert isinstance(chunk["planes"], np.memmap)
+        assert chunk["planes"].shape[1:] == (12, 8, 8)
+    boards = first_boards + second_boards[1:]
+    planes, side_to_move = encode_boards(boards)
+    assert np.array_equal(concatenated(chunks, "planes"), planes)
+    assert np.array_equal(concatenated(chunks, "side_to_move"), side_to_move)
+    assert concatenated(chunks, "move").tolist() == first_moves + second_moves[1:]
+    assert concatenated(chunks, "result").tolist() == [1] * len(first_moves) + [-1] * (len(second_moves) - 1)
+
+def test_export_without_dedupe_keeps_repeats(tmp_path):
+    rng = random.Random(2)
+    moves = random_game(rng, 20)[1]
+    pgn_path = str(tmp_path / "games.pgn")
+    write_pgn(pgn_path, [(moves, "1/2-1/2")] * 3)
+    summary = export([pgn_path], str(tmp_path / "data"), workers=1, chunk_rows=1000, dedupe=False)
+    assert summary["positions"] == 3 * len(moves)
+    assert summary["duplicates"] == 0
+    assert summary["chunks"] == [3 * len(moves)]
+
+def test_archive_and_selfplay_sources(tmp_path):
+    rng = random.Random(3)
+    _, moves = random_game(rng, 40)
+    archive_path = str(tmp_path / "games.cga")
+    with ArchiveWriter(archive_path, 8) as writer:
+        writer.write_game(CompactState.from_board(new_game_board(BitboardBoard)), moves, "1-0")
+    run_dir = str(tmp_path / "selfplay")
+    run(run_dir, 2, workers=1, seed=1, nodes=40, random_plies=6, max_plies=16)
+    selfplay_plies = sum(len(record.moves) for record in read_games(os.path.join(run_dir, GAMES_FILE)))
+
+    summary = export([archive_path, os.path.join(run_dir, GAMES_FILE)], str(tmp_path / "data"), workers=1)
+    assert summary["games"] == 3
+    assert summary["skipped_games"] == 0
+    # Every game starts from the initial setup, kept once
+    assert summary["positions"] + summary["duplicates"] == len(moves) + selfplay_plies
+    assert summary["duplicates"] >= 2
+
+    # Without run.json the self-play openings can't be resolved
+    opening_dir = str(tmp_path / "openings")
+    run(opening_dir, 1, workers=1, seed=1, nodes=40, random_plies=6, max_plies=16, openings=[STARTING_FEN])
+    os.remove(os.path.join(opening_dir, RUN_FILE))
+    with pytest.raises(ValueError):
+        export([os.path.join(opening_dir, GAMES_FILE)], str(tmp_path / "other"), workers=1)
+
+def test_damaged_games_are_skipped():
+    rng = random.Random(4)
+    _, moves = random_game(rng, 12)
+    empty_square_move = 28 | 36 << 6
+    games = [GameSource(STARTING_FEN, moves, "1-0"),
+             # A start state and a move no intact file could hold
+             GameSource(b"\xff" * 69, moves, "1-0"),
+             GameSource(STARTING_FEN, moves[:4] + [empty_square_move] + moves[4:], "0-1")]
+    encoded = encode_games(games)
+    assert encoded.skipped_games == 2
+    assert encoded.move.tolist() == moves
+    assert encoded.result.tolist() == [1] * len(moves)
+
+def test_dedupe_table():
+    table = DedupeTable(4)
+    # 1, 5 and 9 share a slot: repeats in one batch are caught, later ones
+    # only while the hash still holds its slot
+    assert table.first_seen(np.array([1, 5, 1, 0, 0], dtype=np.uint64)).tolist() == [True, True, False, True, False]
+    assert table.first_seen(np.array([5, 0, 9], dtype=np.uint64)).tolist() == [False, False, True]
+    assert table.first_seen(np.array([5], dtype=np.uint64)).tolist() == [True]
+    with pytest.raises(ValueError):
+        DedupeTable(6)
@@ -0,0 +1,66 @@
+# Incremental evaluation: the running piece-square totals every board keeps
+# must equal a from-scratch count after any make or unmake.
+import random
+import pytest
+from bitboard import BitboardBoard
+from chess_rules import Board, PieceColor, new_game_board
+from compact_state import CompactState
+from evaluation import EvaluationScores, check_scores, compute_scores, evaluate
+from fen import board_from_fen
+from perft import PERFT_POSITIONS
+from piece_square import TOTAL_PHASE
+
+@pytest.mark.parametrize("board_cls", [Board, BitboardBoard])
+def test_totals_follow_random_games(board_cls):
+    rng = random.Random(11)
+    for _ in range(6):
+        board = new_game_board(board_cls)
+        for _ in range(150):
+            legal = board.legal_moves()
+            if not legal:
+                break
+            board.make_move(rng.choice(legal))
+            check_scores(board)
+        while board.history:
+            board.unmake_move()
+            check_scores(board)
+
+@pytest.mark.parametrize("board_cls", [Board, BitboardBoard])
+@pytest.mark.parametrize("fen", [fen for _, fen, _ in PERFT_POSITIONS])
+def test_totals_through_special_moves(board_cls, fen):
+    # Castling, en passant and every promotion, two plies deep
+    board = board_from_fen(fen, board_cls)
+    check_scores(board)
+    for move in board.legal_moves():
+        board.make_move(move)
+        check_scores(board)
+        for reply in board.legal_moves():
+            board.make_move(reply)
+            check_scores(board)
+            board.unmake_move()
+        board.unmake_move()
+        check_scores(board)
+
+def test_rebuilt_boards_start_with_the_right_totals():
+    board = board_from_fen(PERFT_POSITIONS[1][1], BitboardBoard)
+    expected = compute_scores(board)
+    for copy in (board.copy(), board.copy(Board), CompactState.from_board(board).to_board()):
+        assert EvaluationScores(copy.midgame_score, copy.endgame_score, copy.phase) == expected
+
+def test_evaluate_tapers_by_phase():
+    board = new_game_board(BitboardBoard)
+    assert board.phase == TOTAL_PHASE
+    assert evaluate(board) == 0
+    # Only kings and pawns left: the endgame values alone
+    board = board_from_fen("4k3/pppp4/8/8/8/8/PPPPPPPP/4K3 w - - 0 1", BitboardBoard)
+    assert board.phase == 0
+    assert evaluate(board) == board.endgame_score > 0
+    board = board_from_fen("4k3/pppp4/8/8/8/8/PPPPPPPP/4K3 b - - 0 1", BitboardBoard)
+    assert board.turn == PieceColor.BLACK
+    assert evaluate(board) == -board.endgame_score
+
+def test_check_scores_notices_drift():
+    board = new_game_board(BitboardBoard)
+    board.midgame_score += 1
+    with pytest.raises(AssertionError):
+        check_scores(board)
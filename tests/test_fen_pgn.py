@@ -0,0 +1,102 @@
+# FEN and PGN text: what is written reads back to the same positions and moves.
+import io
+import random
+import pytest
+from bitboard import BitboardBoard
+from chess_rules import Board, new_game_board
+from fen import STARTING_FEN, board_from_fen, board_to_fen
+from perft import PERFT_POSITIONS
+from pgn import PgnWriter, format_game, iter_moves, read_games, start_board
+
+def random_game(rng: random.Random, plies: int, board_cls = BitboardBoard) -> Board:
+    board = new_game_board(board_cls)
+    for _ in range(plies):
+        legal = board.legal_moves()
+        if not legal:
+            break
+        board.make_move(rng.choice(legal))
+    return board
+
+@pytest.mark.parametrize("board_cls", [Board, BitboardBoard])
+@pytest.mark.parametrize("fen", [STARTING_FEN] + [fen for _, fen, _ in PERFT_POSITIONS])
+def test_fen_round_trip(board_cls, fen):
+    assert board_to_fen(board_from_fen(fen, board_cls)) == fen
+
+def test_fen_round_trip_over_random_games():
+    rng = random.Random(3)
+    for _ in range(20):
+        board = new_game_board(BitboardBoard)
+        for _ in range(100):
+            fen = board_to_fen(board)
+            copy = board_from_fen(fen, BitboardBoard)
+            assert board_to_fen(copy) == fen
+            assert copy.hash == board.hash
+            assert sorted(copy.legal_moves()) == sorted(board.legal_moves())
+            legal = board.legal_moves()
+            if not legal:
+                break
+            board.make_move(rng.choice(legal))
+
+@pytest.mark.parametrize("fen", [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/9/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR x KQkq - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkx - 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e9 0 1",
+    # En passant squares have to be on the rank the other side's pawns skip
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq e3 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR b KQkq e6 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq a1 0 1",
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - x 1",
+])
+def test_bad_fen_is_rejected(fen):
+    with pytest.raises(ValueError):
+        board_from_fen(fen, BitboardBoard)
+
+def test_pgn_round_trip():
+    rng = random.Random(5)
+    boards = [random_game(rng, rng.randrange(1, 150)) for _ in range(20)]
+    # One game from a set-up position, with Black to move first
+    board = board_from_fen(PERFT_POSITIONS[1][1], BitboardBoard)
+    board.make_move(board.legal_moves()[0])
+    start = board_to_fen(board)
+    for _ in range(30):
+        legal = board.legal_moves()
+        if not legal:
+            break
+        board.make_move(rng.choice(legal))
+    boards.append(board)
+
+    text = io.StringIO()
+    writer = PgnWriter(text)
+    played = []
+    for index, board in enumerate(boards):
+        moves = [record[0] for record in board.history]
+        if board is boards[-1]:
+            moves = moves[1:]
+        for _ in moves:
+            board.unmake_move()
+        writer.write(moves, {"Event": "test %d" % index, "White": 'a "quoted" name'}, "1/2-1/2", board)
+        played.append((moves, board_to_fen(board)))
+
+    games = list(read_games(io.StringIO(text.getvalue())))
+    assert len(games) == len(boards)
+    for game, (moves, fen) in zip(games, played):
+        assert game.result == "1/2-1/2"
+        assert game.tags["White"] == 'a "quoted" name'
+        board = start_board(game)
+        assert board_to_fen(board) == fen
+        assert list(iter_moves(game, board)) == moves
+    assert played[-1][1] == start
+    assert games[-1].tags["FEN"] == start
+
+def test_pgn_writer_copies_games_unchanged():
+    rng = random.Random(9)
+    text = "".join(format_game([record[0] for record in board.history], result="1-0")
+                   for board in (random_game(rng, 60), random_game(rng, 80)))
+    copied = io.StringIO()
+    writer = PgnWriter(copied)
+    for game in read_games(io.StringIO(text)):
+        writer.write_game(game)
+    assert copied.getvalue() == text
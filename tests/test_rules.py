@@ -0,0 +1,49 @@
+# Rules: the list and bitboard backends against known perft counts and
+# against each other over random games.
+import random
+import pytest
+from bitboard import BitboardBoard
+from chess_rules import Board, new_game_board
+from fen import board_from_fen, board_to_fen
+from perft import PERFT_POSITIONS, divide, perft
+
+# Published node counts at depth 2, so the suite stays quick on both backends
+PERFT_DEPTH_2 = {
+    "start": 400,
+    "kiwipete": 2039,
+    "en-passant": 191,
+    "promotion": 264,
+    "promotion-castling": 1486,
+}
+
+@pytest.mark.parametrize("board_cls", [Board, BitboardBoard])
+@pytest.mark.parametrize("name,fen", [(name, fen) for name, fen, _ in PERFT_POSITIONS if name in PERFT_DEPTH_2])
+def test_perft_counts(board_cls, name, fen):
+    assert perft(board_from_fen(fen, board_cls), 2) == PERFT_DEPTH_2[name]
+
+@pytest.mark.parametrize("name,fen", [(name, fen) for name, fen, _ in PERFT_POSITIONS])
+def test_backends_divide_alike(name, fen):
+    assert divide(board_from_fen(fen, Board), 2) == divide(board_from_fen(fen, BitboardBoard), 2)
+
+def test_backends_agree_over_random_games():
+    rng = random.Random(7)
+    for _ in range(10):
+        boards = [new_game_board(Board), new_game_board(BitboardBoard)]
+        fens = []
+        for _ in range(120):
+            legal = [sorted(board.legal_moves()) for board in boards]
+            assert legal[0] == legal[1]
+            assert boards[0].hash == boards[1].hash == boards[1].compute_hash()
+            assert board_to_fen(boards[0]) == board_to_fen(boards[1])
+            if not legal[0]:
+                break
+            fens.append(board_to_fen(boards[1]))
+            move = rng.choice(legal[0])
+            for board in boards:
+                board.make_move(move)
+        # Unmaking walks back through the same positions
+        while fens:
+            expected = fens.pop()
+            for board in boards:
+                board.unmake_move()
+                assert board_to_fen(board) == expected
@@ -0,0 +1,63 @@
+# Search: forced mates are found at their exact distance, and repetitions of
+# the game the board was copied from count as draws.
+import pytest
+from bitboard import BitboardBoard
+from chess_rules import Board, GameState, move_to_uci, new_game_board
+from fen import board_from_fen, board_to_fen
+from search import MATE_SCORE, Searcher
+from pgn import san_to_move
+
+@pytest.mark.parametrize("board_cls", [Board, BitboardBoard])
+@pytest.mark.parametrize("fen,plies", [
+    # Mate in 2 and mate in 3 with king and rook, distances from the tablebase
+    ("6k1/8/5K2/3R4/8/8/8/8 w - - 0 1", 3),
+    ("8/k7/8/1K4R1/8/8/8/8 w - - 0 1", 5),
+    # Back rank mate in 1 for Black
+    ("r6k/8/8/8/8/8/5PPP/6K1 b - - 0 1", 1),
+])
+def test_finds_forced_mate(board_cls, fen, plies):
+    board = board_from_fen(fen, board_cls)
+    result = Searcher().search(board, max_depth=8)
+    assert result.score == MATE_SCORE - plies
+    assert len(result.pv) == plies
+    if plies == 1:
+        assert move_to_uci(result.move) == "a8a1"
+    # The search leaves the board as it found it
+    assert board_to_fen(board) == fen
+    for move in result.pv:
+        board.make_move(move)
+    assert board.game_state() == GameState.CHECKMATE
+
+def test_no_legal_moves():
+    board = board_from_fen("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", BitboardBoard)
+    result = Searcher().search(board, max_depth=3)
+    assert result.move == 0
+    assert result.score == 0
+
+def test_repetition_before_the_copy_is_seen():
+    # Knights shuffle out and back twice: the start position comes round again
+    board = new_game_board(BitboardBoard)
+    for san in ["Nf3", "Nf6", "Ng1", "Ng8", "Nf3", "Nf6", "Ng1"]:
+        board.make_move(san_to_move(board, san))
+    copy = board.copy()
+    assert copy.history == []
+    back = san_to_move(copy, "Ng8")
+
+    full = Searcher()
+    cut = Searcher()
+    cut._game_hashes = [record[8] for record in board.history]
+    board.make_move(back)
+    copy.make_move(back)
+    assert full._is_repetition(board)
+    assert cut._is_repetition(copy)
+    # Without the game's hashes the copy can't know
+    assert not Searcher()._is_repetition(copy)
+
+def test_search_accepts_game_hashes():
+    board = new_game_board(BitboardBoard)
+    for san in ["e4", "e5", "Nf3", "Nc6"]:
+        board.make_move(san_to_move(board, san))
+    copy = board.copy()
+    result = Searcher().search(copy, max_depth=3, game_hashes=[record[8] for record in board.history])
+    assert result.move in copy.legal_moves()
+    assert result.depth == 3
@@ -0,0 +1,74 @@
+# Self-play runs: records read back as legal games, resuming plays only the
+# missing games, and a game replays the same whichever run plays it.
+import json
+import os
+import pytest
+from bitboard import BitboardBoard
+from chess_rules import GameState, new_game_board
+from fen import board_from_fen
+from selfplay import GAMES_FILE, INITIAL_SETUP, RUN_FILE, GameResult, Termination, read_games, run
+
+SETTINGS = dict(workers=1, seed=5, nodes=60, random_plies=4, max_plies=24)
+OPENING = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+
+def records_by_index(out_dir: str) -> dict:
+    return {record.index: record for record in read_games(os.path.join(out_dir, GAMES_FILE))}
+
+def test_games_read_back_as_legal_games(tmp_path):
+    out_dir = str(tmp_path / "run")
+    summary = run(out_dir, 3, openings=[OPENING], **SETTINGS)
+    assert summary["games"] == 3
+    records = records_by_index(out_dir)
+    assert sorted(records) == [0, 1, 2]
+    for record in records.values():
+        assert record.opening == 0
+        board = board_from_fen(OPENING, BitboardBoard)
+        for move in record.moves:
+            assert move in board.legal_moves()
+            board.make_move(move)
+        if record.termination == Termination.CHECKMATE:
+            assert board.game_state() == GameState.CHECKMATE
+            assert record.result != GameResult.DRAW
+        else:
+            assert record.result == GameResult.DRAW
+        if record.termination == Termination.MAX_PLIES:
+            assert len(record.moves) == SETTINGS["max_plies"]
+    with open(os.path.join(out_dir, RUN_FILE)) as file:
+        assert json.load(file)["openings"] == [OPENING]
+
+def test_resume_plays_only_missing_games(tmp_path):
+    out_dir = str(tmp_path / "run")
+    run(out_dir, 2, **SETTINGS)
+    first = records_by_index(out_dir)
+    # A record cut off by an interrupted run is dropped and replayed
+    games_path = os.path.join(out_dir, GAMES_FILE)
+    with open(games_path, "ab") as file:
+        file.write(b"\x00\x00\x00\x02\xff")
+    summary = run(out_dir, 4, **SETTINGS)
+    assert summary["played_this_run"] == 2
+    records = records_by_index(out_dir)
+    assert sorted(records) == [0, 1, 2, 3]
+    assert all(records[index] == first[index] for index in first)
+    assert all(record.opening == INITIAL_SETUP for record in records.values())
+
+    # The same games come out of a fresh run in one go
+    fresh_dir = str(tmp_path / "fresh")
+    run(fresh_dir, 4, **SETTINGS)
+    assert records_by_index(fresh_dir) == records
+
+def test_resume_with_other_settings_is_refused(tmp_path):
+    out_dir = str(tmp_path / "run")
+    run(out_dir, 1, **SETTINGS)
+    with pytest.raises(ValueError):
+        run(out_dir, 2, hash_mb=2, **SETTINGS)
+    with pytest.raises(ValueError):
+        run(out_dir, 2, **dict(SETTINGS, nodes=61))
+
+def test_start_position_games_replay(tmp_path):
+    out_dir = str(tmp_path / "run")
+    run(out_dir, 1, **SETTINGS)
+    record = records_by_index(out_dir)[0]
+    board = new_game_board(BitboardBoard)
+    for move in record.moves:
+        assert move in board.legal_moves()
+        board.make_move(move)
@@ -0,0 +1,107 @@
+# Game server protocol, malformed input in particular: a bad request gets an
+# error reply and the connection, the validator and other games carry on.
+import asyncio
+import pytest
+from server import GameServer
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, line: bytes) -> str:
+    writer.write(line + b"\n")
+    await writer.drain()
+    return (await reader.readline()).decode("ascii").strip()
+
+def run_with_server(tmp_path, client):
+    # Serve on a Unix socket, run the client coroutine against it, shut down
+    async def session():
+        server = GameServer()
+        ready = asyncio.Event()
+        path = str(tmp_path / "chess.sock")
+        serving = asyncio.create_task(server.serve(unix_path=path, ready=ready))
+        await ready.wait()
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            try:
+                await client(server, reader, writer)
+            finally:
+                writer.close()
+                await writer.wait_closed()
+        finally:
+            for task in [serving] + server._tasks:
+                task.cancel()
+            await asyncio.gather(serving, *server._tasks, return_exceptions=True)
+    asyncio.run(session())
+
+def test_game_flow(tmp_path):
+    async def client(server, reader, writer):
+        assert await request(reader, writer, b"new") == "ok 1"
+        assert await request(reader, writer, b"move e2e4") == "ok ongoing"
+        assert await request(reader, writer, b"move e2e4") == "illegal e2e4"
+        assert await request(reader, writer, b"fen") == "ok rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+        for uci in (b"f7f6", b"d2d4", b"g7g5"):
+            assert await request(reader, writer, b"move " + uci) == "ok ongoing"
+        assert await request(reader, writer, b"move d1h5") == "ok checkmate"
+        assert await request(reader, writer, b"moves") == "ok"
+        assert await request(reader, writer, b"quit") == "bye"
+    run_with_server(tmp_path, client)
+
+def test_malformed_requests_get_errors(tmp_path):
+    async def client(server, reader, writer):
+        assert await request(reader, writer, b"move e2e4") == "error no game, send new or join first"
+        assert await request(reader, writer, b"castle") == "error unknown command castle"
+        assert await request(reader, writer, b"join 99") == "error no game 99"
+        assert await request(reader, writer, b"join x") == "error no game x"
+        assert await request(reader, writer, "new café".encode("utf-8")) == "error requests must be ASCII"
+        assert (await request(reader, writer, b"new 8/8/8 w")).startswith("error ")
+        # An en passant square off the side to move's target rank
+        reply = await request(reader, writer, b"new 4k3/8/8/8/8/8/8/4K3 w - e3 0 1")
+        assert reply.startswith("error ") and "en passant" in reply
+        # The connection is still usable after all of that
+        assert await request(reader, writer, b"new") == "ok 1"
+        assert await request(reader, writer, b"move z9z9") == "illegal z9z9"
+        assert await request(reader, writer, b"move e2e4") == "ok ongoing"
+    run_with_server(tmp_path, client)
+
+def test_validator_survives_a_failing_move(tmp_path):
+    async def client(server, reader, writer):
+        assert await request(reader, writer, b"new") == "ok 1"
+        broken = server.new_game()
+        def play(uci):
+            raise RuntimeError("broken game")
+        broken.play = play
+        assert await request(reader, writer, b"join %d" % broken.game_id) == "ok 2"
+        assert await request(reader, writer, b"move e2e4") == "error RuntimeError: broken game"
+        # Other games still get their moves checked
+        assert await request(reader, writer, b"join 1") == "ok 1"
+        assert await request(reader, writer, b"move e2e4") == "ok ongoing"
+    run_with_server(tmp_path, client)
+
+def test_parked_game_wakes_up(tmp_path):
+    async def client(server, reader, writer):
+        assert await request(reader, writer, b"new") == "ok 1"
+        assert await request(reader, writer, b"move g1f3") == "ok ongoing"
+        server.sessions[1].park()
+        assert server.sessions[1].board is None
+        assert await request(reader, writer, b"move g8f6") == "ok ongoing"
+        assert await request(reader, writer, b"fen") == "ok rnbqkb1r/pppppppp/5n2/8/8/5N2/PPPPPPPP/RNBQKB1R w KQkq - 2 2"
+    run_with_server(tmp_path, client)
+
+def test_stats_count_only_played_moves(tmp_path):
+    async def client(server, reader, writer):
+        assert await request(reader, writer, b"new") == "ok 1"
+        assert await request(reader, writer, b"move e2e5") == "illegal e2e5"
+        assert await request(reader, writer, b"move e2e4") == "ok ongoing"
+        assert " moves=1 " in await request(reader, writer, b"stats")
+    run_with_server(tmp_path, client)
+
+def test_cached_moves_keep_the_game_active(tmp_path):
+    async def client(server, reader, writer):
+        assert await request(reader, writer, b"new") == "ok 1"
+        assert (await request(reader, writer, b"moves")).startswith("ok ")
+        session = server.sessions[1]
+        session.last_active = 0.0
+        assert (await request(reader, writer, b"moves")).startswith("ok ")
+        assert session.last_active > 0.0
+    run_with_server(tmp_path, client)
+
+def test_park_after_must_be_positive():
+    with pytest.raises(ValueError):
+        GameServer(park_after=0)
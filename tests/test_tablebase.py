@@ -0,0 +1,88 @@
+# Endgame tablebases: spot checks of known mate distances, and every probed
+# distance one more than the best reply's.
+import random
+import pytest
+from bitboard import BitboardBoard
+from chess_rules import other_color
+from fen import board_from_fen
+from tablebase import DRAW, ILLEGAL, Tablebase, TablebaseEntry, TablebaseResult, generate_all, read_table, table_path
+
+@pytest.fixture(scope="module")
+def directory(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("tablebases"))
+    generate_all(directory, ["KRK"], workers=1)
+    return directory
+
+@pytest.fixture
+def tablebase(directory):
+    tablebase = Tablebase(directory)
+    yield tablebase
+    tablebase.close()
+
+def probe(tablebase: Tablebase, fen: str):
+    return tablebase.probe(board_from_fen(fen, BitboardBoard))
+
+def test_longest_mate(directory):
+    # King and rook mate in at most 16 moves, 31 plies
+    values = read_table(table_path(directory, "KRK"))
+    distances = values[(values != DRAW) & (values != ILLEGAL)].astype(int) - 1
+    assert distances[distances % 2 == 1].max() == 31
+
+@pytest.mark.parametrize("fen,entry", [
+    ("6k1/8/5K2/3R4/8/8/8/8 w - - 0 1", TablebaseEntry(TablebaseResult.WIN, 3)),
+    # The same position with the colours swapped
+    ("8/8/8/8/3r4/5k2/8/6K1 b - - 0 1", TablebaseEntry(TablebaseResult.WIN, 3)),
+    ("6k1/8/5K2/3R4/8/8/8/8 b - - 0 1", TablebaseEntry(TablebaseResult.LOSS, 4)),
+    # Checkmated
+    ("R5k1/8/6K1/8/8/8/8/8 b - - 0 1", TablebaseEntry(TablebaseResult.LOSS, 0)),
+    # Black takes the undefended rook
+    ("8/8/8/8/8/5K2/1k6/1R6 b - - 0 1", TablebaseEntry(TablebaseResult.DRAW, 0)),
+    # Bare kings and a lone minor piece need no table
+    ("8/8/8/4k3/8/8/8/4K3 w - - 0 1", TablebaseEntry(TablebaseResult.DRAW, 0)),
+    ("8/8/8/4k3/8/8/8/4KN2 w - - 0 1", TablebaseEntry(TablebaseResult.DRAW, 0)),
+])
+def test_known_positions(tablebase, fen, entry):
+    assert probe(tablebase, fen) == entry
+
+def test_uncovered_positions(tablebase):
+    # KPK was not generated, and four pieces are beyond every table
+    assert probe(tablebase, "8/8/8/4k3/8/8/4P3/4K3 w - - 0 1") is None
+    assert probe(tablebase, "8/8/8/4k3/8/8/4PP2/4K3 w - - 0 1") is None
+
+def test_best_move_mates(tablebase):
+    board = board_from_fen("6k1/8/5K2/3R4/8/8/8/8 w - - 0 1", BitboardBoard)
+    for _ in range(3):
+        board.make_move(tablebase.best_move(board))
+    assert tablebase.probe(board) == TablebaseEntry(TablebaseResult.LOSS, 0)
+    assert board.legal_moves() == []
+
+def test_distances_follow_from_the_replies(tablebase):
+    rng = random.Random(2)
+    checked = 0
+    while checked < 60:
+        squares = rng.sample(range(64), 3)
+        placement = [["1"] * 8 for _ in range(8)]
+        for square, letter in zip(squares, "KRk"):
+            placement[7 - square // 8][square % 8] = letter
+        fen = "/".join("".join(rank) for rank in placement) + " %s - - 0 1" % rng.choice("wb")
+        try:
+            board = board_from_fen(fen, BitboardBoard)
+        except ValueError:
+            continue
+        entry = tablebase.probe(board)
+        # Skip positions where the side that just moved is still in check
+        if entry is None or board.in_check(other_color(board.turn)):
+            continue
+        replies = []
+        for move in board.legal_moves():
+            board.make_move(move)
+            replies.append(tablebase.probe(board))
+            board.unmake_move()
+        if entry.result == TablebaseResult.WIN:
+            assert min(reply.plies for reply in replies if reply.result == TablebaseResult.LOSS) == entry.plies - 1
+        elif entry.result == TablebaseResult.LOSS and entry.plies:
+            assert all(reply.result == TablebaseResult.WIN for reply in replies)
+            assert max(reply.plies for reply in replies) == entry.plies - 1
+        elif entry.result == TablebaseResult.DRAW:
+            assert all(reply.result != TablebaseResult.LOSS for reply in replies)
+        checked += 1
@@ -0,0 +1,174 @@
+# Fixed-size transposition table keyed on Board.hash.
+#
+# Entries live in two flat array('Q') buffers (key and packed data), 16 bytes
+# per entry, so the memory budget is exact and nothing is allocated per store.
+# Slots are grouped into buckets; the replacement policy decides which slot of
+# a full bucket a new entry evicts.
+#
+# The buffers can also live in caller-provided memory (e.g. a
+# multiprocessing.shared_memory block) so several processes share one table.
+# Keys are stored xored with their data, so an entry torn by two processes
+# writing at once fails the key check instead of returning the wrong data.
+from array import array
+from enum import Enum, IntEnum
+from typing import NamedTuple, Optional
+
+ENTRY_BYTES = 16
+
+class BoundType(IntEnum):
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+class ReplacementPolicy(Enum):
+    # Evict the shallowest entry, entries from older searches go first
+    DEPTH_PREFERRED = 1
+    # Newest entry takes the first slot and older ones shift down the bucket
+    ALWAYS_REPLACE = 2
+
+class TTEntry(NamedTuple):
+    move: int
+    depth: int
+    bound: BoundType
+    score: int
+
+# Packed data layout, low to high: move 16 bits, depth 8, bound 2, generation 6,
+# score 32 (stored with an offset so it is never negative). A used slot always
+# has non-zero data because of the score offset
+SCORE_OFFSET = 1 << 31
+GENERATION_MASK = 63
+
+def table_bytes(memory_mb: float, bucket_size: int = 2) -> int:
+    # Buffer size a table with these settings needs
+    buckets = max(1, int(memory_mb * 1024 * 1024) // (ENTRY_BYTES * bucket_size))
+    return (1 << (buckets.bit_length() - 1)) * bucket_size * ENTRY_BYTES
+
+def _pack(move: int, depth: int, bound: int, generation: int, score: int) -> int:
+    return move | (depth << 16) | (bound << 24) | (generation << 26) | ((score + SCORE_OFFSET) << 32)
+
+class TranspositionTable:
+    def __init__(self, memory_mb: float = 16, bucket_size: int = 2,
+                 policy: ReplacementPolicy = ReplacementPolicy.DEPTH_PREFERRED, buffer = None):
+        if bucket_size < 1:
+            raise ValueError("bucket_size must be at least 1")
+
+        # Largest power of two bucket count that fits the budget
+        self.bucket_count = table_bytes(memory_mb, bucket_size) // (ENTRY_BYTES * bucket_size)
+        self.bucket_size = bucket_size
+        self.policy = policy
+        entries = self.bucket_count * bucket_size
+        if buffer is None:
+            self._buffer = None
+            self.keys = array("Q", bytes(8 * entries))
+            self.data = array("Q", bytes(8 * entries))
+        else:
+            if len(buffer) < table_bytes(memory_mb, bucket_size):
+                raise ValueError("buffer is smaller than the table")
+            self._buffer = memoryview(buffer)[:entries * ENTRY_BYTES]
+            words = self._buffer.cast("Q")
+            self.keys = words[:entries]
+            self.data = words[entries:]
+        self.generation = 0
+        self._reset_stats()
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self.keys) * ENTRY_BYTES
+
+    def new_search(self):
+        # Age existing entries so depth-preferred replacement lets go of them
+        self.generation = (self.generation + 1) & GENERATION_MASK
+
+    def clear(self):
+        if self._buffer is not None:
+            # Shared memory is zeroed in place so other processes see it too
+            self._buffer[:] = bytes(len(self._buffer))
+        else:
+            self.keys = array("Q", bytes(8 * len(self.keys)))
+            self.data = array("Q", bytes(8 * len(self.data)))
+        self.generation = 0
+        self._reset_stats()
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        self.probes += 1
+        first = (key & (self.bucket_count - 1)) * self.bucket_size
+        keys = self.keys
+        datas = self.data
+        for index in range(first, first + self.bucket_size):
+            data = datas[index]
+            if data and keys[index] ^ data == key:
+                self.hits += 1
+                return TTEntry(data & 0xFFFF, (data >> 16) & 0xFF, BoundType((data >> 24) & 3),
+                               (data >> 32) - SCORE_OFFSET)
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, bound: BoundType, score: int, move: int = 0):
+        self.stores += 1
+        first = (key & (self.bucket_count - 1)) * self.bucket_size
+        last = first + self.bucket_size - 1
+        keys = self.keys
+        data = self.data
+        packed = _pack(move & 0xFFFF, min(max(depth, 0), 255), int(bound), self.generation, score)
+
+        # Same position: refresh in place, keeping the old best move if none is given
+        for index in range(first, last + 1):
+            old = data[index]
+            if old and keys[index] ^ old == key:
+                if move == 0:
+                    packed |= old & 0xFFFF
+                keys[index] = key ^ packed
+                data[index] = packed
+                return
+
+        if self.policy == ReplacementPolicy.ALWAYS_REPLACE:
+            if data[last]:
+                self.overwrites += 1
+            for index in range(last, first, -1):
+                keys[index] = keys[index - 1]
+                data[index] = data[index - 1]
+            keys[first] = key ^ packed
+            data[first] = packed
+            return
+
+        # Depth preferred: take an empty slot, else the stalest then shallowest entry
+        victim = first
+        victim_score = None
+        for index in range(first, last + 1):
+            old = data[index]
+            if not old:
+                victim = index
+                victim_score = None
+                break
+            current = ((old >> 26) & GENERATION_MASK) == self.generation
+            score = (current, (old >> 16) & 0xFF)
+            if victim_score is None or score < victim_score:
+                victim = index
+                victim_score = score
+        if data[victim]:
+            self.overwrites += 1
+        keys[victim] = key ^ packed
+        data[victim] = packed
+
+    def stats(self) -> dict:
+        # Hit/miss counters plus an occupancy estimate sampled from the first buckets
+        sample = min(len(self.data), 4096)
+        used = sum(1 for index in range(sample) if self.data[index])
+        return {
+            "probes": self.probes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "fill": used / sample if sample else 0.0,
+            "entries": len(self.keys),
+            "memory_bytes": self.memory_bytes,
+        }
+
+    def _reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
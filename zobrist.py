@@ -0,0 +1,14 @@
+# Zobrist keys: one random 64-bit number per (color, piece type, square) plus
+# side to move, castling rights and en-passant file. A position's hash is the
+# xor of the keys that apply to it, so a move updates it with a few xors.
+import random
+
+ZOBRIST_SEED = 0x5EED_C4E55
+
+_random = random.Random(ZOBRIST_SEED)
+
+# PIECE_KEYS[color.value - 1][piece_type.value][square], index 0 of the type axis is unused
+PIECE_KEYS = [[[_random.getrandbits(64) for _ in range(64)] for _ in range(7)] for _ in range(2)]
+BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+CASTLING_KEYS = [_random.getrandbits(64) for _ in range(16)]
+EN_PASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]